@@ -0,0 +1,545 @@
+# Continuous background audio capture for William AI Assistant
+import collections
+import math
+import queue
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+
+import speech_recognition as sr
+from william_ai_assistant import config
+from william_ai_assistant.vad import VoiceActivityDetector, to_pcm16
+
+
+class RingBuffer:
+    """
+    Fixed-size, preallocated byte ring buffer with one writer and any number of readers.
+
+    Positions are absolute byte offsets into the stream (they only ever grow), so a reader
+    that falls more than `capacity` bytes behind the writer can tell how much audio it lost.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("RingBuffer capacity must be positive.")
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._condition = threading.Condition()
+        self._readers = []
+        self.write_position = 0 # Total number of bytes ever written
+        self.closed = False
+
+    def write(self, data: bytes, block: bool = False):
+        """
+        Copies `data` into the ring, overwriting the oldest bytes when it is full.
+
+        Args:
+            data (bytes): Raw audio frames.
+            block (bool): If True, wait for the slowest reader instead of overwriting
+                          audio it has not consumed yet (lossless mode for file sources).
+        """
+        data = memoryview(data)
+        while len(data) > 0:
+            with self._condition:
+                if block:
+                    while not self.closed and self._free_space() == 0:
+                        self._condition.wait()
+                    size = min(len(data), self._free_space())
+                else:
+                    size = min(len(data), self.capacity)
+                if self.closed:
+                    return
+                start = self.write_position % self.capacity
+                first = min(size, self.capacity - start)
+                self._view[start:start + first] = data[:first]
+                if first < size:
+                    self._view[:size - first] = data[first:size]
+                self.write_position += size
+                self._condition.notify_all()
+            data = data[size:]
+
+    def _free_space(self) -> int:
+        if not self._readers:
+            return self.capacity
+        slowest = min(reader.position for reader in self._readers)
+        return self.capacity - (self.write_position - slowest)
+
+    def reader(self) -> "RingReader":
+        """Creates a reader that starts at the current write position."""
+        with self._condition:
+            reader = RingReader(self, self.write_position)
+            self._readers.append(reader)
+            return reader
+
+    def close(self):
+        """Marks the end of the stream and wakes up all waiting readers and writers."""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+
+class RingReader:
+    """A read cursor into a RingBuffer. Created with `RingBuffer.reader()`."""
+
+    def __init__(self, ring: RingBuffer, position: int):
+        self.ring = ring
+        self.position = position
+        self.dropped_bytes = 0 # Audio overwritten before this reader got to it
+
+    def read(self, size: int, timeout: Optional[float] = None) -> bytes:
+        """
+        Returns exactly `size` bytes, waiting for the writer if needed.
+        Returns fewer bytes (possibly none) only when the ring is closed or `timeout` expires.
+        """
+        ring = self.ring
+        with ring._condition:
+            ring._condition.wait_for(lambda: ring.write_position - self.position >= size or ring.closed, timeout)
+            oldest = ring.write_position - ring.capacity
+            if self.position < oldest:
+                self.dropped_bytes += oldest - self.position
+                self.position = oldest
+            size = min(size, ring.write_position - self.position)
+            start = self.position % ring.capacity
+            first = min(size, ring.capacity - start)
+            data = bytes(ring._view[start:start + first])
+            if first < size:
+                data += bytes(ring._view[:size - first])
+            self.position += size
+            ring._condition.notify_all() # Wake a writer blocked in lossless mode
+            return data
+
+    def skip_to_end(self):
+        """Moves the cursor to the writer's position, discarding everything not read yet."""
+        with self.ring._condition:
+            self.position = self.ring.write_position
+            self.ring._condition.notify_all()
+
+    def close(self):
+        """Detaches this reader so it no longer holds back a blocking writer."""
+        with self.ring._condition:
+            if self in self.ring._readers:
+                self.ring._readers.remove(self)
+            self.ring._condition.notify_all()
+
+
+class TranscriptResult(NamedTuple):
+    """One recognized phrase, or the error raised while recognizing it."""
+    text: Optional[str]
+    error: Optional[Exception]
+    audio: sr.AudioData
+    captured_at: float # time.monotonic() when the phrase ended
+    recognized_at: float # time.monotonic() when recognition finished
+
+
+class PartialTranscript(NamedTuple):
+    """Hypothesis for a phrase that is still being spoken."""
+    text: str
+    stable_text: str # Leading words that did not change over the last STREAMING_STABLE_HYPOTHESES hypotheses
+    captured_at: float # time.monotonic() when the audio behind this hypothesis was captured
+
+
+def stable_prefix(hypotheses) -> str:
+    """The leading words shared by all `hypotheses`."""
+    word_lists = [h.split() for h in hypotheses]
+    common = []
+    for words in zip(*word_lists):
+        if any(word != words[0] for word in words):
+            break
+        common.append(words[0])
+    return " ".join(common)
+
+
+_END_OF_STREAM = object()
+_PHRASE_START = object()
+_PHRASE_END = object()
+
+
+class AudioCapture:
+    """
+    Keeps one audio source open and records it continuously into a RingBuffer.
+
+    This follows the same pattern as `Recognizer.listen_in_background` (a daemon thread
+    that owns the source and a stopper function to end it), but splits the work across
+    three threads so the capture never waits on recognition:
+
+        capture thread    -> source.stream.read() into the ring buffer
+        segmenter thread  -> ring buffer into phrases (sr.AudioData)
+        recognizer thread -> phrases into TranscriptResult items
+
+    Any `sr.AudioSource` works, so an `sr.AudioFile` can stand in for the microphone.
+
+    The source stays open from `start()` to `stop()`. `pause()` and `resume()` only stop
+    and restart segmentation, so there is no device open/close between turns and the
+    first syllable after a resume is not lost to stream start-up.
+    """
+
+    def __init__(self, source: sr.AudioSource, recognizer: sr.Recognizer,
+                 recognize: Optional[Callable[[sr.AudioData], str]] = None,
+                 buffer_seconds: float = config.CAPTURE_BUFFER_SECONDS,
+                 phrase_time_limit: Optional[float] = config.PHRASE_TIME_LIMIT,
+                 realtime: bool = True, noise_floor_db: Optional[float] = None,
+                 on_noise_floor: Optional[Callable[[float], None]] = None,
+                 start_stream: Optional[Callable[[int], object]] = None,
+                 recognize_idle: Optional[Callable[[sr.AudioData], str]] = None):
+        """
+        Args:
+            source (sr.AudioSource): An unopened microphone or audio file.
+            recognizer (sr.Recognizer): Supplies phrase_threshold and non_speaking_duration for segmentation.
+            recognize (Callable): Turns a phrase into text. Defaults to Google recognition.
+                                  May raise sr.UnknownValueError or sr.RequestError.
+            buffer_seconds (float): Size of the ring buffer in seconds of audio.
+            phrase_time_limit (Optional[float]): Maximum length of a single phrase.
+            realtime (bool): If False, file sources are read as fast as the segmenter can
+                             keep up, without ever overwriting unread audio.
+            noise_floor_db (Optional[float]): Starting noise floor for the VAD, e.g. a saved
+                                              calibration. If None, it is measured from the first audio.
+            on_noise_floor (Callable): Called from the segmenter thread with the current noise floor
+                                       every NOISE_CALIBRATION_SAVE_SECONDS and when capture ends.
+            start_stream (Callable): Given a sample rate, returns a streaming session (see
+                                     stt_backends.StreamingSession) or None. While `streaming` is
+                                     set, each phrase is fed to a session as it is spoken and its
+                                     hypotheses are put on `partials` as PartialTranscript items.
+            recognize_idle (Callable): Used instead of `recognize` for phrases that were segmented while
+                                       `idle` was set, e.g. to check for the wake word locally first.
+        """
+        self.source = source
+        self.recognizer = recognizer
+        self.recognize = recognize or (lambda audio: recognizer.recognize_google(audio).lower())
+        self.buffer_seconds = buffer_seconds
+        self.phrase_time_limit = phrase_time_limit
+        self.realtime = realtime
+        self.initial_noise_floor_db = noise_floor_db
+        self.on_noise_floor = on_noise_floor
+        self.start_stream = start_stream
+        self.recognize_idle = recognize_idle
+        self.idle = False # Set while waiting for the wake word; read for each phrase as it is segmented
+        self.streaming = False # Set while someone consumes `partials`, e.g. during a command
+        self.partials: "queue.Queue" = queue.Queue()
+        self._stream_audio: "queue.Queue" = queue.Queue()
+
+        self.ring: Optional[RingBuffer] = None
+        self._segment_reader: Optional[RingReader] = None
+        self.vad: Optional[VoiceActivityDetector] = None # Created by the segmenter once the source is open
+        self.phrases: "queue.Queue" = queue.Queue(maxsize=config.PHRASE_QUEUE_SIZE)
+        self.results: "queue.Queue" = queue.Queue()
+        self.running = False
+        self.finished = threading.Event() # Set once the source is exhausted and all phrases are recognized
+        self._opened = threading.Event()
+        self._threads = []
+        self.capture_error: Optional[Exception] = None
+        self.dropped_bytes = 0 # Audio the segmenter lost because it fell behind the ring buffer
+        self.paused = False
+        self.first_sample_latency: Optional[float] = None # Seconds from start()/resume() to the first captured sample
+        self._latency_started_at: Optional[float] = None
+        self._paused_at = 0.0 # Results captured before this (time.monotonic()) are stale
+        self._reset_segmenter = threading.Event()
+
+    def start(self) -> Callable[..., None]:
+        """
+        Opens the source and starts the capture, segmenter and recognizer threads.
+
+        Returns:
+            A stopper function, like `Recognizer.listen_in_background`.
+        """
+        if self.running:
+            return self.stop
+        self.running = True
+        self.paused = False
+        self.first_sample_latency = None
+        self._latency_started_at = time.monotonic()
+        self.finished.clear()
+        self._opened.clear()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="william-capture", daemon=True),
+            threading.Thread(target=self._segment_loop, name="william-segmenter", daemon=True),
+            threading.Thread(target=self._recognize_loop, name="william-recognizer", daemon=True),
+        ]
+        if self.start_stream is not None:
+            self._threads.append(threading.Thread(target=self._partial_loop, name="william-partials", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self.stop
+
+    def wait_until_open(self, timeout: Optional[float] = None) -> bool:
+        """Waits for the capture thread to open the source. Returns False if it failed or timed out."""
+        return self._opened.wait(timeout) and self.ring is not None and self.capture_error is None
+
+    def pause(self):
+        """
+        Stops turning audio into phrases, e.g. while the assistant is speaking, but keeps
+        the source open. Phrases captured before the pause are discarded by `next_result`.
+        """
+        self._paused_at = time.monotonic()
+        self.paused = True
+
+    def resume(self):
+        """
+        Continues segmentation after `pause()`, starting from the next captured sample.
+        Phrases captured up to now, including any finished while paused, are discarded by `next_result`.
+        """
+        if not self.paused:
+            return
+        self._paused_at = time.monotonic()
+        if self._segment_reader is not None:
+            self._segment_reader.skip_to_end()
+        self._reset_segmenter.set() # Forget any phrase that was in progress at the pause
+        self.first_sample_latency = None
+        self._latency_started_at = time.monotonic()
+        self.paused = False
+
+    def stop(self, wait_for_stop: bool = True):
+        """Stops all threads and closes the source."""
+        self.running = False
+        if self.ring:
+            self.ring.close()
+        self._opened.set()
+        if wait_for_stop:
+            for thread in self._threads:
+                if thread is not threading.current_thread():
+                    thread.join()
+
+    def next_result(self, timeout: Optional[float] = None) -> Optional[TranscriptResult]:
+        """
+        Returns the next recognized phrase.
+        Returns None on timeout, or once the source is exhausted and everything is recognized.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self.finished.is_set() and self.results.empty():
+                return None
+            try:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                result = self.results.get(timeout=remaining)
+            except queue.Empty:
+                return None
+            if result is _END_OF_STREAM:
+                self.finished.set()
+                return None
+            if result.captured_at > self._paused_at:
+                return result
+            # Heard before the last pause (e.g. the assistant's own voice); skip it
+
+    def next_partial(self) -> Optional[PartialTranscript]:
+        """Returns the next partial hypothesis, or None if there is none right now. Never waits."""
+        while True:
+            try:
+                partial = self.partials.get_nowait()
+            except queue.Empty:
+                return None
+            if partial.captured_at > self._paused_at:
+                return partial
+
+    def _capture_loop(self):
+        try:
+            with self.source as s:
+                chunk_bytes = s.CHUNK * s.SAMPLE_WIDTH
+                capacity = int(self.buffer_seconds * s.SAMPLE_RATE) * s.SAMPLE_WIDTH
+                self.ring = RingBuffer(max(capacity, chunk_bytes * 2))
+                self._segment_reader = self.ring.reader() # Attached before the first write so no audio is missed
+                self._opened.set()
+                is_file = isinstance(s, sr.AudioFile)
+                seconds_per_chunk = s.CHUNK / s.SAMPLE_RATE
+                next_deadline = time.monotonic()
+                while self.running:
+                    data = s.stream.read(s.CHUNK)
+                    if len(data) == 0:
+                        break # End of an audio file
+                    if self._latency_started_at is not None and not self.paused:
+                        self.first_sample_latency = time.monotonic() - self._latency_started_at
+                        self._latency_started_at = None
+                    if not self.paused: # While paused the stream is still drained, so it never overflows
+                        self.ring.write(data, block=is_file and not self.realtime)
+                    if is_file and self.realtime:
+                        next_deadline += seconds_per_chunk
+                        time.sleep(max(0.0, next_deadline - time.monotonic()))
+                    if len(data) < chunk_bytes and is_file:
+                        break
+        except Exception as e:
+            self.capture_error = e
+            print(f"Audio capture stopped due to an error: {e}")
+        finally:
+            if self.ring:
+                self.ring.close()
+            self._opened.set()
+
+    def _segment_loop(self):
+        """
+        Splits the captured stream into phrases with the voice activity detector.
+
+        While waiting for speech the ring buffer is read in VAD_IDLE_READ_SECONDS blocks, which
+        keeps idle CPU low without delaying anything: the audio is all still there once speech
+        is found. During a phrase it is read a few frames at a time, so the phrase ends close to
+        VAD_HANGOVER_SECONDS after the speaker stops.
+        """
+        self._opened.wait()
+        if self.ring is None:
+            self.phrases.put(_END_OF_STREAM)
+            return
+        source, r = self.source, self.recognizer
+        reader = self._segment_reader
+        width = source.SAMPLE_WIDTH
+        self.vad = vad = VoiceActivityDetector(source.SAMPLE_RATE, noise_floor_db=self.initial_noise_floor_db)
+        next_calibration_report = time.monotonic() + config.NOISE_CALIBRATION_SAVE_SECONDS
+        frame_bytes = vad.frame_length * width
+        idle_read_bytes = max(1, int(config.VAD_IDLE_READ_SECONDS / vad.frame_seconds)) * frame_bytes
+        phrase_read_bytes = max(1, source.CHUNK // vad.frame_length) * frame_bytes
+        phrase_frame_count = int(math.ceil(r.phrase_threshold / vad.frame_seconds))
+        pre_roll_frame_count = int(math.ceil(r.non_speaking_duration / vad.frame_seconds))
+        phrase_max_frames = None
+        if self.phrase_time_limit:
+            phrase_max_frames = int(math.ceil(self.phrase_time_limit / vad.frame_seconds))
+
+        pre_roll = collections.deque(maxlen=pre_roll_frame_count) # Audio just before speech starts
+        phrase = None # Frames of the current phrase
+        speech_count = 0
+        streamed = 0 # Frames of the current phrase already sent to the streaming recognizer
+
+        def emit():
+            # Hangover frames are trailing silence, so they don't count toward phrase_threshold
+            if speech_count - vad.hangover_frames >= phrase_frame_count:
+                audio = sr.AudioData(b"".join(phrase), source.SAMPLE_RATE, width)
+                self.phrases.put((audio, time.monotonic(), self.idle))
+
+        try:
+            while self.running:
+                buffer = reader.read(idle_read_bytes if phrase is None else phrase_read_bytes)
+                if len(buffer) == 0:
+                    break
+                if self._reset_segmenter.is_set():
+                    self._reset_segmenter.clear()
+                    if streamed:
+                        self._stream_audio.put(_PHRASE_END)
+                    phrase = None
+                    streamed = 0
+                    pre_roll.clear()
+                    vad.reset()
+                speech = vad.process(to_pcm16(buffer, width))
+                if self.on_noise_floor and time.monotonic() >= next_calibration_report:
+                    next_calibration_report = time.monotonic() + config.NOISE_CALIBRATION_SAVE_SECONDS
+                    self._report_noise_floor()
+                if phrase is None and not speech.any():
+                    first = max(0, len(speech) - pre_roll_frame_count)
+                    pre_roll.extend(buffer[i * frame_bytes:(i + 1) * frame_bytes] for i in range(first, len(speech)))
+                    continue
+
+                for i, is_speech in enumerate(speech):
+                    frame = buffer[i * frame_bytes:(i + 1) * frame_bytes]
+                    if phrase is None:
+                        if is_speech:
+                            phrase = list(pre_roll)
+                            pre_roll.clear()
+                            speech_count = 0
+                        else:
+                            pre_roll.append(frame)
+                            continue
+                    phrase.append(frame)
+                    speech_count += is_speech
+                    hit_limit = phrase_max_frames is not None and len(phrase) >= phrase_max_frames
+                    if not is_speech or hit_limit:
+                        emit()
+                        if streamed:
+                            self._stream_audio.put(_PHRASE_END)
+                        phrase = None
+                        streamed = 0
+
+                if phrase and self.streaming and self.start_stream is not None:
+                    if not streamed:
+                        self._stream_audio.put(_PHRASE_START)
+                    self._stream_audio.put(to_pcm16(b"".join(phrase[streamed:]), width))
+                    streamed = len(phrase)
+
+            if phrase:
+                emit()
+        finally:
+            self._report_noise_floor()
+            self.dropped_bytes = reader.dropped_bytes
+            reader.close()
+            self.phrases.put(_END_OF_STREAM)
+            self._stream_audio.put(_END_OF_STREAM)
+
+    def _report_noise_floor(self):
+        if self.on_noise_floor and self.vad is not None and self.vad.noise_floor_db is not None:
+            try:
+                self.on_noise_floor(self.vad.noise_floor_db)
+            except Exception as e:
+                print(f"Noise floor callback failed: {e}")
+
+    def _partial_loop(self):
+        """Feeds phrases to a streaming recognizer as they are spoken and publishes its hypotheses."""
+        session = None
+        hypotheses = collections.deque(maxlen=config.STREAMING_STABLE_HYPOTHESES)
+        published = None
+        while True:
+            item = self._stream_audio.get()
+            if item is _END_OF_STREAM or item is _PHRASE_END:
+                if session is not None:
+                    session.close()
+                session = None
+                if item is _END_OF_STREAM:
+                    return
+            elif item is _PHRASE_START:
+                hypotheses.clear()
+                published = None
+                try:
+                    session = self.start_stream(self.source.SAMPLE_RATE)
+                except Exception as e:
+                    print(f"Could not start streaming recognition: {e}")
+                    session = None
+            elif session is not None:
+                try:
+                    text = session.accept(item)
+                except Exception as e:
+                    print(f"Streaming recognition failed: {e}")
+                    session = None
+                    continue
+                if not text:
+                    continue
+                # A hypothesis repeated over the trailing silence confirms its last word too
+                hypotheses.append(text)
+                stable = stable_prefix(hypotheses) if len(hypotheses) == hypotheses.maxlen else ""
+                if (text, stable) != published:
+                    published = (text, stable)
+                    self.partials.put(PartialTranscript(text, stable, time.monotonic()))
+
+    def _recognize_loop(self):
+        while True:
+            item = self.phrases.get()
+            if item is _END_OF_STREAM:
+                self.results.put(_END_OF_STREAM)
+                return
+            audio, captured_at, idle = item
+            recognize = self.recognize_idle if idle and self.recognize_idle is not None else self.recognize
+            try:
+                text = recognize(audio)
+                self.results.put(TranscriptResult(text, None, audio, captured_at, time.monotonic()))
+            except Exception as e: # UnknownValueError, RequestError, ...
+                self.results.put(TranscriptResult(None, e, audio, captured_at, time.monotonic()))
+
+
+if __name__ == '__main__':
+    # Drive the capture pipeline from a WAV file instead of the microphone:
+    #   python -m william_ai_assistant.audio_capture path/to/recording.wav
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python -m william_ai_assistant.audio_capture <file.wav>")
+        sys.exit(1)
+
+    test_recognizer = sr.Recognizer()
+    test_recognizer.non_speaking_duration = config.NON_SPEAKING_DURATION
+
+    def describe_phrase(audio):
+        # Offline stand-in for a recognizer so the segmentation can be inspected without network access
+        seconds = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+        return f"<phrase of {seconds:.2f}s>"
+
+    capture = AudioCapture(sr.AudioFile(sys.argv[1]), test_recognizer, recognize=describe_phrase, realtime=False)
+    capture.start()
+    while True:
+        result = capture.next_result()
+        if result is None:
+            break
+        print(f"Captured: {result.text if result.error is None else result.error!r}")
+    capture.stop()
+    print(f"Audio dropped by the segmenter: {capture.dropped_bytes} bytes")
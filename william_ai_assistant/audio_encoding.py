@@ -0,0 +1,288 @@
+# In-process audio encoding for speech-to-text uploads
+# AudioData.get_flac_data() spawns the bundled `flac` binary for every phrase; these encoders
+# produce the same upload formats inside the process and reuse their buffers between calls.
+import struct
+import threading
+
+import numpy as np
+import speech_recognition as sr
+
+TARGET_SAMPLE_RATE = 16000 # What the speech services expect; also keeps uploads small
+FLAC_BLOCK_SIZE = 4096
+MAX_FIXED_ORDER = 4
+MAX_RICE_PARAMETER = 14 # 15 is the escape code in the 4-bit Rice parameter field
+
+# FLAC frame header sample rate codes; anything else is read from STREAMINFO (code 0)
+_FLAC_SAMPLE_RATE_CODES = {8000: 0b0100, 16000: 0b0101, 22050: 0b0110, 24000: 0b0111,
+                           32000: 0b1000, 44100: 0b1001, 48000: 0b1010, 96000: 0b1011}
+
+
+def _make_crc_table(polynomial: int, width: int):
+    top_bit = 1 << (width - 1)
+    mask = (1 << width) - 1
+    table = []
+    for byte in range(256):
+        crc = byte << (width - 8)
+        for _ in range(8):
+            crc = ((crc << 1) ^ polynomial) if crc & top_bit else (crc << 1)
+        table.append(crc & mask)
+    return table
+
+
+_CRC8_TABLE = _make_crc_table(0x07, 8)
+
+
+def _crc8(data) -> int:
+    crc = 0
+    for byte in data:
+        crc = _CRC8_TABLE[crc ^ byte]
+    return crc
+
+
+_crc16_distance_table = np.zeros((0, 256), dtype=np.uint16)
+
+
+def _crc16_contributions(max_distance: int) -> np.ndarray:
+    """
+    Table of CRC-16 (polynomial 0x8005, FLAC's frame checksum) contributions, indexed by
+    [bytes remaining after this byte, byte value].
+
+    With a zero initial value the CRC is linear over GF(2), so a frame's CRC is the XOR of
+    the contributions of its bytes. That turns it into one gather and one XOR-reduction.
+    """
+    global _crc16_distance_table
+    if len(_crc16_distance_table) > max_distance:
+        return _crc16_distance_table
+    distances = max(max_distance + 1, 2 * len(_crc16_distance_table))
+    bit_weights = np.zeros(distances * 8, dtype=np.uint16) # x^(16 + bits after this one) mod P
+    value = 0x8005
+    for distance in range(len(bit_weights)):
+        bit_weights[distance] = value
+        value = ((value << 1) ^ 0x8005) & 0xFFFF if value & 0x8000 else (value << 1)
+    bit_weights = bit_weights.reshape(distances, 8) # Column j is bit j (value 1 << j) of the byte
+    table = np.zeros((distances, 256), dtype=np.uint16)
+    for byte in range(1, 256):
+        lowest_bit = (byte & -byte).bit_length() - 1
+        table[:, byte] = table[:, byte & (byte - 1)] ^ bit_weights[:, lowest_bit]
+    _crc16_distance_table = table
+    return table
+
+
+def _utf8_frame_number(number: int) -> bytes:
+    """FLAC stores frame numbers with the UTF-8 variable-length scheme."""
+    if number < 0x80:
+        return bytes([number])
+    payload = []
+    while True:
+        payload.insert(0, 0x80 | (number & 0x3F))
+        number >>= 6
+        if number < (0x40 >> len(payload)):
+            break
+    lead = (0xFF00 >> (len(payload) + 1)) & 0xFF
+    return bytes([lead | number]) + bytes(payload)
+
+
+class PCMEncoder:
+    """
+    Converts AudioData to 16-bit mono PCM (LINEAR16) at `sample_rate`.
+    The output buffer is kept and grown between calls instead of being reallocated per phrase.
+    """
+
+    def __init__(self, sample_rate: int = TARGET_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self._buffer = np.zeros(0, dtype=np.int16)
+        self._lock = threading.Lock()
+
+    def to_samples(self, audio: sr.AudioData) -> np.ndarray:
+        """
+        Returns int16 samples at `self.sample_rate`. The array is a view of the shared buffer,
+        valid until the next call, so copy it if it has to outlive that.
+        """
+        if audio.sample_width == 2:
+            source = np.frombuffer(audio.frame_data, dtype="<i2")
+        else:
+            source = np.frombuffer(audio.get_raw_data(convert_width=2), dtype="<i2")
+        if audio.sample_rate == self.sample_rate:
+            count = len(source)
+            self._reserve(count)
+            self._buffer[:count] = source
+            return self._buffer[:count]
+        count = int(len(source) * self.sample_rate / audio.sample_rate)
+        self._reserve(count)
+        positions = np.arange(count) * (audio.sample_rate / self.sample_rate)
+        np.rint(np.interp(positions, np.arange(len(source)), source), out=self._buffer[:count], casting="unsafe")
+        return self._buffer[:count]
+
+    def _reserve(self, count: int):
+        if len(self._buffer) < count:
+            self._buffer = np.zeros(max(count, 2 * len(self._buffer)), dtype=np.int16)
+
+    def encode(self, audio: sr.AudioData) -> bytes:
+        """Returns little-endian LINEAR16 bytes, as accepted with Content-Type `audio/l16; rate=...`."""
+        with self._lock:
+            return self.to_samples(audio).astype("<i2", copy=False).tobytes()
+
+
+class FlacEncoder:
+    """
+    Small FLAC encoder for 16-bit mono speech, written with NumPy.
+
+    Each block uses the best of the FLAC fixed predictors (orders 0-4, or a constant
+    subframe for digital silence) with a single Rice partition. That is a fraction of
+    what libFLAC tries, but speech compresses about as well and it needs no subprocess.
+    All blocks of an utterance are encoded together as array operations, and the sample
+    buffer is reused between calls.
+    """
+
+    def __init__(self, sample_rate: int = TARGET_SAMPLE_RATE, block_size: int = FLAC_BLOCK_SIZE):
+        self.block_size = block_size
+        self.pcm = PCMEncoder(sample_rate)
+        self._lock = threading.Lock() # Backends may be called from several dispatcher threads
+
+    @property
+    def sample_rate(self) -> int:
+        return self.pcm.sample_rate
+
+    def encode(self, audio: sr.AudioData) -> bytes:
+        """Returns a complete FLAC stream for `audio`."""
+        with self._lock:
+            samples = self.pcm.to_samples(audio).astype(np.int32) # Room for fixed predictor residuals
+            out = bytearray(self._stream_header(len(samples)))
+            full = len(samples) - len(samples) % self.block_size
+            if full:
+                out += self._encode_blocks(samples[:full].reshape(-1, self.block_size), 0)
+            if full < len(samples):
+                out += self._encode_blocks(samples[full:].reshape(1, -1), full // self.block_size)
+            return bytes(out)
+
+    def _stream_header(self, total_samples: int) -> bytes:
+        info = struct.pack(">HH", self.block_size, self.block_size) # Min/max block size
+        info += b"\x00" * 6 # Min/max frame size unknown
+        # 20 bits sample rate, 3 bits channels-1, 5 bits bits-per-sample-1, 36 bits total samples
+        packed = (self.sample_rate << 44) | (0 << 41) | (15 << 36) | (total_samples & 0xFFFFFFFFF)
+        info += packed.to_bytes(8, "big")
+        info += b"\x00" * 16 # MD5 of the audio is optional (all zeros means "not computed")
+        return b"fLaC" + bytes([0x80]) + len(info).to_bytes(3, "big") + info # Last metadata block: STREAMINFO
+
+    def _frame_header(self, block_length: int, number: int) -> bytes:
+        rate_code = _FLAC_SAMPLE_RATE_CODES.get(self.sample_rate, 0)
+        header = bytes([0xFF, 0xF8, (0b0111 << 4) | rate_code, 0b1000]) # Sync, 16-bit block size at end, mono, 16 bps
+        header += _utf8_frame_number(number) + struct.pack(">H", block_length - 1)
+        return header + bytes([_crc8(header)])
+
+    def _encode_blocks(self, blocks: np.ndarray, first_number: int) -> bytes:
+        """Encodes each row of `blocks` (all the same length) as one FLAC frame."""
+        rows, size = blocks.shape
+        row_index = np.arange(rows)
+
+        # Residuals of the fixed predictors are repeated differences of the signal.
+        # They are front-padded with zeros so every order lines up with the sample columns.
+        max_order = min(MAX_FIXED_ORDER, size - 1)
+        residuals = np.zeros((max_order + 1, rows, size), dtype=np.int32)
+        costs = np.zeros((max_order + 1, rows), dtype=np.int64)
+        difference = blocks
+        for order in range(max_order + 1):
+            if order:
+                difference = np.diff(difference, axis=1)
+            residuals[order, :, order:] = difference
+            costs[order] = np.abs(difference).sum(axis=1)
+        orders = costs.argmin(axis=0)
+        valid = np.arange(size) >= orders[:, None] # False for warm-up samples
+        residual = residuals[orders, row_index]
+        folded = (residual << 1) ^ (residual >> 31) # Zig-zag to unsigned; the zero padding stays zero
+
+        # Try the Rice parameters around log2(mean) and keep the cheapest per block
+        counts = size - orders
+        means = folded.sum(axis=1) / counts
+        guesses = np.floor(np.log2(np.maximum(means, 1.0))).astype(np.int32)
+        candidates = np.clip(guesses[:, None] + np.arange(-1, 3), 0, MAX_RICE_PARAMETER)
+        candidate_bits = (folded[:, None, :] >> candidates[:, :, None]).sum(axis=2) + counts[:, None] * (candidates + 1)
+        best = candidate_bits.argmin(axis=1)
+        rice = candidates[row_index, best]
+        fixed_bits = 18 + 16 * orders + candidate_bits[row_index, best] # Type byte, warm-up, 10 bits of Rice header
+
+        constant = (blocks == blocks[:, :1]).all(axis=1)
+        use_fixed = ~constant & (fixed_bits < 8 + 16 * size)
+        subframe_bits = np.where(constant, 24, np.where(use_fixed, fixed_bits, 8 + 16 * size))
+
+        headers = [self._frame_header(size, first_number + i) for i in range(rows)]
+        header_lengths = np.array([len(h) for h in headers])
+        frame_lengths = header_lengths + (subframe_bits + 7) // 8 + 2 # Padded to a byte, plus CRC-16
+        frame_starts = np.concatenate(([0], np.cumsum(frame_lengths)[:-1]))
+        subframe_starts = (frame_starts + header_lengths) * 8
+
+        # Collect every subframe field as (bit position, value, width) codes
+        positions, values, widths = [], [], []
+        for i in range(rows):
+            start = int(subframe_starts[i])
+            if constant[i]:
+                fields = [(0x00, 8), (int(blocks[i, 0]) & 0xFFFF, 16)]
+            elif use_fixed[i]:
+                order = int(orders[i])
+                fields = [(0b00010000 | (order << 1), 8), *((int(v) & 0xFFFF, 16) for v in blocks[i, :order]),
+                          (0b00, 2), (0, 4), (int(rice[i]), 4)] # FIXED type + order, warm-up, Rice coding, partition order 0
+            else:
+                fields = [(0x02, 8)] # VERBATIM: raw 16-bit samples
+                positions.append(start + 8 + 16 * np.arange(size))
+                values.append(blocks[i] & 0xFFFF)
+                widths.append(np.full(size, 16))
+            field_widths = [width for _, width in fields]
+            positions.append(start + np.concatenate(([0], np.cumsum(field_widths[:-1]))))
+            values.append(np.array([value for value, _ in fields]))
+            widths.append(np.array(field_widths))
+
+        fixed_rows = np.flatnonzero(use_fixed)
+        if len(fixed_rows):
+            # Each residual is `quotient` zeros then the (rice + 1)-bit value 1 << rice | low bits.
+            # The zeros are never written; they are just the gap before the next code.
+            row_rice = rice[fixed_rows][:, None]
+            codeword_bits = row_rice + 1
+            row_valid = valid[fixed_rows]
+            row_folded = folded[fixed_rows]
+            lengths = ((row_folded >> row_rice) + codeword_bits) * row_valid
+            residual_start = subframe_starts[fixed_rows] + 18 + 16 * orders[fixed_rows]
+            ends = residual_start[:, None] + np.cumsum(lengths, axis=1)
+            positions.append((ends - codeword_bits)[row_valid])
+            values.append(((row_folded & ((1 << row_rice) - 1)) | (1 << row_rice))[row_valid])
+            widths.append(np.broadcast_to(codeword_bits, row_valid.shape)[row_valid])
+
+        total_bytes = int(frame_lengths.sum())
+        stream = self._pack_codes(np.concatenate(positions), np.concatenate(values), np.concatenate(widths), total_bytes)
+        for i, header in enumerate(headers):
+            stream[frame_starts[i]:frame_starts[i] + len(header)] = np.frombuffer(header, dtype=np.uint8)
+
+        # CRC-16 of each frame, over everything before the CRC itself
+        crc_positions = frame_starts + frame_lengths - 2
+        frame_of_byte = np.repeat(row_index, frame_lengths)
+        distances = np.maximum(crc_positions[frame_of_byte] - 1 - np.arange(total_bytes), 0) # CRC bytes are still 0
+        table = _crc16_contributions(int(frame_lengths.max())).ravel()
+        crcs = np.bitwise_xor.reduceat(table[distances * 256 + stream], frame_starts)
+        stream[crc_positions] = crcs >> 8
+        stream[crc_positions + 1] = crcs & 0xFF
+        return stream.tobytes()
+
+    @staticmethod
+    def _pack_codes(positions: np.ndarray, values: np.ndarray, widths: np.ndarray, total_bytes: int) -> np.ndarray:
+        """
+        Writes each value MSB-first at its bit position into big-endian 32-bit words.
+        Codes are at most 16 bits wide, so one covers at most two words. Codes never overlap,
+        so adding them up is the same as OR-ing them, and float64 sums of 32-bit words are exact.
+        Returns a uint8 array of `total_bytes`.
+        """
+        word_count = total_bytes // 4 + 2
+        positions = positions.astype(np.int64)
+        indexes = positions >> 5
+        # Left-align each code in a 64-bit window starting at its first word
+        window = values.astype(np.uint64) << (64 - (positions & 31) - widths).astype(np.uint64)
+        words = np.bincount(indexes, weights=(window >> np.uint64(32)).astype(np.float64), minlength=word_count)
+        words += np.bincount(indexes + 1, weights=(window & np.uint64(0xFFFFFFFF)).astype(np.float64), minlength=word_count)
+        return words.astype(">u4").view(np.uint8)[:total_bytes]
+
+
+def create_encoder(encoding: str):
+    """Returns an encoder for "flac" or "linear16" and the matching Content-Type prefix."""
+    if encoding == "linear16":
+        return PCMEncoder(), "audio/l16"
+    if encoding == "flac":
+        return FlacEncoder(), "audio/x-flac"
+    raise ValueError(f"Unknown audio encoding '{encoding}'. Use 'flac' or 'linear16'.")
@@ -1,11 +1,55 @@
 # Handles wake word detection and speech-to-text conversion
 import speech_recognition as sr
 from william_ai_assistant import tts_engine, config
+from william_ai_assistant import stt_backends, tracing, vad
+from william_ai_assistant.audio_capture import AudioCapture, PartialTranscript
+from william_ai_assistant.wake_word import WakeWordSpotter
 import time
 
 # Initialize recognizer
 recognizer = sr.Recognizer()
 microphone = None # Will be initialized in initialize_microphone
+capture = None # Long-lived AudioCapture that owns the one open microphone stream (start/pause/resume/close_capture)
+stt_dispatcher = None # HedgedSTTDispatcher over config.STT_BACKENDS, created on first use
+wake_word_spotter = None # Local keyword spotter, loaded in start_capture if templates are enrolled
+
+def _recognize_phrase(audio):
+    """Recognition callback for the capture pipeline."""
+    return get_stt_dispatcher().recognize(audio).lower()
+
+def _recognize_idle_phrase(audio):
+    """
+    Recognition callback for phrases captured while waiting for the wake word (capture.idle):
+    such a phrase is only sent for transcription after the local spotter matches the wake word.
+    """
+    if wake_word_spotter is not None:
+        detected, distance = wake_word_spotter.detect(audio)
+        if not detected:
+            raise sr.UnknownValueError() # Not the wake word; no cloud request needed
+        print(f"Wake word spotted locally (distance {distance:.3f}).")
+        if not config.WAKE_WORD_VERIFY_WITH_STT:
+            return config.WAKE_WORD
+    return _recognize_phrase(audio)
+
+def get_stt_dispatcher():
+    """Returns the speech-to-text dispatcher, creating it from config on first use."""
+    global stt_dispatcher
+    if stt_dispatcher is None:
+        stt_dispatcher = stt_backends.create_dispatcher()
+    return stt_dispatcher
+
+def get_stt_latency_histograms():
+    """Per-backend speech-to-text latency summaries (see HedgedSTTDispatcher.latency_histograms)."""
+    return get_stt_dispatcher().latency_histograms()
+
+def _trace_command(result):
+    """Starts a tracing turn at the start of the command phrase, with its capture and STT spans."""
+    audio = result.audio
+    phrase_seconds = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+    started_at = result.captured_at - phrase_seconds
+    if tracing.begin_turn(started_at=started_at) is not None:
+        tracing.record("capture", started_at, result.captured_at, seconds=round(phrase_seconds, 3))
+        tracing.record("stt", result.captured_at, result.recognized_at)
 
 def initialize_microphone():
     """Initializes the microphone, handling potential errors."""
@@ -16,10 +60,7 @@ def initialize_microphone():
     try:
         microphone = sr.Microphone(device_index=config.MICROPHONE_INDEX)
         print(f"Microphone initialized with device index: {config.MICROPHONE_INDEX if config.MICROPHONE_INDEX is not None else 'default'}.")
-        # Perform a brief test listen to catch immediate issues
-        with microphone as source:
-            recognizer.adjust_for_ambient_noise(source, duration=0.5) # Quick adjustment
-        print("Microphone test successful.")
+        # The stream itself is opened once, by start_capture, and reports its own errors
         return True
     except sr.RequestError as e: # This can happen if no default mic is found or specific index is bad sometimes
         print(f"Error initializing microphone (sr.RequestError): {e}. This might indicate no microphone is connected or configured.")
@@ -37,35 +78,125 @@ def initialize_microphone():
         microphone = None
         return False
 
-def adjust_for_ambient_noise():
-    """Adjusts the recognizer sensitivity to ambient noise."""
-    global microphone, recognizer
+def start_capture():
+    """
+    Opens the microphone stream and starts continuous background capture if it is not running yet.
+    Phrases are segmented and recognized on background threads, so speech that arrives
+    while an earlier phrase is being recognized is buffered instead of dropped.
+    The stream then stays open across wake word -> command -> response cycles until close_capture().
+    Returns True if capture is running.
+    """
+    global capture, wake_word_spotter
+    if capture is not None and capture.running and capture.capture_error is None:
+        return True
     if not microphone and not initialize_microphone():
+        return False
+    if config.ENABLE_WAKE_WORD_SPOTTER and wake_word_spotter is None:
+        wake_word_spotter = WakeWordSpotter.from_directory()
+        if wake_word_spotter is None:
+            print("No wake word templates enrolled; every idle phrase will be transcribed. "
+                  "Run 'python -m william_ai_assistant.wake_word' to enroll some.")
+    # The segmenter reads this once, when the capture starts; phrases end after config.VAD_HANGOVER_SECONDS
+    recognizer.non_speaking_duration = config.NON_SPEAKING_DURATION
+    # Start from the last saved noise floor and keep saving the live estimate
+    sample_rate, device = microphone.SAMPLE_RATE, config.MICROPHONE_INDEX
+    saved_noise_floor = vad.load_noise_calibration(sample_rate, device)
+    start_stream = None
+    if config.ENABLE_STREAMING_PARTIALS:
+        start_stream = lambda rate: get_stt_dispatcher().start_stream(rate)
+    capture = AudioCapture(microphone, recognizer, recognize=_recognize_phrase, noise_floor_db=saved_noise_floor,
+                           on_noise_floor=lambda floor: vad.save_noise_calibration(floor, sample_rate, device),
+                           start_stream=start_stream, recognize_idle=_recognize_idle_phrase)
+    capture.start()
+    if not capture.wait_until_open(timeout=5):
+        print(f"Error opening the microphone stream: {capture.capture_error}")
+        tts_engine.speak("Error opening the microphone. Please check your microphone connection and configuration.")
+        capture.stop(wait_for_stop=False)
+        capture = None
+        return False
+    return True
+
+def pause_capture():
+    """Stops listening, e.g. while William is speaking, without closing the microphone stream."""
+    if capture is not None and capture.running:
+        capture.pause()
+
+def resume_capture():
+    """
+    Starts listening again on the open microphone stream (or opens it if needed).
+    Anything heard while paused is ignored. Returns True if capture is running.
+    """
+    if capture is not None and capture.running and capture.capture_error is None:
+        capture.resume()
+        return True
+    return start_capture()
+
+def speak_prompt(text, priority: int = tts_engine.PRIORITY_PROMPT) -> bool:
+    """
+    Says a short prompt ("Yes?", an error) with listening paused, so William's own voice is not
+    segmented and taken for the user's next phrase. Phrases heard while it played are dropped.
+    Returns what tts_engine.speak returns.
+    """
+    listening = capture is not None and capture.running and not capture.paused
+    if listening:
+        capture.pause()
+    try:
+        return tts_engine.speak(text, priority=priority)
+    finally:
+        if listening:
+            capture.resume() # Continues from the end of the buffer, after the prompt
+
+def close_capture():
+    """Closes the microphone stream and stops the capture threads. start_capture() opens it again."""
+    global capture
+    if capture is not None:
+        capture.stop()
+        capture = None
+
+def get_first_sample_latency():
+    """Seconds from opening (or resuming) the stream to the first captured sample, or None if not known yet."""
+    return capture.first_sample_latency if capture is not None else None
+
+def adjust_for_ambient_noise(duration=1):
+    """
+    Lets the voice activity detector measure the background noise on the shared microphone
+    stream, opening the stream if needed. The microphone is not opened a second time for this.
+
+    Calibration never stops: the detector keeps a moving noise floor estimate that is saved
+    to config.NOISE_CALIBRATION_FILE, so on a warm start this returns without waiting.
+    """
+    if capture is not None and capture.running:
+        # The capture thread owns the microphone; its voice activity detector tracks the noise floor continuously.
+        print("Background capture is running; skipping blocking ambient noise adjustment.")
+        return
+    if not start_capture():
         print("Cannot adjust for ambient noise, microphone not available.")
         return
+    if capture.initial_noise_floor_db is not None:
+        print(f"Using saved noise calibration ({capture.initial_noise_floor_db:.1f} dBFS); "
+              "skipping ambient noise adjustment.")
+        return
 
     print("Adjusting for ambient noise, please be quiet for a moment...")
-    try:
-        with microphone as source:
-            recognizer.adjust_for_ambient_noise(source, duration=1)
-        recognizer.energy_threshold = config.BASE_ENERGY_THRESHOLD
-        recognizer.dynamic_energy_threshold = config.DYNAMIC_ENERGY_THRESHOLD
-        recognizer.dynamic_energy_adjustment_damping = config.DYNAMIC_ENERGY_ADJUSTMENT_DAMPING
-        recognizer.pause_threshold = config.PAUSE_THRESHOLD
-        recognizer.non_speaking_duration = config.NON_SPEAKING_DURATION
-        print(f"Ambient noise adjustment complete. Energy threshold set to: {recognizer.energy_threshold}")
-    except sr.WaitTimeoutError:
-        print("Timeout during ambient noise adjustment. Using default energy threshold.")
-        # Fallback or re-attempt logic could be added here
-    except Exception as e:
-        print(f"Error during ambient noise adjustment: {e}")
-        tts_engine.speak("Could not adjust for ambient noise due to an error.")
+    time.sleep(duration)
+    latency = get_first_sample_latency()
+    if latency is not None:
+        print(f"Microphone stream open; first sample arrived after {latency * 1000:.0f} ms.")
+    if capture.vad is not None and capture.vad.noise_floor_db is not None:
+        print(f"Ambient noise adjustment complete. Noise floor: {capture.vad.noise_floor_db:.1f} dBFS")
+    else:
+        print("No audio received during ambient noise adjustment yet. The noise floor will be measured as audio arrives.")
 
 
-def listen_for_wake_word(wake_word=config.WAKE_WORD):
+def listen_for_wake_word(wake_word=config.WAKE_WORD, on_wake=None):
     """
     Continuously listens for the wake word.
     Returns True if the wake word is detected, False otherwise (e.g. error).
+
+    Args:
+        wake_word (str): The phrase to listen for.
+        on_wake (Optional[Callable]): Called with no arguments as soon as the wake word is heard,
+                                      before "Yes?" is spoken (the orchestrator stops its reply here).
     """
     global recognizer, microphone
     if not microphone and not initialize_microphone():
@@ -82,40 +213,75 @@ def listen_for_wake_word(wake_word=config.WAKE_WORD):
 
     print(f"Listening for wake word: '{wake_word}'...")
     try:
-        with microphone as source:
-            while True: # Keep listening until wake word or critical error
-                try:
-                    audio = recognizer.listen(source, phrase_time_limit=config.PHRASE_TIME_LIMIT)
-                    text = recognizer.recognize_google(audio).lower()
-                    print(f"Heard: {text}")
-                    if wake_word in text:
-                        print("Wake word detected!")
-                        tts_engine.speak("Yes?")
-                        return True
-                except sr.WaitTimeoutError:
-                    # print("No speech detected, still listening for wake word...")
-                    pass # Normal timeout, continue listening
-                except sr.UnknownValueError:
-                    # print("Could not understand audio, still listening for wake word...")
-                    pass # Normal, speech not recognized, continue listening
-                except sr.RequestError as e:
-                    print(f"Google Speech Recognition service error: {e}")
-                    tts_engine.speak("Speech service error. Please check your internet connection.")
-                    # Depending on severity, might want to pause and retry, or return False
-                    time.sleep(2) # Brief pause before returning False or retrying listen
-                    return False # Indicate an error occurred
-    except AttributeError: # This can happen if microphone is None and initialization failed silently prior
-        print("Microphone not available for wake word detection (AttributeError).")
-        # This case should ideally be caught by the initial check, but as a safeguard.
-        return False
+        if not resume_capture():
+            print("Microphone not available for wake word detection.")
+            return False
+        # Phrases segmented from now on go through the spotter before any STT call. Phrases already
+        # queued keep the decision made when they were segmented, so a command is never gated.
+        capture.idle = True
+        while True: # Keep listening until wake word or critical error
+            result = capture.next_result(timeout=1)
+            if result is None:
+                if capture.capture_error is not None:
+                    raise capture.capture_error
+                continue # Nothing recognized yet, keep listening
+            if isinstance(result.error, sr.UnknownValueError):
+                continue # Normal, speech not recognized, continue listening
+            if isinstance(result.error, sr.RequestError):
+                print(f"Google Speech Recognition service error: {result.error}")
+                speak_prompt("Speech service error. Please check your internet connection.")
+                time.sleep(2) # Brief pause before returning False
+                return False # Indicate an error occurred
+            if result.error is not None:
+                raise result.error
+            text = result.text
+            print(f"Heard: {text}")
+            if wake_word in text:
+                print("Wake word detected!")
+                capture.idle = False # Whatever comes next is the command, don't gate it
+                if on_wake is not None:
+                    on_wake()
+                speak_prompt("Yes?")
+                return True
     except Exception as e: # Catch-all for other unexpected errors with the microphone
         print(f"An unexpected error occurred with the microphone during wake word listening: {e}")
-        tts_engine.speak("A microphone error occurred while listening for the wake word.")
+        speak_prompt("A microphone error occurred while listening for the wake word.")
         return False
 
-def listen_for_command():
+def stream_command():
+    """
+    Generator over the next command. While the user is still talking it yields PartialTranscript
+    items (only if a backend in config.STT_BACKENDS supports streaming, e.g. "vosk"), and the
+    final TranscriptResult from the regular STT dispatcher comes last.
+    Expects capture to be running (see resume_capture); raises sr.WaitTimeoutError if it stops first.
+    """
+    source = capture # close_capture() may drop the global while this waits
+    source.streaming = True
+    try:
+        while True:
+            partial = source.next_partial()
+            while partial is not None:
+                yield partial
+                partial = source.next_partial()
+            result = source.next_result(timeout=0.05)
+            if result is not None:
+                yield result
+                return
+            if source.capture_error is not None:
+                raise source.capture_error
+            if not source.running or source.finished.is_set():
+                raise sr.WaitTimeoutError("Capture stopped before a command was heard")
+    finally:
+        source.streaming = False
+
+def listen_for_command(on_partial=None):
     """
     Listens for a command after the wake word is detected.
+
+    Args:
+        on_partial (Callable): Optional, called with each PartialTranscript while the user is speaking,
+                               e.g. to start routing before the final transcript arrives.
+
     Returns the transcribed text of the command or None if an error/timeout occurs.
     """
     global recognizer, microphone
@@ -127,37 +293,41 @@ def listen_for_command():
 
     print("Listening for command...")
     try:
-        with microphone as source:
-            # It's good practice to ensure the microphone is "fresh" for the command.
-            # While adjust_for_ambient_noise is usually done once,
-            # a quick listen can help if the environment changed.
-            # However, frequent adjustments might be too slow.
-            # For now, assume initial adjustment is sufficient.
-            # recognizer.adjust_for_ambient_noise(source, duration=0.2) # Optional quick re-adjust
-
-            audio = recognizer.listen(source, phrase_time_limit=config.PHRASE_TIME_LIMIT)
-            command = recognizer.recognize_google(audio).lower()
-            print(f"Command heard: {command}")
-            return command
+        if not resume_capture():
+            print("Microphone not available for command listening.")
+            speak_prompt("Microphone error. Cannot listen for command.")
+            return None
+        capture.idle = False
+        # Only phrases that start after "Yes?" count: a command spoken before it finished, e.g. right
+        # after the wake word without a pause, is dropped (see speak_prompt).
+        result = None
+        for item in stream_command():
+            if isinstance(item, PartialTranscript):
+                if on_partial is not None:
+                    on_partial(item)
+            else:
+                result = item
+        if result.error is not None:
+            raise result.error
+        command = result.text
+        print(f"Command heard: {command}")
+        _trace_command(result)
+        return command
     except sr.WaitTimeoutError:
-        tts_engine.speak("I didn't hear a command.")
+        speak_prompt("I didn't hear a command.")
         print("No command heard (timeout).")
         return None
     except sr.UnknownValueError:
-        tts_engine.speak("Sorry, I didn't understand that.")
+        speak_prompt("Sorry, I didn't understand that.")
         print("Could not understand command.")
         return None
     except sr.RequestError as e:
         print(f"Google Speech Recognition service error during command listen: {e}")
-        tts_engine.speak("There was an error with the speech service while listening for your command.")
-        return None
-    except AttributeError: # Microphone became None unexpectedly
-        print("Microphone not available for command listening (AttributeError).")
-        tts_engine.speak("Microphone error. Cannot listen for command.")
+        speak_prompt("There was an error with the speech service while listening for your command.")
         return None
     except Exception as e: # Catch-all for other unexpected errors
         print(f"An unexpected error occurred during command listening: {e}")
-        tts_engine.speak("An unexpected error occurred while trying to listen.")
+        speak_prompt("An unexpected error occurred while trying to listen.")
         return None
 
 if __name__ == '__main__':
@@ -194,3 +364,4 @@ if __name__ == '__main__':
             tts_engine.speak("No command was processed.")
     else:
         print("Wake word not detected or error occurred.")
+    close_capture()
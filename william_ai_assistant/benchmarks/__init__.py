@@ -0,0 +1,3 @@
+# Offline benchmarks for William AI Assistant.
+# Each module is runnable on its own, e.g.:
+#   python -m william_ai_assistant.benchmarks.bench_wake_word --help
@@ -0,0 +1,94 @@
+# Old blocking main loop vs the asyncio core (orchestrator.py), replaying a spoken script through the harness.
+#
+#   python -m william_ai_assistant.benchmarks.bench_async_core [--turns 6] [--interrupt-after 3] [--speed 2]
+#
+# Each command is a synthetic audio clip that goes through AudioCapture and the stub STT server;
+# the LLM is a FakeOpenRouterServer streaming a long reply and speech takes as long as it would
+# at TTS_RATE (both scaled by --speed). Every second command is spoken --interrupt-after seconds
+# after the previous one, while William is still answering it, and starts with the wake word.
+# The old loop only listens again once it has finished speaking, so that command waits; the
+# asyncio core hears it straight away and cuts the reply off (barge-in).
+# Latency is from when the script has the user start speaking to William's first spoken word.
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+
+from william_ai_assistant import config
+
+config.ENABLE_VISUAL_CANVAS = False # Before william_brain is imported
+config.ENABLE_LLM_CACHE = False # Every run repeats the same prompts
+config.OPENROUTER_API_KEY = config.OPENROUTER_API_KEY or "benchmark"
+
+from william_ai_assistant import tracing
+from william_ai_assistant.benchmarks.bench_turn_latency import _synthetic_clip
+from william_ai_assistant.harness import Harness, Turn
+
+QUESTIONS = ["how far away is the moon", "what about mars", "why is the sky blue", "and why are sunsets red",
+             "how do tides work", "what causes the seasons", "how hot is the sun", "how old is the universe"]
+REPLY = ("That is a good question, and the answer has a few parts. First, it depends on where you measure from. "
+         "Second, the number changes over time, so any figure is an average. Third, scientists keep refining it "
+         "with better instruments. In short, it is a lot further than it looks.")
+
+
+def make_script(args, clip_dir):
+    turns = []
+    for i in range(args.turns):
+        interrupting = i % 2 == 1
+        text = f"{config.WAKE_WORD} {QUESTIONS[i % len(QUESTIONS)]}" if interrupting else QUESTIONS[i % len(QUESTIONS)]
+        path = os.path.join(clip_dir, f"turn{i}.wav")
+        _synthetic_clip(path, speech_seconds=1.2 + 0.1 * i) # Different audio per turn, so transcripts don't mix
+        turns.append(Turn(text, audio=path, pause=args.pause,
+                          interrupt=args.interrupt_after if interrupting else None))
+    return turns
+
+
+def run(async_core, turns, args):
+    """Replays the script through main.main; returns the report and each turn's first-audio latency in seconds."""
+    config.ENABLE_ASYNC_CORE = async_core
+    harness = Harness(speed=args.speed, llm_delay=args.llm_delay, stt_delay=args.stt_delay,
+                      llm_reply=REPLY, llm_tokens_per_second=args.tokens_per_second)
+    with harness.headless(), contextlib.redirect_stdout(io.StringIO()):
+        report = harness.replay({"script": turns})
+        events = list(tracing._events)
+    turn_ids = sorted({event[3] for event in events if event[0] == "turn"})
+    first_audio = {event[3]: event[2] - event[1] for event in events if event[0] == "first_audio"}
+    return report, [first_audio.get(turn) for turn in turn_ids]
+
+
+def describe(latencies):
+    heard = [seconds for seconds in latencies if seconds is not None]
+    if not heard:
+        return "no replies"
+    return f"mean {statistics.mean(heard):5.2f}s  max {max(heard):5.2f}s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the old main loop against the asyncio core.")
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--interrupt-after", type=float, default=3.0,
+                        help="Seconds after the previous command at which every second command is spoken")
+    parser.add_argument("--pause", type=float, default=0.5, help="Think time after a reply for the other commands")
+    parser.add_argument("--speed", type=float, default=2.0, help="Time scale for speech and pauses (1 = real time)")
+    parser.add_argument("--llm-delay", type=float, default=0.4, help="Seconds to the fake LLM's first token")
+    parser.add_argument("--tokens-per-second", type=float, default=30.0)
+    parser.add_argument("--stt-delay", type=float, default=0.15)
+    args = parser.parse_args()
+
+    turns = make_script(args, tempfile.mkdtemp(prefix="william-bench-"))
+    print(f"{args.turns} spoken commands, every second one {args.interrupt_after}s after the previous; "
+          f"reply of {len(REPLY.split())} words at {args.tokens_per_second:.0f} words/s, speed x{args.speed:g}:")
+    for label, async_core in (("blocking loop", False), ("asyncio core", True)):
+        report, latencies = run(async_core, turns, args)
+        print(f"  {label:<14} {report['elapsed_seconds']:6.2f}s total, {report['turns_per_second']:.2f} turns/s; "
+              f"first audio after a pause: {describe(latencies[0::2])}, "
+              f"interrupting: {describe(latencies[1::2])}; "
+              f"{report['speech_cut_off']} replies cut off, {report['llm']['cancelled_streams']} LLM streams closed early")
+        if report["errors"]:
+            print(f"    {len(report['errors'])} error(s), first: {report['errors'][0]}")
+
+
+if __name__ == '__main__':
+    main()
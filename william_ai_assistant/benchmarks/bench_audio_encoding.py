@@ -0,0 +1,65 @@
+# Per-utterance encode latency: AudioData.get_flac_data() (flac subprocess) vs the in-process encoders.
+#
+#   python -m william_ai_assistant.benchmarks.bench_audio_encoding [clip.wav ...] [--runs 50]
+#
+# Without clips, a synthetic 4 second utterance at 44.1 kHz (a common microphone rate) is used.
+import argparse
+import statistics
+import time
+
+import numpy as np
+import speech_recognition as sr
+from william_ai_assistant.audio_encoding import TARGET_SAMPLE_RATE, FlacEncoder, PCMEncoder
+
+
+def _synthetic_utterance(seconds=4.0, sample_rate=44100):
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    voiced = np.sin(2 * np.pi * 140 * t) + 0.5 * np.sin(2 * np.pi * 280 * t) + 0.25 * np.sin(2 * np.pi * 1100 * t)
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t) # Syllable-rate amplitude modulation
+    samples = 6000 * voiced * envelope + rng.normal(0, 150, len(t))
+    return sr.AudioData(samples.astype(np.int16).tobytes(), sample_rate, 2)
+
+
+def _time(function, runs):
+    function() # Warm up caches and buffers
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark speech upload encoding.")
+    parser.add_argument("clips", nargs="*", help=".wav files to encode (default: synthetic utterance)")
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    utterances = []
+    for path in args.clips:
+        with sr.AudioFile(path) as source:
+            utterances.append(sr.Recognizer().record(source))
+    if not utterances:
+        utterances.append(_synthetic_utterance())
+
+    flac_encoder, pcm_encoder = FlacEncoder(), PCMEncoder()
+    candidates = [
+        ("flac subprocess (get_flac_data)",
+         lambda a: a.get_flac_data(convert_rate=TARGET_SAMPLE_RATE, convert_width=2)),
+        ("in-process FLAC", flac_encoder.encode),
+        ("in-process LINEAR16", pcm_encoder.encode),
+    ]
+    for audio in utterances:
+        seconds = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+        print(f"\nUtterance: {seconds:.2f}s at {audio.sample_rate} Hz, {args.runs} runs each")
+        print(f"{'encoder':<34} {'mean ms':>8} {'p95 ms':>8} {'bytes':>9}")
+        for label, encode in candidates:
+            timings = sorted(_time(lambda: encode(audio), args.runs))
+            p95 = timings[min(len(timings) - 1, int(0.95 * len(timings)))]
+            print(f"{label:<34} {statistics.mean(timings):>8.2f} {p95:>8.2f} {len(encode(audio)):>9}")
+
+
+if __name__ == '__main__':
+    main()
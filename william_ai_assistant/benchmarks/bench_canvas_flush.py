@@ -0,0 +1,111 @@
+# Canvas data file writes: the whole state rewritten in place on every update (as canvas_utils did)
+# vs coalesced, compact, atomic writes by the background flusher.
+#
+#   python -m william_ai_assistant.benchmarks.bench_canvas_flush [--turns 10] [--pieces 40] [--interval 0.02]
+#
+# Each turn looks like a streamed reply: a new command, then --pieces updates of the growing reply
+# --interval seconds apart, with a thought process entry every few pieces. A reader stands in for
+# the polling page and counts reads that found a half-written (unparseable) file.
+import argparse
+import datetime
+import json
+import os
+import tempfile
+import threading
+import time
+
+from william_ai_assistant import canvas_utils, config
+
+
+def rewrite_in_place(path):
+    """What canvas_utils did before: an update_canvas that writes the whole state, indented, in place."""
+    state = {"currentCommand": "", "thoughtProcess": "", "webActions": [], "aiResponse": "", "systemEvents": []}
+    stats = {"writes": 0, "bytes_written": 0}
+
+    def update_canvas(current_command=None, thought_process=None, ai_response=None, append_system_event=None, **_):
+        if current_command is not None:
+            state["currentCommand"] = current_command
+        if thought_process is not None:
+            state["thoughtProcess"] = thought_process
+        if ai_response is not None:
+            state["aiResponse"] = ai_response
+        if append_system_event:
+            state["systemEvents"] = (state["systemEvents"] + [append_system_event])[-config.CANVAS_MAX_SYSTEM_EVENTS:]
+        state["lastUpdated"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        data = json.dumps(state, indent=4)
+        with open(path, 'w') as f:
+            f.write(data)
+        stats["writes"] += 1
+        stats["bytes_written"] += len(data.encode("utf-8"))
+
+    return update_canvas, lambda: None, lambda: dict(stats)
+
+
+def coalesced(path):
+    canvas_utils.CANVAS_DATA_FILE_PATH = path
+    before = canvas_utils.stats()
+
+    def stats():
+        return {name: canvas_utils.stats()[name] - before[name] for name in ("writes", "bytes_written")}
+
+    return canvas_utils.update_canvas, canvas_utils.flush, stats
+
+
+def read_until(path, stop, counts):
+    while not stop.is_set():
+        try:
+            with open(path) as f:
+                json.load(f)
+            counts["reads"] += 1
+        except FileNotFoundError:
+            pass
+        except ValueError:
+            counts["torn"] += 1
+        time.sleep(0.001)
+
+
+def run(make, args):
+    """Returns (writes, bytes written, seconds, torn reads, reads)."""
+    path = os.path.join(tempfile.mkdtemp(prefix="william-canvas-"), config.CANVAS_DATA_FILE)
+    update_canvas, flush, stats = make(path)
+    stop, counts = threading.Event(), {"reads": 0, "torn": 0}
+    update_canvas(current_command="Starting")
+    flush()
+    reader = threading.Thread(target=read_until, args=(path, stop, counts), daemon=True)
+    reader.start()
+    started = time.monotonic()
+    for turn in range(args.turns):
+        update_canvas(current_command=f"Question {turn}", thought_process="Processing command...", clear_ai_response=True)
+        reply = ""
+        for piece in range(args.pieces):
+            reply += f"Sentence {piece} of the answer to question {turn}. "
+            update_canvas(ai_response=reply)
+            if piece % 10 == 9:
+                update_canvas(thought_process=f"Spoke {piece + 1} sentences", append_system_event=f"Turn {turn}: {piece + 1}")
+            time.sleep(args.interval)
+    flush()
+    elapsed = time.monotonic() - started
+    stop.set()
+    reader.join()
+    result = stats()
+    return result["writes"], result["bytes_written"], elapsed, counts["torn"], counts["reads"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark canvas data file writes: per update vs coalesced.")
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--pieces", type=int, default=40, help="Reply updates per turn")
+    parser.add_argument("--interval", type=float, default=0.02, help="Seconds between reply updates")
+    args = parser.parse_args()
+
+    config.CANVAS_TRANSPORT = "file"
+    print(f"{args.turns} turns of {args.pieces} reply updates {args.interval}s apart "
+          f"(flush interval {config.CANVAS_FLUSH_INTERVAL_MS} ms):")
+    for label, make in (("rewrite per update", rewrite_in_place), ("coalesced + atomic", coalesced)):
+        writes, written, elapsed, torn, reads = run(make, args)
+        print(f"  {label:<19} {writes:5d} writes ({writes / elapsed:6.1f}/s), "
+              f"{written / args.turns / 1024:7.1f} KiB/turn, {torn} torn reads of {reads}")
+
+
+if __name__ == '__main__':
+    main()
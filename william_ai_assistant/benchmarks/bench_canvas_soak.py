@@ -0,0 +1,151 @@
+# Canvas soak test: does the cost of a canvas update stay flat over a multi-hour session?
+# Compares the canvas data model canvas_utils used to have (the thought process a string grown with
+# +=, web actions an unbounded list, and a page that rebuilt every entry on each update) with ring
+# logs whose entries carry sequence numbers, which the page adds to incrementally (update.js).
+#
+#   python -m william_ai_assistant.benchmarks.bench_canvas_soak [--hours 8] [--turns-per-hour 120]
+#
+# The session runs unthrottled. Each turn looks like main.process_command's: a command, a few
+# thought process entries, a web action, system events and a reply streamed in pieces; the page
+# catches up once per turn. Reported per simulated hour: memory held by the canvas state and the
+# page, bytes of the whole state (what the data file and a new page get), microseconds per
+# update_canvas call, and page entries (DOM nodes) created + removed per catch-up. The old model's
+# file write on every update is left out; bench_canvas_flush covers those.
+import argparse
+import collections
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from william_ai_assistant import canvas_utils, config
+
+LOGS = ("thoughtProcess", "webActions", "systemEvents")
+
+
+class StringModel:
+    """The old data model, without its file writes, and a page that re-renders every entry."""
+
+    def __init__(self):
+        self.state = {"currentCommand": "", "thoughtProcess": "", "webActions": [], "aiResponse": "", "systemEvents": []}
+        self.page = {"thoughtProcess": "", "webActions": [], "systemEvents": []}
+
+    def update_canvas(self, current_command=None, thought_process=None, append_web_action=None, ai_response=None,
+                      append_system_event=None, **_):
+        state = self.state
+        if current_command is not None:
+            state["currentCommand"] = current_command
+        if thought_process is not None:
+            state["thoughtProcess"] = (state["thoughtProcess"] + f"\n{thought_process}" if state["thoughtProcess"]
+                                       else thought_process)
+        if append_web_action:
+            state["webActions"].append(append_web_action)
+        if ai_response is not None:
+            state["aiResponse"] = ai_response
+        if append_system_event:
+            state["systemEvents"].append(append_system_event)
+            if len(state["systemEvents"]) > 10:
+                state["systemEvents"] = state["systemEvents"][-10:]
+
+    def whole_state(self):
+        return self.state
+
+    def render(self):
+        """The page's work: innerHTML = '' and one <li> per entry, textContent for the thought process."""
+        nodes = len(self.page["webActions"]) + len(self.page["systemEvents"]) # Removed
+        self.page = {"thoughtProcess": self.state["thoughtProcess"], "webActions": list(self.state["webActions"]),
+                     "systemEvents": list(self.state["systemEvents"])}
+        return nodes + len(self.page["webActions"]) + len(self.page["systemEvents"]) + 1
+
+
+class RingModel:
+    """canvas_utils as it is, and the page's incremental rendering from update.js."""
+
+    def __init__(self):
+        config.CANVAS_TRANSPORT = "file"
+        canvas_utils.CANVAS_DATA_FILE_PATH = os.path.join(tempfile.mkdtemp(prefix="william-canvas-"),
+                                                          config.CANVAS_DATA_FILE)
+        canvas_utils.initialize_canvas_data_file()
+        self.update_canvas = canvas_utils.update_canvas
+        self.page = {name: collections.deque() for name in LOGS} # (seq, entry) shown
+        self.last_seq = {name: 0 for name in LOGS}
+
+    def whole_state(self):
+        with canvas_utils._canvas_lock:
+            return canvas_utils._snapshot()
+
+    def render(self):
+        nodes = 0
+        for name, update in self.whole_state()["logs"].items():
+            shown = self.page[name]
+            while shown and shown[0][0] < update["first"]:
+                shown.popleft()
+                nodes += 1
+            first_seq = update["seq"] - len(update["entries"]) + 1
+            for seq, entry in enumerate(update["entries"], first_seq):
+                if seq > self.last_seq[name]:
+                    shown.append((seq, entry))
+                    self.last_seq[name] = seq
+                    nodes += 1
+        return nodes
+
+
+def one_turn(model, turn, pieces):
+    """Returns (seconds spent in update_canvas, number of calls)."""
+    calls = [dict(current_command=f"Question number {turn}: what is the weather like in Paris tomorrow?",
+                  thought_process=f"Processing command: question number {turn}", clear_ai_response=True),
+             dict(thought_process="Routing command (checking for system commands or plugins)...")]
+    reply = ""
+    for piece in range(pieces):
+        reply += f"Sentence {piece} of a reply that streams onto the canvas as it is spoken. "
+        calls.append(dict(ai_response=reply))
+    calls += [dict(append_web_action=f"Searched the web for question {turn}"),
+              dict(thought_process="Command processed. Response spoken.", append_system_event=f"Turn {turn} done")]
+    started = time.perf_counter()
+    for call in calls:
+        model.update_canvas(**call)
+    return time.perf_counter() - started, len(calls)
+
+
+def soak(model_class, args):
+    """Yields (hour, memory bytes, state bytes, us per update, nodes per render) for each simulated hour."""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    model = model_class()
+    turn = 0
+    for hour in range(1, args.hours + 1):
+        seconds, calls, nodes = 0.0, 0, 0
+        for _ in range(args.turns_per_hour):
+            spent, count = one_turn(model, turn, args.pieces)
+            seconds += spent
+            calls += count
+            nodes += model.render()
+            turn += 1
+        gc.collect()
+        memory = tracemalloc.get_traced_memory()[0] - baseline
+        state_bytes = len(json.dumps(model.whole_state(), separators=(",", ":")))
+        yield hour, memory, state_bytes, seconds / calls * 1e6, nodes / args.turns_per_hour
+    tracemalloc.stop()
+    canvas_utils.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak-test the canvas data model over a long session.")
+    parser.add_argument("--hours", type=int, default=8, help="Simulated hours")
+    parser.add_argument("--turns-per-hour", type=int, default=120)
+    parser.add_argument("--pieces", type=int, default=20, help="Reply pieces streamed per turn")
+    args = parser.parse_args()
+
+    print(f"{args.hours} hours x {args.turns_per_hour} turns, {args.pieces} reply pieces per turn")
+    for label, model_class in (("string + full re-render", StringModel), ("ring logs + incremental", RingModel)):
+        for hour, memory, state_bytes, micros, nodes in soak(model_class, args):
+            if hour == 1:
+                print(f"{label}:\n  hour    memory KiB    state KiB    us/update    nodes/catch-up")
+            print(f"  {hour:4d}  {memory / 1024:12.1f}  {state_bytes / 1024:11.1f}  {micros:11.2f}  {nodes:16.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# Canvas update latency: the JSON data file polled every 2 s (as canvas/update.js did) vs updates
+# pushed by the canvas server as server-sent events.
+#
+#   python -m william_ai_assistant.benchmarks.bench_canvas_transport [--updates 60] [--interval 0.1] [--poll 2]
+#
+# canvas_utils.update_canvas is called --updates times, --interval seconds apart, like a reply
+# streaming onto the canvas. A reader stands in for the page: it polls the file, or reads the event
+# stream over HTTP. Latency is from the update_canvas call until the reader shows that update or a
+# newer one; updates overwritten between two polls are never seen at all.
+import argparse
+import http.client
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from william_ai_assistant import canvas_utils, config
+
+
+def poll_file(path, interval, seen, stop):
+    """Reads the data file every `interval` seconds, like the page in file mode."""
+    while not stop.wait(interval):
+        try:
+            with open(path) as f:
+                text = json.load(f)["set"].get("aiResponse", "")
+        except (OSError, ValueError):
+            continue
+        if text.startswith("update ") and text not in seen:
+            seen[text] = time.monotonic()
+
+
+def read_events(url, seen, stop, connected):
+    """Reads the server's event stream, like EventSource in the page."""
+    host, port = url.split("//", 1)[1].rstrip("/").split(":")
+    connection = http.client.HTTPConnection(host, int(port))
+    connection.request("GET", "/events")
+    response = connection.getresponse()
+    connected.set()
+    while not stop.is_set():
+        line = response.readline()
+        if not line:
+            return
+        if line.startswith(b"data: "):
+            text = json.loads(line[len(b"data: "):]).get("set", {}).get("aiResponse", "")
+            if text.startswith("update "):
+                seen[text] = time.monotonic()
+
+
+def run(transport, args):
+    """Returns (latency of each update, number seen, mean update_canvas seconds, bytes written to disk)."""
+    config.CANVAS_TRANSPORT = transport
+    canvas_utils.CANVAS_DATA_FILE_PATH = os.path.join(tempfile.mkdtemp(prefix="william-canvas-"), config.CANVAS_DATA_FILE)
+    seen, stop, connected = {}, threading.Event(), threading.Event()
+    url = canvas_utils.start_server()
+    canvas_utils.initialize_canvas_data_file()
+    if url:
+        reader = threading.Thread(target=read_events, args=(url, seen, stop, connected), daemon=True)
+    else:
+        reader = threading.Thread(target=poll_file, args=(canvas_utils.CANVAS_DATA_FILE_PATH, args.poll, seen, stop),
+                                  daemon=True)
+        connected.set()
+    reader.start()
+    connected.wait(5)
+    sent, call_seconds = {}, []
+    before = canvas_utils.stats()
+    for i in range(args.updates):
+        text = f"update {i}: " + "word " * (i % 40)
+        sent[text] = time.monotonic()
+        canvas_utils.update_canvas(ai_response=text, thought_process=f"Streaming piece {i}")
+        call_seconds.append(time.monotonic() - sent[text])
+        time.sleep(args.interval)
+    time.sleep(args.poll + 0.5 if not url else 0.5) # Let the reader catch up
+    stop.set()
+    canvas_utils.stop_server()
+    written = canvas_utils.stats()["bytes_written"] - before["bytes_written"]
+    shown = sorted((at, int(text.split()[1].rstrip(":"))) for text, at in seen.items())
+    latencies = []
+    for i, text in enumerate(sent):
+        first = next((at for at, index in shown if index >= i), None) # Overwritten updates count once a newer one shows
+        if first is not None:
+            latencies.append(first - sent[text])
+    return latencies, len(seen), statistics.mean(call_seconds), written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark canvas update latency: polled file vs pushed events.")
+    parser.add_argument("--updates", type=int, default=60)
+    parser.add_argument("--interval", type=float, default=0.1, help="Seconds between updates")
+    parser.add_argument("--poll", type=float, default=2.0, help="Polling interval of the page in file mode")
+    args = parser.parse_args()
+
+    config.CANVAS_SERVER_PORT = 0 # Any free port
+    print(f"{args.updates} canvas updates {args.interval}s apart; the file is polled every {args.poll}s:")
+    for label, transport in (("file + polling", "file"), ("server-sent events", "sse")):
+        latencies, seen, call, written = run(transport, args)
+        latency = (f"shown after p50 {statistics.median(latencies) * 1000:7.1f} ms  max {max(latencies) * 1000:7.1f} ms"
+                   if latencies else "nothing shown")
+        print(f"  {label:<19} {seen:3d}/{args.updates} updates seen, {latency}; "
+              f"update_canvas {call * 1000:.3f} ms, {written / 1024:.0f} KiB written to disk")
+
+
+if __name__ == '__main__':
+    main()
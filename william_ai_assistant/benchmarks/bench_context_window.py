@@ -0,0 +1,92 @@
+# Conversation history: the old fixed window of 6 messages vs the token-budgeted ContextManager.
+#
+#   python -m william_ai_assistant.benchmarks.bench_context_window [--turns 30] [--long-every 4] [--prefill 2000]
+#
+# A scripted conversation where every --long-every-th assistant reply is long (a recipe, a story).
+# Each turn sends the history to a local FakeOpenRouterServer that takes --delay seconds plus
+# prompt-processing time at --prefill tokens per second, so request size shows up as latency.
+# The budgeted history summarizes evicted turns with the same fake LLM, in the background.
+import argparse
+import collections
+import contextlib
+import io
+import time
+
+from william_ai_assistant import config
+
+config.ENABLE_VISUAL_CANVAS = False # Before william_brain is imported
+config.ENABLE_LLM_CACHE = False # Every run repeats the same prompts
+config.OPENROUTER_API_KEY = config.OPENROUTER_API_KEY or "benchmark"
+
+from william_ai_assistant import william_brain
+from william_ai_assistant.context_manager import ContextManager
+from william_ai_assistant.router import _history_for_llm
+from william_ai_assistant.stub_servers import FakeOpenRouterServer
+
+SHORT_REPLY = "Sure, that is an easy one and here is a short answer for you right away."
+LONG_REPLY = ("Here is the whole recipe with every step explained in detail so nothing is missed. " * 100).strip()
+
+
+class FixedWindow:
+    """The previous ContextManager: the last 6 messages, whatever their size."""
+
+    def __init__(self):
+        self.history = collections.deque(maxlen=6)
+
+    def add_message(self, role, content):
+        self.history.append({"role": role, "content": content})
+
+    def get_history(self):
+        return list(self.history)
+
+
+def run(context, args):
+    rows = []
+    for turn in range(1, args.turns + 1):
+        text = f"Question number {turn}: can you help me with the next thing on my list?"
+        context.add_message("user", text)
+        history = _history_for_llm(text, context.get_history())
+        size = william_brain.request_payload_bytes(text, history)
+        start = time.monotonic()
+        with contextlib.redirect_stdout(io.StringIO()):
+            william_brain.get_llm_response(text, command_history=history)
+        rows.append((size, time.monotonic() - start))
+        context.add_message("assistant", LONG_REPLY if turn % args.long_every == 0 else SHORT_REPLY)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark request size and LLM latency as a conversation grows.")
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--long-every", type=int, default=4, help="Every Nth reply is long (~2100 tokens)")
+    parser.add_argument("--delay", type=float, default=0.15, help="Fixed model latency in seconds")
+    parser.add_argument("--prefill", type=float, default=2000.0, help="Prompt tokens the fake model reads per second")
+    parser.add_argument("--budget", type=int, default=config.CONTEXT_TOKEN_BUDGET)
+    args = parser.parse_args()
+
+    with FakeOpenRouterServer(reply="The user is working through a list of questions.", delay=args.delay,
+                              prefill_tokens_per_second=args.prefill) as server:
+        config.OPENROUTER_API_URL = server.url
+        fixed = run(FixedWindow(), args)
+        budgeted_context = ContextManager(token_budget=args.budget)
+        requests_before = server.request_count
+        budgeted = run(budgeted_context, args)
+        budgeted_context.wait_for_summary()
+        summaries = server.request_count - requests_before - args.turns
+
+    print(f"{args.turns} turns, every {args.long_every}th reply long, model {args.delay}s + {args.prefill:.0f} prompt tokens/s:")
+    print("  turn   fixed 6 msgs: bytes      ms   budget {0} tokens: bytes      ms".format(args.budget))
+    for turn in range(0, args.turns, max(1, args.turns // 10)):
+        (fixed_bytes, fixed_s), (budget_bytes, budget_s) = fixed[turn], budgeted[turn]
+        print(f"  {turn + 1:4d}   {fixed_bytes:19d} {fixed_s * 1000:7.0f}   {budget_bytes:26d} {budget_s * 1000:7.0f}")
+    for label, rows in (("fixed 6 msgs", fixed), ("budgeted", budgeted)):
+        sizes = [size for size, _ in rows]
+        latencies = sorted(seconds for _, seconds in rows)
+        print(f"  {label:<13} bytes mean {sum(sizes) / len(sizes):7.0f} max {max(sizes):6d}   "
+              f"latency mean {sum(latencies) / len(latencies) * 1000:5.0f} ms max {latencies[-1] * 1000:5.0f} ms")
+    print(f"  Budgeted history evicted {budgeted_context.evicted_count} messages into a summary "
+          f"({summaries} background summary requests); the fixed window simply dropped them.")
+
+
+if __name__ == '__main__':
+    main()
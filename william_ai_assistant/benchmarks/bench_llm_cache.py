@@ -0,0 +1,99 @@
+# LLM response cache: cost of a hit (exact and near-duplicate) and a miss, against a real round trip.
+#
+#   python -m william_ai_assistant.benchmarks.bench_llm_cache [--entries 2000] [--lookups 20000] [--llm-delay 0.6]
+#
+# The cache is filled with --entries distinct prompts under one conversation context (the worst
+# case for the similarity tier, which scans the entries sharing the context). The round trip is
+# get_llm_response against a local FakeOpenRouterServer answering after --llm-delay seconds.
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from william_ai_assistant import config
+
+config.ENABLE_VISUAL_CANVAS = False # Before william_brain is imported
+config.OPENROUTER_API_KEY = config.OPENROUTER_API_KEY or "benchmark"
+
+from william_ai_assistant import llm_cache, william_brain
+from william_ai_assistant.llm_cache import ResponseCache
+from william_ai_assistant.stub_servers import FakeOpenRouterServer
+
+MODEL = "benchmark-model"
+TOPICS = ["France", "Spain", "Italy", "Japan", "Brazil", "Canada", "Kenya", "Norway", "Peru", "Egypt"]
+
+
+def prompt(i):
+    return f"Tell me something interesting about {TOPICS[i % len(TOPICS)]} number {i}"
+
+
+def filled_cache(entries, similarity, path=None):
+    cache = ResponseCache(path=path, max_bytes=10 ** 9, similarity=similarity)
+    for i in range(entries):
+        cache.put(prompt(i), MODEL, [], f"Reply {i}: " + "lorem ipsum " * 20)
+    return cache
+
+
+def per_lookup_us(cache, texts, lookups):
+    start = time.perf_counter()
+    for i in range(lookups):
+        cache.get(texts[i % len(texts)], MODEL, [])
+    return (time.perf_counter() - start) / lookups * 1e6
+
+
+def round_trip(llm_delay):
+    config.ENABLE_LLM_CACHE = True
+    llm_cache._cache = ResponseCache(path=None)
+    with FakeOpenRouterServer(delay=llm_delay) as server, contextlib.redirect_stdout(io.StringIO()):
+        config.OPENROUTER_API_URL = server.url
+        timings = []
+        for text in ("What's the capital of France?", "what's the capital of France", "Hey, what is the capital of France?"):
+            start = time.perf_counter()
+            william_brain.get_llm_response(text)
+            timings.append(time.perf_counter() - start)
+        return timings, server.request_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LLM response cache.")
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--llm-delay", type=float, default=0.6, help="Seconds the fake LLM takes per request")
+    args = parser.parse_args()
+
+    exact = [prompt(i) for i in range(args.entries)]
+    near = [text.replace("interesting", "intresting") for text in exact] # A misheard word: only a similar hit
+    unknown = [f"Something never asked before, variation {i}" for i in range(args.entries)]
+    print(f"Lookups in a cache of {args.entries} entries:")
+    for similarity in (0.0, config.LLM_CACHE_SIMILARITY):
+        cache = filled_cache(args.entries, similarity)
+        label = f"similarity {similarity}" if similarity else "exact only"
+        print(f"  {label:<16} exact hit {per_lookup_us(cache, exact, args.lookups):7.2f} us   "
+              f"miss {per_lookup_us(cache, unknown, args.lookups // 10):8.2f} us", end="")
+        if similarity:
+            cache.hits = cache.similar_hits = 0
+            cost = per_lookup_us(cache, near, args.lookups // 10)
+            print(f"   near-duplicate {cost:8.2f} us ({cache.similar_hits} similar hits)", end="")
+        print()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="william-cache-"), "llm_cache.json")
+    cache = filled_cache(args.entries, config.LLM_CACHE_SIMILARITY, path)
+    start = time.perf_counter()
+    cache.save()
+    saved = time.perf_counter() - start
+    start = time.perf_counter()
+    reloaded = ResponseCache(path=path)
+    loaded = time.perf_counter() - start
+    print(f"Persistence: save {saved * 1000:.1f} ms, load {loaded * 1000:.1f} ms "
+          f"({os.path.getsize(path) / 1e6:.2f} MB, {reloaded.stats()['entries']} entries)")
+
+    timings, requests_sent = round_trip(args.llm_delay)
+    print(f"get_llm_response with a {args.llm_delay}s LLM: miss {timings[0] * 1000:.1f} ms, "
+          f"exact hit {timings[1] * 1000:.3f} ms, rephrased hit {timings[2] * 1000:.3f} ms "
+          f"({requests_sent} request sent)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# OpenRouter client: a new connection per request (requests.post) vs the pooled keep-alive OpenRouterClient.
+#
+#   python -m william_ai_assistant.benchmarks.bench_llm_client [--requests 50] [--delay 0.0]
+#
+# Runs against a local HTTPS FakeOpenRouterServer with a throwaway self-signed certificate
+# (needs the openssl command). Loopback has no network round trips, so the saving shown here is
+# only the TCP + TLS set-up work; against openrouter.ai each handshake also costs 2-3 RTTs.
+import argparse
+import json
+import statistics
+import time
+
+import requests
+from william_ai_assistant import config
+from william_ai_assistant.stub_servers import FakeOpenRouterServer, self_signed_context
+from william_ai_assistant.william_brain import OpenRouterClient
+
+PAYLOAD = {"model": config.OPENROUTER_MODEL, "messages": [{"role": "user", "content": "hello"}]}
+
+
+def per_call_post(url, cert_path, count):
+    latencies = []
+    headers = {"Authorization": "Bearer benchmark", "Content-Type": "application/json"}
+    for _ in range(count):
+        start = time.perf_counter()
+        requests.post(url, headers=headers, data=json.dumps(PAYLOAD), timeout=10, verify=cert_path).raise_for_status()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def pooled_client(url, cert_path, count):
+    client = OpenRouterClient(api_url=url, verify=cert_path)
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        client.post(PAYLOAD).raise_for_status()
+        latencies.append(time.perf_counter() - start)
+    client.close()
+    return latencies, client
+
+
+def first_request(url, cert_path, prewarm):
+    client = OpenRouterClient(api_url=url, verify=cert_path)
+    if prewarm:
+        client.prewarm(wait=True) # At start-up, long before the user's first command
+    start = time.perf_counter()
+    client.post(PAYLOAD).raise_for_status()
+    elapsed = time.perf_counter() - start
+    client.close()
+    return elapsed
+
+
+def _report(label, latencies, connections):
+    latencies = [1000.0 * value for value in latencies]
+    print(f"  {label:<20} mean {statistics.mean(latencies):7.2f} ms   median {statistics.median(latencies):7.2f} ms   "
+          f"connections {connections}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark connection reuse for OpenRouter requests.")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.0, help="Model latency of the fake server in seconds")
+    args = parser.parse_args()
+
+    try:
+        context, cert_path = self_signed_context()
+    except (OSError, Exception) as e:
+        print(f"Could not create a certificate with openssl: {e}")
+        return
+    with FakeOpenRouterServer(delay=args.delay, ssl_context=context) as server:
+        print(f"{args.requests} sequential requests to {server.url}:")
+        before = server.connection_count
+        latencies = per_call_post(server.url, cert_path, args.requests)
+        _report("requests.post", latencies, server.connection_count - before)
+
+        before = server.connection_count
+        latencies, client = pooled_client(server.url, cert_path, args.requests)
+        _report("OpenRouterClient", latencies, server.connection_count - before)
+        stats = client.stats()
+        print(f"  client counters: {stats['handshakes']} handshake(s) (mean {stats['handshake']['mean_ms']:.2f} ms), "
+              f"TTFB p50 <= {stats['ttfb']['p50_ms']} ms")
+
+        cold = [first_request(server.url, cert_path, prewarm=False) for _ in range(10)]
+        warm = [first_request(server.url, cert_path, prewarm=True) for _ in range(10)]
+        print("First request of a session:")
+        _report("cold", cold, "-")
+        _report("prewarmed", warm, "-")
+
+
+if __name__ == '__main__':
+    main()
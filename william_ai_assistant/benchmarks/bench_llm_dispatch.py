@@ -0,0 +1,90 @@
+# LLM dispatch policies: sequential (fallback only after an error) vs hedged vs race.
+#
+#   python -m william_ai_assistant.benchmarks.bench_llm_dispatch [--requests 20] [--stall-rate 0.2] [--stall-seconds 6]
+#
+# A local FakeOpenRouterServer serves two models with injected latencies:
+#   "flaky primary": the primary answers in --primary-latency, but stalls for --stall-seconds
+#                    on --stall-rate of its requests; the fallback always takes --fallback-latency.
+#   "slow primary":  the primary always takes --slow-latency, more than the fallback.
+# Every request streams; the time to the first token is what the user waits for.
+import argparse
+import contextlib
+import io
+import random
+import time
+
+from william_ai_assistant import config
+
+config.ENABLE_VISUAL_CANVAS = False # Before william_brain is imported
+config.ENABLE_LLM_CACHE = False # Every run repeats the same prompts
+config.OPENROUTER_API_KEY = config.OPENROUTER_API_KEY or "benchmark"
+
+from william_ai_assistant import william_brain
+from william_ai_assistant.stub_servers import FakeOpenRouterServer
+from william_ai_assistant.william_brain import ModelDispatcher
+
+PRIMARY = "primary-model"
+FALLBACK = "fallback-model"
+REPLY = "Sure, here is a short answer that takes a moment to generate."
+
+
+def make_delay(scenario, args):
+    stalls = random.Random(args.seed) # Same stall pattern for every policy
+
+    def delay(model):
+        if model == FALLBACK:
+            return args.fallback_latency
+        if scenario == "slow primary":
+            return args.slow_latency
+        return args.stall_seconds if stalls.random() < args.stall_rate else args.primary_latency
+    return delay
+
+
+def run_policy(server, policy, args):
+    dispatcher = william_brain._dispatcher = ModelDispatcher(policy=policy, hedge_after=args.hedge_after)
+    requests_before, cancelled_before = server.request_count, server.cancelled_streams
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()): # william_brain logs every attempt
+        for _ in range(args.requests):
+            start = time.monotonic()
+            stream = william_brain.stream_llm_response("hello")
+            next(stream)
+            latencies.append(time.monotonic() - start)
+            for _ in stream:
+                pass
+    deadline = time.monotonic() + args.stall_seconds + 2
+    while server.in_flight and time.monotonic() < deadline:
+        time.sleep(0.05) # Let the losers finish, so cancellations are counted
+    latencies.sort()
+    stats = dispatcher.stats()
+    wins = ", ".join(f"{model} {stats[model]['wins']}" for model in (PRIMARY, FALLBACK) if model in stats)
+    print(f"  {policy:<10} first token mean {sum(latencies) / len(latencies):6.2f}s  "
+          f"p95 {latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]:6.2f}s  max {latencies[-1]:6.2f}s  "
+          f"requests {server.request_count - requests_before:3d}  "
+          f"cancelled {server.cancelled_streams - cancelled_before:3d}  wins: {wins}  "
+          f"order now: {' > '.join(dispatcher.preference([PRIMARY, FALLBACK]))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LLM dispatch policies against injected latencies.")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--primary-latency", type=float, default=0.3)
+    parser.add_argument("--fallback-latency", type=float, default=0.8)
+    parser.add_argument("--slow-latency", type=float, default=2.5)
+    parser.add_argument("--stall-rate", type=float, default=0.2)
+    parser.add_argument("--stall-seconds", type=float, default=6.0)
+    parser.add_argument("--hedge-after", type=float, default=config.LLM_HEDGE_AFTER_SECONDS)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    config.OPENROUTER_MODEL, config.OPENROUTER_FALLBACK_MODEL = PRIMARY, FALLBACK
+    for scenario in ("flaky primary", "slow primary"):
+        print(f"{scenario}, {args.requests} streamed requests, hedging after {args.hedge_after}s:")
+        for policy in ModelDispatcher.POLICIES:
+            with FakeOpenRouterServer(reply=REPLY, delay=make_delay(scenario, args), tokens_per_second=20) as server:
+                config.OPENROUTER_API_URL = server.url
+                run_policy(server, policy, args)
+
+
+if __name__ == '__main__':
+    main()
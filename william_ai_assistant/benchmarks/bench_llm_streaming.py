@@ -0,0 +1,60 @@
+# Time to first spoken word: waiting for the whole LLM reply vs streaming it into TTS sentence by sentence.
+#
+#   python -m william_ai_assistant.benchmarks.bench_llm_streaming [--ttft 0.4] [--tokens-per-second 30] [--runs 3]
+#
+# The LLM is a local FakeOpenRouterServer that answers after --ttft seconds and then sends one
+# word every 1 / --tokens-per-second seconds (as server-sent events when streaming, all at once
+# otherwise). Speech goes to a tts_engine.NullSink: speaking a piece takes as long as it would at TTS_RATE.
+import argparse
+import contextlib
+import io
+import statistics
+import time
+
+from william_ai_assistant import config
+
+config.ENABLE_VISUAL_CANVAS = False # Before william_brain is imported
+config.ENABLE_LLM_CACHE = False # Every run repeats the same prompts
+config.OPENROUTER_API_KEY = config.OPENROUTER_API_KEY or "benchmark"
+
+from william_ai_assistant import tts_engine, william_brain
+from william_ai_assistant.stub_servers import FakeOpenRouterServer
+
+REPLY = ("The Moon is about three hundred and eighty four thousand kilometres away, on average. "
+         "Light covers that distance in a little over a second, so you always see it as it was a moment ago. "
+         "Driving there at motorway speed would take around five months.")
+
+
+def run(streaming):
+    sink = tts_engine.NullSink() # Takes as long as speaking would and notes when each piece starts
+    worker = tts_engine._worker = tts_engine.TTSWorker(sink)
+    start = time.monotonic()
+    if streaming:
+        tts_engine.speak_stream(william_brain.stream_llm_response("how far away is the moon"))
+    else:
+        tts_engine.speak(william_brain.get_llm_response("how far away is the moon"))
+    worker.close()
+    return sink.timeline[0][0] - start, sink.timeline[-1][1] - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark time to first spoken word with and without streaming.")
+    parser.add_argument("--ttft", type=float, default=0.4, help="Seconds until the fake LLM sends its first token")
+    parser.add_argument("--tokens-per-second", type=float, default=30.0, help="Generation speed (one token = one word)")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"Reply of {len(REPLY.split())} words, first token after {args.ttft}s, "
+          f"{args.tokens_per_second} tokens/s, speaking at {config.TTS_RATE} words/min:")
+    with FakeOpenRouterServer(reply=REPLY, delay=args.ttft, tokens_per_second=args.tokens_per_second) as server:
+        config.OPENROUTER_API_URL = server.url
+        for label, streaming in (("whole reply", False), ("streamed", True)):
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = [run(streaming) for _ in range(args.runs)]
+            first = statistics.mean(r[0] for r in results)
+            done = statistics.mean(r[1] for r in results)
+            print(f"  {label:<12} first spoken word after {first:6.3f}s   finished speaking after {done:6.2f}s")
+
+
+if __name__ == '__main__':
+    main()
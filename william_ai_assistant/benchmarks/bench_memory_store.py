@@ -0,0 +1,83 @@
+# Long-term memory: write cost on the voice loop and top-k recall latency over a large store.
+#
+#   python -m william_ai_assistant.benchmarks.bench_memory_store [--turns 100000] [--queries 2000] [--k 3]
+#
+# Fills a scratch database with --turns synthetic exchanges through MemoryStore.remember (as the
+# assistant would, from the foreground), then runs --queries recalls of 2-6 word commands and
+# reports percentiles against the MEMORY_RECALL_BUDGET_MS service level.
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from william_ai_assistant import config
+from william_ai_assistant.memory_store import MemoryStore
+
+TOPICS = ["birthday", "dentist", "flight", "garage", "recipe", "password", "meeting", "invoice", "garden",
+          "football", "concert", "insurance", "holiday", "laptop", "printer", "vitamin", "mortgage", "piano"]
+
+
+def make_vocabulary(size, rng):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(size)]
+
+
+def sentence(rng, vocabulary, words):
+    # Zipf-like word choice: a few words are very common, like in real speech
+    return " ".join(vocabulary[min(len(vocabulary) - 1, int(rng.paretovariate(1.1)) - 1)] if rng.random() < 0.7
+                    else rng.choice(TOPICS) if rng.random() < 0.2 else rng.choice(vocabulary) for _ in range(words))
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the long-term memory store.")
+    parser.add_argument("--turns", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=config.MEMORY_TOP_K)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(20000, rng)
+    path = os.path.join(tempfile.mkdtemp(prefix="william-memory-"), "memory.db")
+    store = MemoryStore(path, queue_size=args.turns + 1)
+    exchanges = [(sentence(rng, vocabulary, rng.randint(4, 14)), sentence(rng, vocabulary, rng.randint(8, 40)))
+                 for _ in range(args.turns)]
+    start = time.perf_counter()
+    remember_costs = []
+    for user_text, assistant_text in exchanges:
+        call = time.perf_counter()
+        store.remember(user_text, assistant_text, created=time.time() - rng.random() * 365 * 86400)
+        remember_costs.append(time.perf_counter() - call)
+    queued = time.perf_counter() - start
+    store.flush()
+    written = time.perf_counter() - start
+    remember_costs.sort()
+    print(f"Stored {store.count()} exchanges ({os.path.getsize(path) / 1e6:.0f} MB): remember() p50 "
+          f"{percentile(remember_costs, 0.5) * 1e6:.1f} us, p99 {percentile(remember_costs, 0.99) * 1e6:.1f} us "
+          f"on the caller; {queued:.2f}s to queue, {written:.2f}s until written ({args.turns / written:,.0f}/s)")
+
+    store.session = "benchmark" # Recall skips the current session's exchanges; everything here is "earlier"
+    latencies, found = [], 0
+    for _ in range(args.queries):
+        query = sentence(rng, vocabulary, rng.randint(2, 6))
+        start = time.perf_counter()
+        found += bool(store.recall(query, k=args.k))
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    stats = store.stats()
+    print(f"Recall top-{args.k} over {args.queries} queries: p50 {percentile(latencies, 0.5) * 1000:.2f} ms, "
+          f"p95 {percentile(latencies, 0.95) * 1000:.2f} ms, p99 {percentile(latencies, 0.99) * 1000:.2f} ms, "
+          f"max {latencies[-1] * 1000:.2f} ms, mean {statistics.mean(latencies) * 1000:.2f} ms")
+    print(f"  {found} queries found memories; {stats['recall_timeouts']} interrupted at the "
+          f"{store.recall_budget_ms} ms budget (MEMORY_RECALL_BUDGET_MS)")
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
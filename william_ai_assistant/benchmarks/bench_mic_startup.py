@@ -0,0 +1,83 @@
+# Time to first captured sample: opening the microphone for every listen vs resuming the persistent stream.
+#
+#   python -m william_ai_assistant.benchmarks.bench_mic_startup [--cycles 20] [--device N]
+#   python -m william_ai_assistant.benchmarks.bench_mic_startup --file clip.wav   # without a microphone
+#
+# "per-call open" is what `with microphone as source:` did on every turn before the stream
+# was kept open: open the PyAudio stream, read the first chunk, close it again.
+# "resume" is AudioCapture.pause() followed by resume() on the stream that stays open.
+import argparse
+import statistics
+import time
+
+import speech_recognition as sr
+from william_ai_assistant import config
+from william_ai_assistant.audio_capture import AudioCapture
+
+
+def per_call_open(make_source, cycles):
+    latencies = []
+    for _ in range(cycles):
+        source = make_source()
+        start = time.perf_counter()
+        with source as s:
+            s.stream.read(s.CHUNK)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def persistent_resume(make_source, cycles, idle_seconds=0.2):
+    capture = AudioCapture(make_source(), sr.Recognizer(), recognize=lambda audio: "")
+    capture.start()
+    if not capture.wait_until_open(timeout=5):
+        raise RuntimeError(f"could not open the source: {capture.capture_error}")
+    latencies = []
+    try:
+        for _ in range(cycles):
+            capture.pause()
+            time.sleep(idle_seconds) # The assistant speaking
+            capture.resume()
+            while capture.first_sample_latency is None and capture.running:
+                time.sleep(0.001)
+            if capture.first_sample_latency is None:
+                break # A file source ran out
+            latencies.append(capture.first_sample_latency)
+    finally:
+        capture.stop()
+    return latencies
+
+
+def _report(label, latencies):
+    if not latencies:
+        print(f"{label:<16} no samples")
+        return
+    latencies = sorted(1000.0 * value for value in latencies)
+    p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+    print(f"{label:<16} mean {statistics.mean(latencies):7.2f} ms   p95 {p95:7.2f} ms   max {latencies[-1]:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark time to first captured sample.")
+    parser.add_argument("--cycles", type=int, default=20)
+    parser.add_argument("--device", type=int, default=config.MICROPHONE_INDEX, help="Microphone device index")
+    parser.add_argument("--file", help=".wav file to use instead of the microphone (played back in real time)")
+    args = parser.parse_args()
+
+    if args.file:
+        print("Using a file: opening it costs nothing, so only the resume numbers mean anything here.")
+        make_source = lambda: sr.AudioFile(args.file)
+    else:
+        try:
+            sr.Microphone.get_pyaudio()
+        except AttributeError as e:
+            print(f"No microphone support: {e}. Use --file to run without one.")
+            return
+        make_source = lambda: sr.Microphone(device_index=args.device)
+
+    print(f"Time to first captured sample over {args.cycles} listen cycles:")
+    _report("per-call open", per_call_open(make_source, args.cycles))
+    _report("resume", persistent_resume(make_source, args.cycles))
+
+
+if __name__ == '__main__':
+    main()
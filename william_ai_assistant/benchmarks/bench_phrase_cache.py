@@ -0,0 +1,59 @@
+# Wake word to acknowledgement: how long after listen_for_wake_word says "Yes?" it starts playing,
+# rendering the phrase every time vs taking it from the phrase cache (tts_engine.PhraseCache).
+#
+#   python -m william_ai_assistant.benchmarks.bench_phrase_cache [--synthesis 0.25] [--runs 20]
+#
+# Speech goes to a NullSink that simulates rendering by sleeping --synthesis seconds (about what
+# pyttsx3 takes to render a short phrase to a WAV file) and plays in no time. "restarted" is a new
+# worker and cache on the same directory, so the phrase comes from disk the first time.
+import argparse
+import contextlib
+import io
+import statistics
+import tempfile
+import time
+
+from william_ai_assistant import config, tts_engine
+
+
+def acknowledgement_latency(worker, sink):
+    """Seconds from asking for "Yes?" to it starting to play."""
+    asked = time.monotonic()
+    worker.speak_async("Yes?", priority=tts_engine.PRIORITY_PROMPT).result()
+    return sink.timeline[-1][0] - asked
+
+
+def run(args, cache_dir=None, warm=True):
+    """Returns the acknowledgement latencies in seconds and how long warming the cache took."""
+    sink = tts_engine.NullSink(speed=0, synthesis_seconds=args.synthesis)
+    cache = tts_engine.PhraseCache(cache_dir) if cache_dir else None
+    worker = tts_engine.TTSWorker(sink, phrase_cache=cache)
+    started = time.monotonic()
+    for done in worker.warm() if warm else []:
+        done.result()
+    warmed_in = time.monotonic() - started
+    latencies = [acknowledgement_latency(worker, sink) for _ in range(args.runs)]
+    worker.close()
+    return latencies, warmed_in
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark wake word acknowledgement with and without the phrase cache.")
+    parser.add_argument("--synthesis", type=float, default=0.25, help="Seconds to render one phrase")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix="william-phrases-")
+    print(f"'Yes?' after the wake word, {args.synthesis}s to render a phrase, "
+          f"{len(config.TTS_CACHED_PHRASES)} phrases in the cache:")
+    for label, directory, warm in (("no cache", None, False), ("cache, warmed", cache_dir, True),
+                                   ("restarted, not warmed", cache_dir, False)):
+        with contextlib.redirect_stdout(io.StringIO()): # The worker prints every phrase
+            latencies, warmed_in = run(args, directory, warm)
+        warming = f"; warmed in {warmed_in:.2f}s" if directory and warm else ""
+        print(f"  {label:<22} first {latencies[0] * 1000:7.2f} ms  p50 {statistics.median(latencies) * 1000:7.2f} ms  "
+              f"max {max(latencies) * 1000:7.2f} ms{warming}")
+
+
+if __name__ == '__main__':
+    main()
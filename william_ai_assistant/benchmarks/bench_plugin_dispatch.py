@@ -0,0 +1,111 @@
+# Plugin dispatch latency vs number of plugins: asking every plugin's can_handle_command in turn
+# (as PluginManager did) vs PluginManager.find_plugin, which uses the trigger index (or, with at
+# most plugin_manager.LINEAR_SCAN_MAX_PLUGINS plugins, checks each plugin's triggers in a plain loop).
+#
+#   python -m william_ai_assistant.benchmarks.bench_plugin_dispatch [--counts 10,100,1000,3000] [--seconds 1]
+#
+# Synthetic plugins are written to a temporary folder and all imported up front, so only dispatch
+# is measured. Most declare PLUGIN_KEYWORDS, 10% a PLUGIN_PATTERNS regex and 1% a pattern without
+# a literal to index. Commands are a mix that reaches a plugin and questions that go to the LLM.
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+
+from william_ai_assistant.plugin_manager import PluginManager
+
+KEYWORD_PLUGIN = '''PLUGIN_KEYWORDS = ["{word}"]
+
+class Plugin:
+    def can_handle_command(self, command_text):
+        return "{word}" in command_text
+
+    def execute_command(self, command_text, context=None):
+        return "{word}"
+'''
+
+PATTERN_PLUGIN = '''import re
+
+PLUGIN_PATTERNS = [r"{pattern}"]
+
+class Plugin:
+    def can_handle_command(self, command_text):
+        return re.search(r"{pattern}", command_text) is not None
+
+    def execute_command(self, command_text, context=None):
+        return "{pattern}"
+'''
+
+QUESTIONS = ["what's the weather like in paris tomorrow", "tell me a joke about programmers",
+             "how far away is the moon", "summarize that in one sentence", "who wrote war and peace"]
+
+
+def pseudo_word(rng):
+    return "".join(rng.choice("bcdfghklmnprstvz") + rng.choice("aeiou") for _ in range(rng.randint(3, 4)))
+
+
+def build_manager(count, rng):
+    """A PluginManager with `count` synthetic plugins, all imported, and commands for a few of them."""
+    folder = tempfile.mkdtemp(prefix="william-plugins-")
+    commands = []
+    for index in range(count):
+        word, other = pseudo_word(rng), pseudo_word(rng)
+        roll = rng.random()
+        if roll < 0.01:
+            source = PATTERN_PLUGIN.format(pattern=f"(?:{word}|{other})\\b")
+        elif roll < 0.11:
+            source = PATTERN_PLUGIN.format(pattern=f"{word} (?:on|off)")
+        else:
+            source = KEYWORD_PLUGIN.format(word=word)
+            if len(commands) < 5:
+                commands.append(f"please ask {word} to do it")
+        with open(os.path.join(folder, f"plugin_{index:05d}.py"), "w") as f:
+            f.write(source)
+    with contextlib.redirect_stdout(io.StringIO()): # "Loaded plugin: ..." for each one
+        manager = PluginManager(folder, None, lazy=False)
+    return manager, QUESTIONS + commands
+
+
+def every_plugin(manager, text):
+    """What PluginManager did before: ask each plugin in turn, lowercasing the command for each."""
+    for plugin_name, plugin_instance in manager.plugins.items():
+        if plugin_instance.can_handle_command(text.lower()):
+            return plugin_name, plugin_instance
+    return None
+
+
+def latency(find, manager, commands, seconds):
+    """Mean microseconds per command."""
+    dispatched = 0
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+    while time.perf_counter() < deadline:
+        for command in commands:
+            find(manager, command)
+        dispatched += len(commands)
+    return (time.perf_counter() - start) / dispatched * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark plugin dispatch against the number of plugins.")
+    parser.add_argument("--counts", default="10,100,1000,3000", help="Comma-separated plugin counts")
+    parser.add_argument("--seconds", type=float, default=1.0, help="Time per measurement")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    print("plugins   every plugin (us/command)     find_plugin (us/command)   speed-up")
+    for count in (int(c) for c in args.counts.split(",")):
+        manager, commands = build_manager(count, rng)
+        for command in commands: # Both must pick the same plugin when one plugin matches
+            expected, actual = every_plugin(manager, command), manager.find_plugin(command)
+            assert (expected and expected[0]) == (actual and actual[0]), command
+        linear = latency(every_plugin, manager, commands, args.seconds)
+        indexed = latency(lambda m, text: m.find_plugin(text), manager, commands, args.seconds)
+        print(f"{len(manager.manifests):7d}   {linear:25.1f}   {indexed:26.1f}   {linear / indexed:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
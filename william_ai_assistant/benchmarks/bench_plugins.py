@@ -0,0 +1,86 @@
+# Plugin startup cost: importing every plugin when the router is created (as PluginManager did)
+# vs reading their manifests, from the source or from the manifest cache, and importing on first use.
+#
+#   python -m william_ai_assistant.benchmarks.bench_plugins [--plugins 150] [--weight 2000] [--repeat 5]
+#
+# --plugins synthetic plugins are written to a temporary folder. Each declares PLUGIN_KEYWORDS and
+# does --weight units of module-level set-up work when imported, like building a lookup table.
+# Their bytecode is compiled once before measuring, so imports don't include compiling.
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+
+from william_ai_assistant.plugin_manager import PluginManager
+
+PLUGIN_SOURCE = '''# Synthetic plugin {index}
+import json
+
+PLUGIN_KEYWORDS = ["{keyword}"]
+PLUGIN_ENTRY_POINT = "Plugin{index}"
+
+_TABLE = {{i: json.dumps([i, "{keyword}"]) for i in range({weight})}} # Set-up work done on import
+
+
+class Plugin{index}:
+    def can_handle_command(self, command_text):
+        return "{keyword}" in command_text
+
+    def execute_command(self, command_text, context=None):
+        return "Plugin {index} handled: " + command_text
+'''
+
+
+def write_plugins(folder, count, weight):
+    """Returns the keyword of each plugin."""
+    keywords = []
+    for index in range(count):
+        keyword = f"skill{index:04d}"
+        with open(os.path.join(folder, f"plugin_{index:04d}.py"), "w") as f:
+            f.write(PLUGIN_SOURCE.format(index=index, keyword=keyword, weight=weight))
+        keywords.append(keyword)
+    return keywords
+
+
+def timed(make):
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()): # "Loaded plugin: ..." for each import
+        result = make()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark plugin discovery: eager imports vs manifests.")
+    parser.add_argument("--plugins", type=int, default=150)
+    parser.add_argument("--weight", type=int, default=2000, help="Set-up work per plugin import")
+    parser.add_argument("--repeat", type=int, default=5, help="Startups measured per mode (median reported)")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="william-plugins-")
+    cache_path = os.path.join(folder, "manifests.json")
+    keywords = write_plugins(folder, args.plugins, args.weight)
+    commands = [f"please run {keywords[0]} now", f"ask {keywords[len(keywords) // 2]} about it",
+                "what's the capital of france", f"run {keywords[0]} again"]
+    timed(lambda: PluginManager(folder, None, lazy=False)) # Compiles every plugin's bytecode
+
+    modes = [("eager imports", lambda: PluginManager(folder, None, lazy=False)),
+             ("manifests from source", lambda: PluginManager(folder, None, lazy=True)),
+             ("cached manifests", lambda: PluginManager(folder, cache_path, lazy=True))]
+    print(f"{args.plugins} plugins, {args.weight} set-up units each; startup is the median of {args.repeat}:")
+    print("mode                     startup ms   imports   files parsed   then routing 4 commands: ms, imports")
+    for label, make in modes:
+        startups = []
+        for _ in range(args.repeat):
+            manager, seconds = timed(make)
+            startups.append(seconds)
+        imports_at_startup, parsed = manager.imports, manager.manifests_parsed
+        _, routing = timed(lambda: [manager.find_plugin(command) for command in commands])
+        print(f"{label:<23} {statistics.median(startups) * 1000:11.1f} {imports_at_startup:9d} {parsed:14d}"
+              f"   {routing * 1000:24.1f} ms, {manager.imports} imports")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# Route selection speed vs number of routes: trying every pattern in turn vs the keyword prefilter
+# (keyword_index.KeywordAutomaton) that CommandRouter uses.
+#
+#   python -m william_ai_assistant.benchmarks.bench_router [--counts 17,100,1000,5000] [--seconds 1]
+#
+# The router starts with its default routes; synthetic plugin-style routes ("<word> <word> (.+)")
+# are added to reach each count, 1% of them without a literal to index. Commands are a mix of
+# built-in commands, synthetic commands and questions that match no route and go to the LLM.
+import argparse
+import random
+import time
+
+from william_ai_assistant.router import CommandRouter
+
+COMMANDS = ["search for cute kittens on google", "play some music", "please turn up the volume",
+            "set volume to 40 percent", "unmute my system", "open calculator",
+            "what's the weather like in paris tomorrow", "tell me a joke about programmers",
+            "how far away is the moon", "summarize that in one sentence"]
+
+
+def pseudo_word(rng):
+    return "".join(rng.choice("bcdfghklmnprstvz") + rng.choice("aeiou") for _ in range(rng.randint(2, 4)))
+
+
+def build_router(count, rng):
+    """A CommandRouter with `count` routes and a few commands that match the synthetic ones."""
+    router = CommandRouter()
+    commands = []
+    while len(router.routes) < count:
+        first, second = pseudo_word(rng), pseudo_word(rng)
+        if rng.random() < 0.01:
+            router.add_route(f"(?:{first}|{second})\\b", lambda: "ok")
+        else:
+            router.add_route(f"{first} {second} (.+)", lambda query: query, pass_query_group=1)
+            if len(commands) < 5:
+                commands.append(f"please {first} {second} the lights")
+    return router, COMMANDS + commands
+
+
+def linear_match(router, text):
+    """What CommandRouter did before: search every pattern, in order, until one matches."""
+    for route in router.routes:
+        match = route.pattern.search(text)
+        if match:
+            return route, match
+    return None
+
+
+def throughput(match, router, commands, seconds):
+    """Commands routed per second."""
+    routed = 0
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+    while time.perf_counter() < deadline:
+        for command in commands:
+            match(router, command)
+        routed += len(commands)
+    return routed / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark route selection against the number of routes.")
+    parser.add_argument("--counts", default="17,100,1000,5000", help="Comma-separated route counts")
+    parser.add_argument("--seconds", type=float, default=1.0, help="Time per measurement")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    print("routes   every pattern (routes/s)   keyword prefilter (routes/s)   speed-up")
+    for count in (int(c) for c in args.counts.split(",")):
+        router, commands = build_router(count, rng)
+        for command in commands: # Both must pick the same route
+            expected, actual = linear_match(router, command), router._match_route(command)
+            assert (expected and expected[0]) is (actual and actual[0]), command
+        linear = throughput(linear_match, router, commands, args.seconds)
+        indexed = throughput(lambda r, text: r._match_route(text), router, commands, args.seconds)
+        print(f"{len(router.routes):6d}   {linear:24,.0f}   {indexed:28,.0f}   {indexed / linear:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# Cost of the tracing layer, enabled and disabled, per span and per turn.
+#
+#   python -m william_ai_assistant.benchmarks.bench_tracing [--spans 200000] [--turn-seconds 0.5]
+#
+# A turn records about SPANS_PER_TURN spans (capture, stt, route, plugin or llm, tts, turn).
+# The per-turn overhead is compared against --turn-seconds, a deliberately short turn;
+# real turns with a cloud LLM take a second or more.
+import argparse
+import time
+
+from william_ai_assistant import tracing
+
+SPANS_PER_TURN = 6
+
+
+def _work():
+    pass
+
+
+def per_span_seconds(spans, enabled):
+    tracing.enabled = enabled
+    tracing.reset()
+    traced_work = tracing.traced("work")(_work)
+    start = time.perf_counter()
+    for _ in range(spans // 2):
+        with tracing.span("block", n=1):
+            _work()
+        traced_work()
+    elapsed = time.perf_counter() - start
+    tracing.reset()
+    return elapsed / (spans // 2 * 2)
+
+
+def baseline_seconds(spans):
+    start = time.perf_counter()
+    for _ in range(spans):
+        _work()
+    return (time.perf_counter() - start) / spans
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the tracing overhead.")
+    parser.add_argument("--spans", type=int, default=200000)
+    parser.add_argument("--turn-seconds", type=float, default=0.5, help="Turn length to compare the overhead with")
+    args = parser.parse_args()
+
+    base = baseline_seconds(args.spans)
+    disabled = per_span_seconds(args.spans, enabled=False) - base
+    enabled = per_span_seconds(args.spans, enabled=True) - base
+    print(f"Per span (minus the bare call): disabled {disabled * 1e6:6.2f} us, enabled {enabled * 1e6:6.2f} us")
+    for label, cost in (("disabled", disabled), ("enabled", enabled)):
+        per_turn = cost * SPANS_PER_TURN
+        print(f"  {label:<9} {per_turn * 1e6:7.2f} us per turn = {per_turn / args.turn_seconds:.5%} of a {args.turn_seconds}s turn")
+    tracing.enabled = True
+    tracing.begin_turn()
+    start = time.perf_counter()
+    tracing.end_turn()
+    summary_cost = time.perf_counter() - start
+    print(f"  closing a turn: {summary_cost * 1e6:.2f} us (the summary printed every "
+          f"TRACE_SUMMARY_EVERY_TURNS turns sorts at most TRACE_SUMMARY_WINDOW values per span name)")
+
+
+if __name__ == '__main__':
+    main()
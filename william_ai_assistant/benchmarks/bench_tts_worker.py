@@ -0,0 +1,124 @@
+# The speech worker (tts_engine.TTSWorker) on a NullSink: how long callers block, the silence
+# between sentences with and without pre-synthesis, how quickly cancel() silences speech and how
+# long a prompt waits behind a queued reply.
+#
+#   python -m william_ai_assistant.benchmarks.bench_tts_worker [--sentences 5] [--synthesis 0.15] [--speed 4]
+#
+# Rendering a sentence is simulated by sleeping --synthesis seconds; speaking takes as long as it
+# would at TTS_RATE, divided by --speed. Without pre-synthesis every sentence is rendered and then
+# played, as with pyttsx3's runAndWait, so each one starts after a silence of --synthesis seconds.
+import argparse
+import contextlib
+import io
+import statistics
+import time
+
+from william_ai_assistant import config, tts_engine
+
+SENTENCES = ["The Moon is about three hundred and eighty four thousand kilometres away.",
+             "Light covers that distance in a little over a second.",
+             "So you always see it as it was a moment ago.",
+             "Driving there at motorway speed would take around five months.",
+             "The Apollo astronauts needed about three days.",
+             "And the Moon drifts away by almost four centimetres every year."]
+
+
+def reply(count):
+    return [SENTENCES[i % len(SENTENCES)] for i in range(count)]
+
+
+def caller_blocked(args):
+    """Seconds the caller spends handing over the reply: speak() per sentence vs speak_async()."""
+    results = {}
+    for label, blocking in (("speak", True), ("speak_async", False)):
+        sink = tts_engine.NullSink(args.speed, args.synthesis)
+        worker = tts_engine.TTSWorker(sink)
+        start = time.monotonic()
+        if blocking:
+            for sentence in reply(args.sentences):
+                worker.speak_async(sentence).result()
+        else:
+            queued = [worker.speak_async(sentence) for sentence in reply(args.sentences)]
+        results[label] = time.monotonic() - start
+        if not blocking:
+            queued[-1].result()
+        worker.close()
+    return results
+
+
+def gaps(presynthesize, args):
+    """Silences between consecutive sentences of one reply, in seconds."""
+    sink = tts_engine.NullSink(args.speed, args.synthesis)
+    worker = tts_engine.TTSWorker(sink, presynthesize=presynthesize)
+    queued = [worker.speak_async(sentence) for sentence in reply(args.sentences)]
+    queued[-1].result()
+    worker.close()
+    return [start - end for (_, end), (start, _) in zip(sink.timeline, sink.timeline[1:])]
+
+
+def cancel_latency(args, runs=20):
+    """Seconds from cancel() until the sink stopped playing, and how many queued sentences were dropped."""
+    latencies, dropped = [], []
+    for _ in range(runs):
+        sink = tts_engine.NullSink(args.speed)
+        worker = tts_engine.TTSWorker(sink)
+        queued = [worker.speak_async(sentence) for sentence in reply(args.sentences)]
+        while not sink.spoken: # Wait for the first sentence to start
+            time.sleep(0.001)
+        time.sleep(0.05)
+        cancelled_at = time.monotonic()
+        worker.cancel()
+        queued[0].result()
+        latencies.append(sink.timeline[-1][1] - cancelled_at)
+        dropped.append(sum(1 for done in queued[1:] if not done.result()))
+        worker.close()
+    return latencies, dropped
+
+
+def prompt_wait(args):
+    """
+    Seconds until a prompt queued during a reply starts playing, at reply and at prompt priority.
+    At prompt priority it still waits for the sentence playing and the one already rendered.
+    """
+    results = {}
+    for label, priority in (("reply priority", tts_engine.PRIORITY_REPLY), ("prompt priority", tts_engine.PRIORITY_PROMPT)):
+        sink = tts_engine.NullSink(args.speed, args.synthesis)
+        worker = tts_engine.TTSWorker(sink)
+        for sentence in reply(args.sentences):
+            worker.speak_async(sentence)
+        while not sink.spoken: # The reply is playing and the next sentence is already rendered
+            time.sleep(0.001)
+        queued_at = time.monotonic()
+        worker.speak_async("Yes?", priority=priority).result()
+        results[label] = sink.timeline[sink.spoken.index("Yes?")][0] - queued_at
+        worker.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the speech worker with a null sink.")
+    parser.add_argument("--sentences", type=int, default=5, help="Sentences per reply")
+    parser.add_argument("--synthesis", type=float, default=0.15, help="Seconds to render one sentence")
+    parser.add_argument("--speed", type=float, default=4.0, help="Speaking time is divided by this")
+    args = parser.parse_args()
+
+    print(f"{args.sentences} sentences per reply, {args.synthesis}s to render each, "
+          f"speaking at {config.TTS_RATE} words/min x{args.speed:g}:")
+    with contextlib.redirect_stdout(io.StringIO()): # The worker prints every sentence
+        blocked = caller_blocked(args)
+        silences = {presynthesize: gaps(presynthesize, args) for presynthesize in (False, True)}
+        latencies, dropped = cancel_latency(args)
+        waits = prompt_wait(args)
+    print(f"  caller blocked: speak() per sentence {blocked['speak']:6.3f}s, speak_async() {blocked['speak_async'] * 1000:6.3f} ms")
+    for presynthesize, silence in silences.items():
+        label = "pre-synthesis on" if presynthesize else "pre-synthesis off"
+        print(f"  {label:<18} gap between sentences: mean {statistics.mean(silence) * 1000:7.2f} ms  "
+              f"max {max(silence) * 1000:7.2f} ms")
+    print(f"  cancel() to silence: p50 {statistics.median(latencies) * 1000:.2f} ms  max {max(latencies) * 1000:.2f} ms; "
+          f"{statistics.mean(dropped):.1f} queued sentences dropped per cancel")
+    for label, wait in waits.items():
+        print(f"  'Yes?' queued behind a reply, {label:<15}: starts after {wait:6.3f}s")
+
+
+if __name__ == '__main__':
+    main()
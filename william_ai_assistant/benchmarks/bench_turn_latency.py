@@ -0,0 +1,154 @@
+# End of speech to response ready: waiting for the final transcript vs routing on stable partials.
+#
+#   python -m william_ai_assistant.benchmarks.bench_turn_latency [--clips DIR] [--stt-delay 0.3] [--llm-delay 0.6]
+#
+# Each clip goes through a real AudioCapture (played back in real time), StubSTTServer for the
+# final transcript and FakeOpenRouterServer for the LLM. DIR holds name.wav + name.txt pairs
+# (the .txt is the transcript); without --clips a synthetic utterance is used. The response
+# being ready stands in for the first audio out, since TTS time is the same in both modes.
+#
+# Partials come from a scripted streaming session that reveals the transcript in proportion to
+# the audio it has been fed, so the numbers show what speculation saves with a streaming
+# recognizer such as Vosk, not how fast any particular recognizer is.
+import argparse
+import glob
+import os
+import statistics
+import tempfile
+import time
+import wave
+
+import numpy as np
+import speech_recognition as sr
+from william_ai_assistant import config
+
+config.ENABLE_VISUAL_CANVAS = False # Before the router imports william_brain
+config.ENABLE_LLM_CACHE = False # Every run repeats the same prompts
+config.OPENROUTER_API_KEY = config.OPENROUTER_API_KEY or "benchmark"
+
+from william_ai_assistant.audio_capture import AudioCapture
+from william_ai_assistant.router import CommandRouter
+from william_ai_assistant.stt_backends import StreamingSession, StubServerBackend
+from william_ai_assistant.stub_servers import FakeOpenRouterServer, StubSTTServer
+from william_ai_assistant.vad import VoiceActivityDetector, to_pcm16
+
+DEFAULT_TRANSCRIPT = "tell me something interesting about the moon"
+
+
+class ScriptedStream(StreamingSession):
+    """Reveals the words of a known transcript as the audio of the phrase arrives."""
+
+    def __init__(self, transcript, sample_rate, phrase_seconds):
+        self.words = transcript.split()
+        self.bytes_per_word = phrase_seconds * sample_rate * 2 / len(self.words)
+        self.fed = 0
+
+    def accept(self, pcm):
+        self.fed += len(pcm)
+        return " ".join(self.words[:int(self.fed / self.bytes_per_word)])
+
+
+def _synthetic_clip(path, sample_rate=16000, speech_seconds=1.8):
+    rng = np.random.default_rng(0)
+    t = np.arange(int(speech_seconds * sample_rate)) / sample_rate
+    voiced = np.sin(2 * np.pi * 130 * t) + 0.6 * np.sin(2 * np.pi * 520 * t) + 0.3 * np.sin(2 * np.pi * 1300 * t)
+    speech = 3000 * voiced * np.clip(np.sin(2 * np.pi * 4 * t), 0.15, 1.0)
+    silence = np.zeros(sample_rate)
+    samples = np.concatenate([silence, speech, silence, silence])
+    samples += rng.normal(0, 40, len(samples))
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(samples.astype(np.int16).tobytes())
+
+
+def _speech_span(path):
+    """(start, end) of the speech in a clip in seconds, as the VAD sees it."""
+    with sr.AudioFile(path) as source:
+        audio = sr.Recognizer().record(source)
+    vad = VoiceActivityDetector(audio.sample_rate)
+    active = np.flatnonzero(vad.process(to_pcm16(audio.frame_data, audio.sample_width)))
+    if len(active) == 0:
+        raise ValueError(f"no speech found in {path}")
+    start = active[0] * vad.frame_seconds
+    end = (active[-1] + 1 - vad.hangover_frames) * vad.frame_seconds # The last frames are hangover
+    return start, end, audio.sample_rate
+
+
+def run_turn(path, transcript, router, stt_url, speculative):
+    """Returns seconds from the end of speech until the response is ready."""
+    config.SPECULATIVE_LLM_CALLS = speculative
+    speech_start, speech_end, sample_rate = _speech_span(path)
+    recognizer = sr.Recognizer()
+    recognizer.non_speaking_duration = config.NON_SPEAKING_DURATION
+    phrase_seconds = speech_end - speech_start + recognizer.non_speaking_duration # Pre-roll is fed too
+    start_stream = None
+    if speculative:
+        start_stream = lambda rate: ScriptedStream(transcript, rate, phrase_seconds)
+    backend = StubServerBackend(stt_url)
+    capture = AudioCapture(sr.AudioFile(path), recognizer, recognize=backend.recognize, start_stream=start_stream)
+    capture.streaming = True
+    capture.start()
+    try:
+        if not capture.wait_until_open(timeout=5):
+            raise RuntimeError(f"could not open {path}: {capture.capture_error}")
+        started = time.monotonic() # Real-time playback starts as soon as the file is open
+        result = None
+        while result is None:
+            partial = capture.next_partial()
+            if partial is not None:
+                if partial.stable_text:
+                    router.speculate(partial.stable_text, history=[], complete=partial.stable_text == partial.text)
+                continue
+            result = capture.next_result(timeout=0.005)
+            if result is None and capture.finished.is_set():
+                raise RuntimeError(f"no phrase recognized in {path}")
+        if result.error is not None:
+            raise result.error
+        router.route(result.text, history=[{"role": "user", "content": result.text}])
+        return time.monotonic() - (started + speech_end)
+    finally:
+        capture.stop()
+
+
+def _report(label, latencies):
+    print(f"  {label:<12} mean {statistics.mean(latencies):6.3f}s   min {min(latencies):6.3f}s   max {max(latencies):6.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark end of speech to response ready.")
+    parser.add_argument("--clips", help="Directory of name.wav + name.txt pairs (default: one synthetic clip)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per clip and mode")
+    parser.add_argument("--stt-delay", type=float, default=0.3, help="Seconds the stub STT server takes per phrase")
+    parser.add_argument("--llm-delay", type=float, default=0.6, help="Seconds the fake LLM takes per request")
+    args = parser.parse_args()
+
+    clips = []
+    if args.clips:
+        for path in sorted(glob.glob(os.path.join(args.clips, "*.wav"))):
+            with open(os.path.splitext(path)[0] + ".txt") as f:
+                clips.append((path, f.read().strip().lower()))
+    else:
+        path = os.path.join(tempfile.mkdtemp(), "synthetic.wav")
+        _synthetic_clip(path)
+        clips.append((path, DEFAULT_TRANSCRIPT))
+
+    with StubSTTServer(delay=args.stt_delay) as stt, FakeOpenRouterServer(delay=args.llm_delay) as llm:
+        config.OPENROUTER_API_URL = llm.url
+        router = CommandRouter()
+        results = {False: [], True: []}
+        for path, transcript in clips:
+            stt.default_transcript = transcript
+            for _ in range(args.repeat):
+                for speculative in (False, True):
+                    results[speculative].append(run_turn(path, transcript, router, stt.url, speculative))
+        print(f"End of speech to response ready, {len(clips)} clip(s) x {args.repeat} "
+              f"(STT {args.stt_delay}s, LLM {args.llm_delay}s, VAD hangover {config.VAD_HANGOVER_SECONDS}s):")
+        _report("final only", results[False])
+        _report("speculative", results[True])
+        print(f"  LLM requests: {llm.request_count} for {2 * len(clips) * args.repeat} turns")
+
+
+if __name__ == '__main__':
+    main()
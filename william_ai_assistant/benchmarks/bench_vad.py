@@ -0,0 +1,128 @@
+# Voice activity detector benchmark: CPU per hour of idle audio, false triggers, and endpointing latency.
+#
+#   python -m william_ai_assistant.benchmarks.bench_vad [--idle room.wav] [--minutes 10]
+#
+# Without --idle, synthetic room noise (white noise plus mains hum) is used. The per-chunk
+# audioop.rms check that Recognizer.listen does is timed on the same audio for comparison
+# when audioop is available (it was removed in Python 3.13).
+import argparse
+import time
+
+import numpy as np
+import speech_recognition as sr
+from william_ai_assistant import config
+from william_ai_assistant.vad import VoiceActivityDetector, to_pcm16
+
+CHUNK = 1024 # sr.Microphone's default chunk size
+
+
+def _room_noise(seconds, sample_rate, rng):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    samples = rng.normal(0, 40, len(t)) + 30 * np.sin(2 * np.pi * 50 * t)
+    return samples.astype(np.int16).tobytes()
+
+
+def _utterance(seconds, sample_rate, rng):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    voiced = np.sin(2 * np.pi * 130 * t) + 0.6 * np.sin(2 * np.pi * 520 * t) + 0.3 * np.sin(2 * np.pi * 1300 * t)
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0.15, 1.0) # Syllables
+    return (3000 * voiced * envelope + rng.normal(0, 40, len(t))).astype(np.int16).tobytes()
+
+
+def idle_cpu(data, sample_rate):
+    """Runs the VAD over `data` in the segmenter's idle read size. Returns (CPU seconds, fraction flagged as speech)."""
+    vad = VoiceActivityDetector(sample_rate)
+    step = max(1, int(config.VAD_IDLE_READ_SECONDS / vad.frame_seconds)) * vad.frame_bytes
+    vad.process(data[:step]) # Noise floor estimate, as on a real start-up
+    active = frames = 0
+    start = time.process_time()
+    for offset in range(step, len(data), step):
+        speech = vad.process(data[offset:offset + step])
+        active += int(speech.sum())
+        frames += len(speech)
+    return time.process_time() - start, active / max(frames, 1)
+
+
+def audioop_cpu(data):
+    """Times the old per-chunk energy check (audioop.rms plus the dynamic threshold update)."""
+    try:
+        import audioop
+    except ImportError:
+        return None
+    recognizer = sr.Recognizer()
+    step = CHUNK * 2
+    seconds_per_buffer = CHUNK / 16000
+    start = time.process_time()
+    for offset in range(0, len(data), step):
+        energy = audioop.rms(data[offset:offset + step], 2)
+        if energy <= recognizer.energy_threshold:
+            damping = recognizer.dynamic_energy_adjustment_damping ** seconds_per_buffer
+            target_energy = energy * recognizer.dynamic_energy_ratio
+            recognizer.energy_threshold = recognizer.energy_threshold * damping + target_energy * (1 - damping)
+    return time.process_time() - start
+
+
+def endpoint_latency(noise, sample_rate, rng, trials=20):
+    """Seconds from the end of speech to the frame where the VAD reports silence, read in microphone chunks."""
+    latencies = []
+    for trial in range(trials):
+        vad = VoiceActivityDetector(sample_rate)
+        speech = _utterance(0.6 + 0.1 * (trial % 10), sample_rate, rng)
+        lead = noise[:2 * sample_rate * 2] # Two seconds of 16-bit samples
+        stream = lead + speech + lead
+        step = max(1, CHUNK // vad.frame_length) * vad.frame_bytes
+        speech_end = (len(lead) + len(speech)) / 2 / sample_rate
+        frame_index, ended_at, was_speech = 0, None, False
+        for offset in range(0, len(stream), step):
+            flags = vad.process(stream[offset:offset + step])
+            for is_speech in flags:
+                frame_index += 1
+                if was_speech and not is_speech and frame_index * vad.frame_seconds > speech_end:
+                    ended_at = (offset + step) / 2 / sample_rate # The decision is available once this read completes
+                    break
+                was_speech = was_speech or is_speech
+            if ended_at is not None:
+                break
+        if ended_at is not None:
+            latencies.append(ended_at - speech_end)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the voice activity detector.")
+    parser.add_argument("--idle", help=".wav recording of the room without speech (default: synthetic noise)")
+    parser.add_argument("--minutes", type=float, default=10.0, help="Minutes of synthetic idle audio")
+    parser.add_argument("--rate", type=int, default=16000, help="Sample rate of the synthetic audio")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.idle:
+        with sr.AudioFile(args.idle) as source:
+            audio = sr.Recognizer().record(source)
+        sample_rate, data = audio.sample_rate, to_pcm16(audio.frame_data, audio.sample_width)
+    else:
+        sample_rate, data = args.rate, _room_noise(args.minutes * 60, args.rate, rng)
+    seconds = len(data) / 2 / sample_rate
+    per_hour = 3600.0 / seconds
+
+    vad_seconds, false_rate = idle_cpu(data, sample_rate)
+    print(f"Idle audio: {seconds / 60:.1f} min at {sample_rate} Hz")
+    print(f"  VAD ({config.VAD_IDLE_READ_SECONDS}s reads)        {vad_seconds * per_hour:8.2f} CPU s / hour, "
+          f"{false_rate:.2%} of frames flagged as speech")
+    legacy_seconds = audioop_cpu(data)
+    if legacy_seconds is None:
+        print("  audioop.rms per chunk       (audioop not available)")
+    else:
+        print(f"  audioop.rms per chunk       {legacy_seconds * per_hour:8.2f} CPU s / hour")
+
+    latencies = endpoint_latency(data if len(data) >= sample_rate * 8 else _room_noise(4, sample_rate, rng),
+                                 sample_rate, rng)
+    if latencies:
+        print(f"Endpointing: mean {np.mean(latencies):.3f}s, max {np.max(latencies):.3f}s after speech ends "
+              f"({len(latencies)} utterances; VAD_HANGOVER_SECONDS = {config.VAD_HANGOVER_SECONDS}s)")
+    else:
+        print("Endpointing: no utterance was detected.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# Wake word spotter benchmark: false-accept / false-reject rates and CPU cost on recorded clips.
+#
+#   python -m william_ai_assistant.benchmarks.bench_wake_word \
+#       --positives clips/wake --negatives clips/other [--templates DIR] [--sensitivity 0.35]
+#
+# `positives` holds .wav clips that contain the wake word, `negatives` holds clips that don't
+# (background noise, TV, other speech). Templates default to the enrolled ones.
+import argparse
+import glob
+import os
+import time
+
+import speech_recognition as sr
+from william_ai_assistant import config
+from william_ai_assistant.wake_word import WAKE_WORD_TEMPLATE_DIR_PATH, WakeWordSpotter
+
+
+def _load_clips(directory):
+    clips = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.wav"))):
+        with sr.AudioFile(path) as source:
+            clips.append((path, sr.Recognizer().record(source)))
+    return clips
+
+
+def evaluate(spotter, positives, negatives):
+    """
+    Runs the spotter over both clip sets.
+
+    Returns:
+        dict: false_accept_rate, false_reject_rate, cpu_seconds_per_audio_second and counts.
+    """
+    false_rejects = false_accepts = 0
+    cpu_seconds = audio_seconds = 0.0
+    for expected, clips in ((True, positives), (False, negatives)):
+        for _, audio in clips:
+            audio_seconds += len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+            start = time.process_time()
+            detected, _ = spotter.detect(audio)
+            cpu_seconds += time.process_time() - start
+            if expected and not detected:
+                false_rejects += 1
+            elif detected and not expected:
+                false_accepts += 1
+    return {
+        "positives": len(positives),
+        "negatives": len(negatives),
+        "false_accept_rate": false_accepts / len(negatives) if negatives else 0.0,
+        "false_reject_rate": false_rejects / len(positives) if positives else 0.0,
+        "cpu_seconds_per_audio_second": cpu_seconds / audio_seconds if audio_seconds else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the offline wake word spotter.")
+    parser.add_argument("--positives", required=True, help="Folder of .wav clips containing the wake word")
+    parser.add_argument("--negatives", required=True, help="Folder of .wav clips without the wake word")
+    parser.add_argument("--templates", default=WAKE_WORD_TEMPLATE_DIR_PATH, help="Folder of wake word templates")
+    parser.add_argument("--sensitivity", type=float, nargs="*", default=[config.WAKE_WORD_SENSITIVITY],
+                        help="One or more sensitivity thresholds to sweep")
+    args = parser.parse_args()
+
+    spotter = WakeWordSpotter.from_directory(args.templates)
+    if spotter is None:
+        print(f"No templates found in {args.templates}.")
+        return
+    positives, negatives = _load_clips(args.positives), _load_clips(args.negatives)
+
+    print(f"{'sensitivity':>11}  {'false accept':>12}  {'false reject':>12}  {'CPU s / audio s':>15}")
+    for sensitivity in args.sensitivity:
+        spotter.sensitivity = sensitivity
+        stats = evaluate(spotter, positives, negatives)
+        print(f"{sensitivity:>11.3f}  {stats['false_accept_rate']:>12.1%}  {stats['false_reject_rate']:>12.1%}  "
+              f"{stats['cpu_seconds_per_audio_second']:>15.5f}")
+    print(f"({len(positives)} positive and {len(negatives)} negative clips)")
+
+
+if __name__ == '__main__':
+    main()
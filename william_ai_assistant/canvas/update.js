@@ -6,14 +6,90 @@ document.addEventListener('DOMContentLoaded', () => {
     const aiResponseEl = document.querySelector('#ai-response p');
     const systemEventsEl = document.querySelector('#system-events ul');
 
-    // Placeholder for where the data will come from (e.g., a local JSON file or WebSocket)
-    const DATA_SOURCE_URL = 'william_canvas_data.json'; // Example: polling a JSON file
+    // Served by William's canvas server (canvas_server.py), updates are pushed as server-sent
+    // events: the whole state once, then only what changed. Opened as a file, the page
+    // falls back to polling the JSON data file the backend writes in file mode.
+    const EVENTS_URL = '/events';
+    const DATA_SOURCE_URL = '../william_canvas_data.json'; // Next to the canvas/ folder
     const POLLING_INTERVAL = 2000; // Poll every 2 seconds
 
+    // The thought process, web actions and system events are logs whose entries are numbered by
+    // the backend. Each update carries {first, seq, entries}: the entries are numbered up to seq,
+    // and anything before first has been dropped. Only entries newer than the last one shown are
+    // added to the page and only dropped ones removed, so an update costs the same after hours.
+    const logs = {
+        thoughtProcess: { el: thoughtProcessEl, tag: 'span', lastSeq: 0 },
+        webActions: { el: webActionsEl, tag: 'li', lastSeq: 0 },
+        systemEvents: { el: systemEventsEl, tag: 'li', lastSeq: 0 },
+    };
+    let session = null;
+
+    function clearLogs() {
+        Object.values(logs).forEach(log => {
+            log.el.textContent = ''; // Also removes placeholder and status messages
+            log.lastSeq = 0;
+        });
+    }
+
+    function applyLog(log, update) {
+        if (update.seq < log.lastSeq) { // Numbering started again
+            log.el.textContent = '';
+            log.lastSeq = 0;
+        }
+        while (log.el.firstChild && !(Number(log.el.firstChild.dataset && log.el.firstChild.dataset.seq) >= update.first)) {
+            log.el.removeChild(log.el.firstChild);
+        }
+        const firstSeq = update.seq - update.entries.length + 1;
+        update.entries.forEach((entry, i) => {
+            const seq = firstSeq + i;
+            if (seq <= log.lastSeq) {
+                return; // Already shown
+            }
+            const item = document.createElement(log.tag);
+            item.dataset.seq = seq;
+            // Potentially add status badges or icons here based on event type
+            item.textContent = log.tag === 'span' ? entry + '\n' : entry;
+            log.el.appendChild(item);
+            log.lastSeq = seq;
+        });
+    }
+
+    // Applies {session, set: {field: value}, logs: {name: {first, seq, entries}}}: a patch, a snapshot
+    // (`reset`) or the data file
+    function applyUpdate(data, reset) {
+        if (reset || data.session !== session) {
+            clearLogs();
+            session = data.session;
+        }
+        const set = data.set || {};
+        if ('currentCommand' in set) {
+            currentCommandEl.textContent = set.currentCommand;
+        }
+        if ('aiResponse' in set) {
+            aiResponseEl.textContent = set.aiResponse;
+        }
+        Object.entries(data.logs || {}).forEach(([name, update]) => {
+            if (logs[name]) {
+                applyLog(logs[name], update);
+            }
+        });
+    }
+
+    function subscribe() {
+        const source = new EventSource(EVENTS_URL);
+        // A snapshot comes on every (re)connect and replaces whatever is shown
+        source.addEventListener('snapshot', event => applyUpdate(JSON.parse(event.data), true));
+        source.addEventListener('patch', event => applyUpdate(JSON.parse(event.data), false));
+        source.onerror = () => {
+            // EventSource reconnects by itself; say so while William is away
+            if (source.readyState !== EventSource.OPEN) {
+                thoughtProcessEl.textContent = 'Connection to William AI lost, reconnecting...';
+            }
+        };
+    }
+
     async function fetchAndUpdateCanvas() {
         try {
-            // In a real scenario, this would fetch from a live data source.
-            // For now, we'll simulate or try to fetch a local file if the Python backend creates it.
             const response = await fetch(DATA_SOURCE_URL + '?_=' + new Date().getTime()); // Cache buster
             if (!response.ok) {
                 // console.warn(`Could not fetch canvas data (status: ${response.status}). Waiting for backend to create it.`);
@@ -24,36 +100,9 @@ document.addEventListener('DOMContentLoaded', () => {
                 return;
             }
             const data = await response.json();
-
-            if (data.currentCommand) {
-                currentCommandEl.textContent = data.currentCommand;
-            }
-            if (data.thoughtProcess) {
-                thoughtProcessEl.textContent = data.thoughtProcess;
-            }
-            if (data.aiResponse) {
-                aiResponseEl.textContent = data.aiResponse;
-            }
-
-            if (data.webActions && Array.isArray(data.webActions)) {
-                webActionsEl.innerHTML = ''; // Clear old entries
-                data.webActions.forEach(action => {
-                    const li = document.createElement('li');
-                    li.textContent = action;
-                    webActionsEl.appendChild(li);
-                });
-            }
-
-            if (data.systemEvents && Array.isArray(data.systemEvents)) {
-                systemEventsEl.innerHTML = ''; // Clear old entries
-                data.systemEvents.forEach(event => {
-                    const li = document.createElement('li');
-                    // Potentially add status badges or icons here based on event type
-                    li.textContent = event;
-                    systemEventsEl.appendChild(li);
-                });
-            }
-
+            // The file always holds the whole state; keep what is shown when a field is empty
+            data.set = Object.fromEntries(Object.entries(data.set || {}).filter(([, value]) => value));
+            applyUpdate(data, false);
         } catch (error) {
             // console.error('Error updating canvas:', error);
             // Gracefully handle cases where the file might not exist yet or is malformed
@@ -63,9 +112,13 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
-    // Initial call and then set up polling
-    fetchAndUpdateCanvas();
-    setInterval(fetchAndUpdateCanvas, POLLING_INTERVAL);
+    if (window.EventSource && location.protocol.startsWith('http')) {
+        subscribe();
+    } else {
+        // Initial call and then set up polling
+        fetchAndUpdateCanvas();
+        setInterval(fetchAndUpdateCanvas, POLLING_INTERVAL);
+    }
 
     // Example of how to add a system event dynamically (for testing)
     // setTimeout(() => {
@@ -0,0 +1,230 @@
+# Push transport for the Visual Canvas
+# A small local HTTP server that serves the canvas page and streams its updates as server-sent
+# events (SSE), so the page changes as soon as William does something instead of on its next
+# poll of the JSON file. A page that connects gets the whole state once ("snapshot") and from
+# then on only what changed ("patch"); canvas_utils decides what those look like. Snapshots are
+# only built when a page connects or falls behind, so publishing with no page open costs little.
+# A patch may reach a page after a snapshot that already contains it; applying it again is harmless.
+#
+#   http://127.0.0.1:8765/          the canvas page
+#   http://127.0.0.1:8765/events    the event stream (EventSource)
+#   http://127.0.0.1:8765/state     the current state as JSON
+#
+# Only the page served from here subscribes (update.js polls the data file when opened from
+# file://), so no cross-origin access is allowed, and requests whose Host header is not this
+# server's are refused, in case a site's name has been rebound to 127.0.0.1 (DNS rebinding).
+import json
+import os
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+from william_ai_assistant import config
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CANVAS_DIR = os.path.join(_BASE_DIR, "canvas")
+STATIC_FILES = {"/": ("canvas.html", "text/html"), "/canvas.html": ("canvas.html", "text/html"),
+                "/update.js": ("update.js", "application/javascript"), "/style.css": ("style.css", "text/css")}
+KEEPALIVE_SECONDS = 15 # Comment lines sent to idle streams, so proxies and browsers keep them open
+CLIENT_QUEUE_SIZE = 256 # Messages waiting for one slow page; beyond this it is sent a fresh snapshot
+_CLOSE = object() # Ends a client's stream
+_RESYNC = object() # Sends a client a snapshot, built by its own handler thread
+
+
+def _event(name: str, sequence: int, data: Dict[str, Any]) -> bytes:
+    return f"id: {sequence}\nevent: {name}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+class CanvasServer:
+    """
+    Serves the canvas page and pushes state changes to every connected page.
+
+        server = CanvasServer(state=current_state)
+        if server.start():
+            server.publish({"set": {"aiResponse": "Hello"}})
+    """
+
+    def __init__(self, host: str = config.CANVAS_SERVER_HOST, port: int = config.CANVAS_SERVER_PORT,
+                 state: Optional[Callable[[], Dict[str, Any]]] = None):
+        """
+        Args:
+            host (str): Interface to listen on.
+            port (int): Port to listen on; 0 picks a free one.
+            state (Optional[Callable[[], Dict[str, Any]]]): Returns the whole state, for snapshots and /state.
+                Called from request threads without the server's lock held.
+        """
+        self.host = host
+        self.port = port
+        self.published = 0
+        self.resyncs = 0 # Slow pages that were sent a snapshot instead of the patches they missed
+        self._state = state or dict
+        self._sequence = 0
+        self._clients: List["queue.Queue"] = []
+        self._lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self.allowed_hosts: set = set() # Host headers accepted, filled in by start() once the port is known
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2] if self._httpd else (self.host, self.port)
+        return f"http://{host}:{port}/"
+
+    def start(self) -> bool:
+        """Starts serving on a daemon thread. Returns False if the port can't be opened."""
+        try:
+            self._httpd = ThreadingHTTPServer((self.host, self.port), _CanvasHandler)
+        except OSError as e:
+            print(f"Could not start the canvas server on {self.host}:{self.port}: {e}")
+            return False
+        self._httpd.daemon_threads = True
+        port = self._httpd.server_address[1]
+        self.allowed_hosts = {f"{name}:{port}" for name in (self.host, "127.0.0.1", "localhost", "[::1]")}
+        self._httpd.canvas = self # Lets request handlers reach the server
+        threading.Thread(target=self._httpd.serve_forever, name="william-canvas-server", daemon=True).start()
+        return True
+
+    def stop(self):
+        if self._httpd is None:
+            return
+        with self._lock:
+            clients, self._clients = self._clients, []
+        for client in clients:
+            self._drain(client)
+            client.put_nowait(_CLOSE)
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._httpd = None
+
+    @property
+    def clients(self) -> int:
+        return len(self._clients)
+
+    def publish(self, patch: Dict[str, Any]):
+        """Sends `patch` to every page."""
+        with self._lock:
+            self._sequence += 1
+            message = _event("patch", self._sequence, patch)
+            self.published += 1
+            for client in self._clients:
+                try:
+                    client.put_nowait(message)
+                except queue.Full: # The page stopped reading; replace its backlog with the current state
+                    self._drain(client)
+                    client.put_nowait(_RESYNC)
+                    self.resyncs += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return self._state()
+
+    def _snapshot_event(self, client: "queue.Queue") -> Optional[bytes]:
+        """
+        Builds the snapshot for `client` in place of the patches queued for it, which it contains.
+        None if the stream was closed meanwhile.
+        """
+        while True:
+            try:
+                if client.get_nowait() is _CLOSE:
+                    return None
+            except queue.Empty:
+                break
+        with self._lock:
+            sequence = self._sequence
+        return _event("snapshot", sequence, self._state())
+
+    def _subscribe(self) -> "queue.Queue":
+        client = queue.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        with self._lock:
+            client.put_nowait(_RESYNC)
+            self._clients.append(client)
+        return client
+
+    def _unsubscribe(self, client: "queue.Queue"):
+        with self._lock:
+            if client in self._clients:
+                self._clients.remove(client)
+
+    @staticmethod
+    def _drain(client: "queue.Queue"):
+        while True:
+            try:
+                client.get_nowait()
+            except queue.Empty:
+                return
+
+
+class _CanvasHandler(BaseHTTPRequestHandler):
+    disable_nagle_algorithm = True # Each event is a small write that should go out at once
+
+    def log_message(self, format, *args):
+        pass # Every poll and asset would otherwise be printed to the console
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if self.headers.get("Host", "").lower() not in self.server.canvas.allowed_hosts:
+            self._send(403, "text/plain", b"Forbidden") # Another site's name pointing here (DNS rebinding)
+        elif path == "/events":
+            self._stream()
+        elif path == "/state":
+            self._send(200, "application/json", json.dumps(self.server.canvas.snapshot()).encode("utf-8"))
+        elif path in STATIC_FILES:
+            name, content_type = STATIC_FILES[path]
+            try:
+                with open(os.path.join(CANVAS_DIR, name), "rb") as f:
+                    self._send(200, content_type, f.read())
+            except OSError:
+                self._send(404, "text/plain", b"Not found")
+        else:
+            self._send(404, "text/plain", b"Not found")
+
+    def _send(self, status: int, content_type: str, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self):
+        canvas = self.server.canvas
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        client = canvas._subscribe()
+        try:
+            self.wfile.write(b"retry: 1000\n\n") # Reconnect quickly if William restarts
+            while True:
+                try:
+                    message = client.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    message = b": keepalive\n\n"
+                if message is _RESYNC:
+                    message = canvas._snapshot_event(client)
+                if message is _CLOSE or message is None:
+                    return
+                self.wfile.write(message)
+        except ConnectionError: # The page was closed or reloaded (broken pipe, reset or aborted)
+            pass
+        finally:
+            canvas._unsubscribe(client)
+
+
+if __name__ == '__main__':
+    # Serve the canvas with a counter that changes every second:
+    #   python -m william_ai_assistant.canvas_server
+    import time
+    demo_state = {}
+    server = CanvasServer(state=lambda: demo_state)
+    if server.start():
+        print(f"Canvas at {server.url} (Ctrl+C to stop)")
+        try:
+            for tick in range(1, 10**6):
+                first = max(1, tick - 9) # The last 10 ticks are kept as system events
+                events = {"first": first, "seq": tick, "entries": [f"Tick {n}" for n in range(first, tick + 1)]}
+                demo_state = {"set": {"currentCommand": "Demo", "aiResponse": f"Tick {tick}"}, "logs": {"systemEvents": events}}
+                patch = {"set": {"aiResponse": f"Tick {tick}"}, "logs": {"systemEvents": dict(events, entries=[f"Tick {tick}"])}}
+                server.publish(patch)
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.stop()
@@ -1,38 +1,197 @@
+import collections
 import json
 import os
 import datetime
-from typing import Dict, List, Optional, Any
+import itertools
+import threading
+import time
+from typing import Deque, Dict, List, Optional, Any
 from . import config as app_config # To get CANVAS_DATA_FILE path
+from . import tracing
+from .canvas_server import CanvasServer
 
 # Ensure the canvas data file path is absolute, typically within the project directory
 # If main.py is in william_ai_assistant/, and canvas_data.json should also be there.
 _BASE_DIR = os.path.dirname(os.path.abspath(__file__)) # Directory of canvas_utils.py (william_ai_assistant)
 CANVAS_DATA_FILE_PATH = os.path.join(_BASE_DIR, app_config.CANVAS_DATA_FILE)
 
-# Initialize a lock if threading becomes an issue, for now, keep it simple
-# import threading
-# _canvas_lock = threading.Lock()
+# Updates come from the main loop, the asyncio core's worker threads and william_brain
+_canvas_lock = threading.Lock()
+
+# With config.CANVAS_TRANSPORT = "sse" changes are pushed to the page by this server (see
+# canvas_server.py) and nothing is written to disk; otherwise, or if it could not start, the
+# whole state is written to CANVAS_DATA_FILE_PATH for the page to poll. Those writes happen on a
+# background thread, at most once per CANVAS_FLUSH_INTERVAL_MS however many updates there were.
+_server: Optional[CanvasServer] = None
+
+# The thought process, web actions and system events are append-only logs of entries, of which
+# only the last LOG_LIMITS[name] are kept, so neither the state nor the page grows over a session.
+LOG_LIMITS = {
+    "thoughtProcess": app_config.CANVAS_LOG_SIZE,
+    "webActions": app_config.CANVAS_LOG_SIZE,
+    "systemEvents": app_config.CANVAS_MAX_SYSTEM_EVENTS,
+}
+
+# Tells the page that William restarted and the logs' sequence numbers start again
+_SESSION = datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+class _RingLog:
+    """
+    The last `size` entries of a log. Entries are numbered 1, 2, 3... as they are appended and
+    numbers are never reused, even after clear(), so the page can add only the entries newer than
+    the last one it shows, and drop those older than `first`.
+    """
+
+    def __init__(self, size: int):
+        self.entries: Deque[str] = collections.deque(maxlen=size)
+        self.seq = 0 # Number of the last entry appended
+
+    def append(self, entry: str):
+        self.seq += 1
+        self.entries.append(entry)
+
+    def clear(self):
+        self.entries.clear()
+
+    @property
+    def first(self) -> int:
+        """Number of the oldest entry kept (seq + 1 when the log is empty)."""
+        return self.seq - len(self.entries) + 1
+
+    def window(self, newest: Optional[int] = None) -> Dict[str, Any]:
+        """
+        What the page needs to bring its copy up to date: every entry kept, or only the `newest`.
+        The entries are numbered seq - len(entries) + 1 ... seq.
+        """
+        count = len(self.entries) if newest is None else min(newest, len(self.entries))
+        entries = list(itertools.islice(self.entries, len(self.entries) - count, None))
+        return {"first": self.first, "seq": self.seq, "entries": entries}
+
+
+def _empty_logs() -> Dict[str, _RingLog]:
+    return {name: _RingLog(limit) for name, limit in LOG_LIMITS.items()}
 
 _current_canvas_data: Dict[str, Any] = {
     "currentCommand": "",
-    "thoughtProcess": "Initializing...",
-    "webActions": [],
     "aiResponse": "",
-    "systemEvents": [],
     "lastUpdated": datetime.datetime.now(datetime.timezone.utc).isoformat()
 }
+_logs: Dict[str, _RingLog] = _empty_logs()
+_logs["thoughtProcess"].append("Initializing...")
 
-def _write_canvas_data():
-    """Internal function to write the current state to the JSON file."""
-    global _current_canvas_data
+_flush_wanted = threading.Condition(_canvas_lock) # Notified when the state changes in file mode
+_write_lock = threading.Lock() # Keeps file writes in order
+_dirty = False # Changed since the data file was last written
+_flusher: Optional[threading.Thread] = None
+_stats = {"updates": 0, "writes": 0, "bytes_written": 0, "published": 0}
+
+def start_server() -> Optional[str]:
+    """
+    Starts pushing canvas updates to the page if config.CANVAS_TRANSPORT is "sse".
+    Returns the page's URL, or None if the canvas is left to the data file.
+    """
+    global _server
+    if app_config.CANVAS_TRANSPORT != "sse":
+        return None
+    if _server is None:
+        server = CanvasServer(app_config.CANVAS_SERVER_HOST, app_config.CANVAS_SERVER_PORT, state=_locked_snapshot)
+        if not server.start():
+            print("The canvas will be updated through its data file instead.")
+            return None
+        _server = server
+    return _server.url
+
+def stop_server():
+    global _server
+    if _server is not None:
+        _server.stop()
+        _server = None
+
+def _snapshot() -> Dict[str, Any]:
+    """
+    The whole state, as the data file holds it and a page is sent when it connects:
+    {"session": ..., "set": {field: value}, "logs": {name: {"first", "seq", "entries"}}}.
+    Caller holds _canvas_lock.
+    """
+    return {"session": _SESSION, "set": dict(_current_canvas_data),
+            "logs": {name: log.window() for name, log in _logs.items()}}
+
+def _locked_snapshot() -> Dict[str, Any]:
+    """The whole state, for the canvas server; built only when a page connects or has fallen behind."""
+    with _canvas_lock:
+        return _snapshot()
+
+def _write_canvas_data(changes: Optional[Dict[str, Any]] = None, appended: Optional[Dict[str, int]] = None):
+    """
+    Internal function to publish a change: pushed to the canvas server as a patch, or marked for
+    the background flusher to write to the JSON file. Caller holds _canvas_lock.
+
+    Args:
+        changes (Optional[Dict[str, Any]]): Fields set to a new value; None publishes the whole state.
+        appended (Optional[Dict[str, int]]): Logs that changed, with the number of entries appended.
+    """
+    global _dirty
     _current_canvas_data["lastUpdated"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
-    try:
-        # with _canvas_lock: # If using threading
-        with open(CANVAS_DATA_FILE_PATH, 'w') as f:
-            json.dump(_current_canvas_data, f, indent=4)
-        # print(f"Canvas data updated: {CANVAS_DATA_FILE_PATH}") # For debugging
-    except Exception as e:
-        print(f"Error writing to canvas data file ({CANVAS_DATA_FILE_PATH}): {e}")
+    _stats["updates"] += 1
+    if _server is not None:
+        with tracing.span("canvas", transport="sse"):
+            if changes is None:
+                patch = _snapshot()
+            else:
+                patch = {"session": _SESSION, "set": dict(changes, lastUpdated=_current_canvas_data["lastUpdated"]),
+                         "logs": {name: _logs[name].window(count) for name, count in (appended or {}).items()}}
+            _server.publish(patch)
+            _stats["published"] += 1
+        return
+    _dirty = True
+    _start_flusher()
+    _flush_wanted.notify()
+
+def _start_flusher():
+    """Starts the background writer of the data file. Caller holds _canvas_lock."""
+    global _flusher
+    if _flusher is None:
+        _flusher = threading.Thread(target=_flush_loop, name="william-canvas-flusher", daemon=True)
+        _flusher.start()
+
+def _flush_loop():
+    interval = app_config.CANVAS_FLUSH_INTERVAL_MS / 1000.0
+    last_write = 0.0
+    while True:
+        with _canvas_lock:
+            while not _dirty:
+                _flush_wanted.wait()
+        # Let the rest of a burst of updates arrive; they all go into this one write
+        time.sleep(max(0.0, last_write + interval - time.monotonic()))
+        flush()
+        last_write = time.monotonic()
+
+def flush():
+    """Writes the data file now if anything changed since the last write (file mode)."""
+    global _dirty
+    with _write_lock:
+        with _canvas_lock:
+            if not _dirty:
+                return
+            state = _snapshot()
+            _dirty = False
+        data = json.dumps(state, separators=(",", ":")).encode("utf-8")
+        temporary = CANVAS_DATA_FILE_PATH + ".tmp"
+        try:
+            with tracing.span("canvas", bytes=len(data)):
+                with open(temporary, 'wb') as f:
+                    f.write(data)
+                os.replace(temporary, CANVAS_DATA_FILE_PATH) # The page never reads a half-written file
+            _stats["writes"] += 1
+            _stats["bytes_written"] += len(data)
+            # print(f"Canvas data updated: {CANVAS_DATA_FILE_PATH}") # For debugging
+        except Exception as e:
+            print(f"Error writing to canvas data file ({CANVAS_DATA_FILE_PATH}): {e}")
+
+def stats() -> Dict[str, int]:
+    """Counters since startup: update calls, data file writes and bytes written, patches pushed."""
+    return dict(_stats)
 
 def update_canvas(
     current_command: Optional[str] = None,
@@ -48,63 +207,74 @@ def update_canvas(
     clear_ai_response: bool = False
 ):
     """
-    Updates specified parts of the canvas data and writes to the JSON file.
+    Updates specified parts of the canvas data and publishes the change.
     None for a field means no change to that field.
+    A thought_process is added to the thought process log as a new entry.
     Use append_web_action or append_system_event to add to lists.
     Use clear flags to reset specific fields before update (e.g., for a new command cycle).
     """
-    global _current_canvas_data
-    # with _canvas_lock: # If using threading
-    if current_command is not None:
-        _current_canvas_data["currentCommand"] = current_command
-
-    if clear_thought_process:
-        _current_canvas_data["thoughtProcess"] = ""
-    if thought_process is not None:
-        # Option to append to thought process or replace
-        if _current_canvas_data["thoughtProcess"] and not clear_thought_process:
-            _current_canvas_data["thoughtProcess"] += f"\n{thought_process}"
-        else:
-            _current_canvas_data["thoughtProcess"] = thought_process
-
-    if clear_web_actions:
-        _current_canvas_data["webActions"] = []
-    if web_actions is not None: # Overwrites existing web_actions
-        _current_canvas_data["webActions"] = web_actions
-    if append_web_action:
-        _current_canvas_data["webActions"].append(append_web_action)
-
-    if clear_ai_response:
-        _current_canvas_data["aiResponse"] = ""
-    if ai_response is not None:
-        _current_canvas_data["aiResponse"] = ai_response
-
-    if clear_system_events:
-        _current_canvas_data["systemEvents"] = []
-    if system_events is not None: # Overwrites existing system_events
-        _current_canvas_data["systemEvents"] = system_events
-    if append_system_event:
-        _current_canvas_data["systemEvents"].append(append_system_event)
-        # Optional: limit the number of system events shown
-        max_events = 10
-        if len(_current_canvas_data["systemEvents"]) > max_events:
-            _current_canvas_data["systemEvents"] = _current_canvas_data["systemEvents"][-max_events:]
-
-    _write_canvas_data()
+    changes: Dict[str, Any] = {}
+    appended: Dict[str, int] = {} # Entries appended per log; the page is sent only those
+
+    def replace_log(name: str, entries: List[str]):
+        _logs[name].clear()
+        appended[name] = 0
+        for entry in entries:
+            append_log(name, entry)
+
+    def append_log(name: str, entry: str):
+        _logs[name].append(entry)
+        appended[name] = appended.get(name, 0) + 1
+
+    with _canvas_lock:
+        if current_command is not None:
+            _current_canvas_data["currentCommand"] = changes["currentCommand"] = current_command
+
+        if clear_thought_process:
+            replace_log("thoughtProcess", [])
+        if thought_process is not None:
+            append_log("thoughtProcess", thought_process)
+
+        if clear_web_actions:
+            replace_log("webActions", [])
+        if web_actions is not None: # Overwrites existing web_actions
+            replace_log("webActions", web_actions)
+        if append_web_action:
+            append_log("webActions", append_web_action)
+
+        if clear_ai_response:
+            _current_canvas_data["aiResponse"] = changes["aiResponse"] = ""
+        if ai_response is not None:
+            _current_canvas_data["aiResponse"] = changes["aiResponse"] = ai_response
+
+        if clear_system_events:
+            replace_log("systemEvents", [])
+        if system_events is not None: # Overwrites existing system_events
+            replace_log("systemEvents", system_events)
+        if append_system_event:
+            append_log("systemEvents", append_system_event) # Only the last CANVAS_MAX_SYSTEM_EVENTS are kept
+
+        _write_canvas_data(changes, appended)
 
 def initialize_canvas_data_file():
-    """Writes the initial empty state to the canvas data file if it doesn't exist or to clear it."""
+    """Writes the initial empty state to the canvas (data file or server), e.g. to clear it."""
     global _current_canvas_data
-    _current_canvas_data = {
-        "currentCommand": "Waiting for command...",
-        "thoughtProcess": "William AI Initialized. System Ready.",
-        "webActions": [],
-        "aiResponse": "",
-        "systemEvents": [f"Canvas Initialized at {datetime.datetime.now(datetime.timezone.utc).isoformat()}"],
-        "lastUpdated": datetime.datetime.now(datetime.timezone.utc).isoformat()
-    }
-    _write_canvas_data()
-    print(f"Canvas data file initialized/cleared: {CANVAS_DATA_FILE_PATH}")
+    with _canvas_lock:
+        _current_canvas_data = {
+            "currentCommand": "Waiting for command...",
+            "aiResponse": "",
+            "lastUpdated": datetime.datetime.now(datetime.timezone.utc).isoformat()
+        }
+        for log in _logs.values():
+            log.clear() # Keeps numbering, so a page that stays open drops the old entries
+        _logs["thoughtProcess"].append("William AI Initialized. System Ready.")
+        _logs["systemEvents"].append(f"Canvas Initialized at {datetime.datetime.now(datetime.timezone.utc).isoformat()}")
+        _write_canvas_data()
+    flush() # Written straight away, so the page has something to show
+    if _server is not None:
+        print(f"Canvas data initialized/cleared; pushed to {_server.url}")
+    else:
+        print(f"Canvas data file initialized/cleared: {CANVAS_DATA_FILE_PATH}")
 
 if __name__ == "__main__":
     # Test function
@@ -123,5 +293,6 @@ if __name__ == "__main__":
         # system_events are often kept or managed with a max length
     )
     update_canvas(thought_process="Starting research...", append_system_event="Research module activated.")
+    flush()
 
-    print(f"Test complete. Check the content of: {CANVAS_DATA_FILE_PATH}")
+    print(f"Test complete. Check the content of: {CANVAS_DATA_FILE_PATH} ({stats()})")
@@ -14,9 +14,50 @@ OPENROUTER_FALLBACK_MODEL = "deepseek/deepseek-r1-0528:free" # Fallback model
 # Optional headers for OpenRouter - can be left empty if not needed
 OPENROUTER_SITE_URL = os.getenv("OPENROUTER_SITE_URL", "") # e.g., "http://localhost" or your actual site
 OPENROUTER_SITE_NAME = os.getenv("OPENROUTER_SITE_NAME", "") # e.g., "William AI Assistant"
+LLM_POOL_SIZE = 4 # Keep-alive connections to OpenRouter; covers a request plus its hedged/fallback attempts
+LLM_REQUEST_TIMEOUT_SECONDS = 30
+LLM_PREWARM_ON_STARTUP = True # Open the connection while William starts up, so the first turn skips the handshake
+LLM_PREWARM_INTERVAL_SECONDS = 30 # Don't re-open the connection more often than this
+LLM_DISPATCH_POLICY = "hedged" # "sequential": next model only after an error; "hedged": also after LLM_HEDGE_AFTER_SECONDS without a first byte; "race": all models at once
+LLM_HEDGE_AFTER_SECONDS = 2.0 # Time to first byte (first token when streaming) before the hedged policy asks the next model too
+LLM_ADAPTIVE_MODEL_ORDER = True # Put the model with the best measured latency and error rate first
+LLM_STATS_MIN_SAMPLES = 3 # Keep the configured order until every model has this many results
+LLM_ERROR_PENALTY_SECONDS = 10 # Seconds of latency an error rate of 1.0 is worth when ranking models
+
+# LLM response cache (see llm_cache.py)
+ENABLE_LLM_CACHE = True # Answer repeated prompts from the cache instead of asking OpenRouter again
+LLM_CACHE_FILE = "llm_cache.json" # Saved on shutdown and every LLM_CACHE_SAVE_SECONDS, relative to this package
+LLM_CACHE_MAX_BYTES = 2_000_000 # Least recently used replies are dropped beyond this size
+LLM_CACHE_TTL_SECONDS = 24 * 3600 # Replies older than this are asked for again
+LLM_CACHE_HISTORY_MESSAGES = 2 # Trailing history messages that are part of the key (0 = ignore the conversation)
+LLM_CACHE_SIMILARITY = 0 # Trigram overlap for a near-duplicate prompt (same content words) to count as a hit; 0 = exact only
+LLM_CACHE_SAVE_SECONDS = 60 # Write new entries to disk at most this often while running
+
+# Conversation context (see context_manager.py)
+CONTEXT_TOKEN_BUDGET = 800 # Estimated tokens of history sent with each LLM request, summary and pinned messages included
+CONTEXT_MAX_MESSAGE_TOKENS = 250 # Longer messages are clipped when stored, so one long reply can't crowd out the rest
+CONTEXT_SUMMARY_MODE = "llm" # Turns that no longer fit: "llm" (summarized in the background), "extractive" (keep the questions), "off"
+CONTEXT_SUMMARY_MAX_TOKENS = 120 # Size bound of the rolling summary
+
+# Long-term memory (see memory_store.py)
+ENABLE_LONG_TERM_MEMORY = True # Keep every exchange in a local database and recall relevant ones in later conversations
+MEMORY_DB_FILE = "william_memory.db" # SQLite database, relative to this package
+MEMORY_TOP_K = 3 # Past exchanges added to an LLM request
+MEMORY_RECALL_BUDGET_MS = 25 # Recall gives up after this long and the turn goes ahead without memories
+MEMORY_MAX_TERM_FRACTION = 0.02 # Words found in more than this share of all exchanges are left out of recall queries
+MEMORY_MAX_TOKENS = 200 # Size bound of the recalled exchanges added to a request (on top of CONTEXT_TOKEN_BUDGET)
+MEMORY_WRITE_QUEUE_SIZE = 1000 # Exchanges waiting for the background writer before new ones are dropped
 
 # Wake Word
 WAKE_WORD = "hey william"
+ENABLE_WAKE_WORD_SPOTTER = True # Match idle phrases against local templates before calling speech-to-text
+WAKE_WORD_TEMPLATE_DIR = "wake_word_templates" # Folder of .wav recordings of the wake word (python -m william_ai_assistant.wake_word)
+WAKE_WORD_SENSITIVITY = 0.35 # Max template distance (0-2) counted as a detection; higher = more sensitive
+WAKE_WORD_VERIFY_WITH_STT = True # Confirm a local detection with a full transcription before waking up
+
+# Plugins (see plugin_manager.py)
+ENABLE_LAZY_PLUGINS = True # Import a plugin when a command first mentions one of its keywords, not at startup
+PLUGIN_MANIFEST_CACHE_FILE = "plugin_manifests.json" # What each plugin declares, so startup needn't read every file; relative to this package
 
 # Other configurations can be added here
 # For example, paths to specific applications, default web browser, etc.
@@ -25,18 +66,85 @@ MICROPHONE_INDEX = None # Or an integer like 1, 2, etc. if you know the specific
 
 # Speech recognition settings
 PHRASE_TIME_LIMIT = 10 # seconds for listening to a command
-BASE_ENERGY_THRESHOLD = 300 # Base energy threshold for voice activity detection
-DYNAMIC_ENERGY_THRESHOLD = True # Adjust energy threshold dynamically based on ambient noise
-DYNAMIC_ENERGY_ADJUSTMENT_DAMPING = 0.15
-PAUSE_THRESHOLD = 0.8 # seconds of non-speaking audio before a phrase is considered complete
 NON_SPEAKING_DURATION = 0.5 # seconds of non-speaking audio to keep on the end of the recording
 
+# Speech-to-text backends (see stt_backends.py)
+STT_BACKENDS = ["google"] # In order of preference: "google", "vosk" (offline), "stub" (local test server)
+STT_HEDGE_AFTER_SECONDS = 1.5 # If a backend hasn't answered after this long, also ask the next one
+STT_TIMEOUT_SECONDS = 10 # Give up on a phrase after this long
+STT_LANGUAGE = "en-US"
+STT_AUDIO_ENCODING = "linear16" # Upload format for Google: "linear16" (raw, fastest to encode) or "flac" (about 1/3 smaller, for slow uplinks)
+GOOGLE_SPEECH_API_KEY = os.getenv("GOOGLE_SPEECH_API_KEY") # None uses speech_recognition's generic key
+VOSK_MODEL_PATH = "models/vosk-model-small-en-us-0.15" # Relative to this package, download from alphacephei.com/vosk/models
+STT_STUB_SERVER_URL = os.getenv("WILLIAM_STT_STUB_URL") # e.g. "http://127.0.0.1:8765" when testing with stub_servers.StubSTTServer
+
+# Streaming recognition: partial transcripts while the user is still talking (see audio_capture.PartialTranscript)
+ENABLE_STREAMING_PARTIALS = True # Only has an effect with a streaming backend in STT_BACKENDS (currently "vosk")
+STREAMING_STABLE_HYPOTHESES = 2 # A word counts as stable once this many hypotheses in a row agree on it
+SPECULATIVE_LLM_CALLS = False # Start the LLM request on a stable partial; reused if the final transcript matches
+
+# Continuous capture settings (see audio_capture.py)
+CAPTURE_BUFFER_SECONDS = 30 # Size of the preallocated audio ring buffer, in seconds of audio
+PHRASE_QUEUE_SIZE = 8 # Segmented phrases that can wait for recognition before the segmenter pauses
+
+# Voice activity detection (see vad.py), used by the capture segmenter
+VAD_FRAME_MS = 20 # Analysis frame length
+VAD_MARGIN_DB = 9 # How far above the tracked noise floor a frame must be to count as speech
+VAD_MAX_VOICED_ZCR = 0.3 # Frames with more zero crossings per sample (hiss, clicks) need twice the margin
+VAD_HANGOVER_SECONDS = 0.8 # Silence that ends a phrase; shorter answers sooner but splits commands at mid-sentence pauses
+VAD_NOISE_ADAPT_SECONDS = 2.0 # How quickly the noise floor follows changes in background noise
+VAD_IDLE_READ_SECONDS = 0.5 # Audio analysed per step while waiting for speech (larger uses less CPU, delays nothing)
+NOISE_CALIBRATION_FILE = "noise_calibration.json" # Last measured noise floor, lets restarts skip the blocking calibration
+NOISE_CALIBRATION_MAX_AGE_HOURS = 24 # Older calibrations are measured again at startup
+NOISE_CALIBRATION_SAVE_SECONDS = 60 # How often the running noise floor estimate is written back
+
 # TTS settings
 TTS_RATE = 150 # words per minute for text-to-speech output
+ENABLE_LLM_STREAMING = True # Speak the LLM's reply sentence by sentence while it is still being generated
+TTS_STREAM_MIN_CLAUSE_CHARS = 40 # While streaming, also break at , ; : once a piece is this long
+TTS_PRESYNTHESIZE = True # Render the next sentence to audio while the current one plays (needs PyAudio)
+TTS_SINK = "speaker" # "speaker", "null" (silent, takes as long as speaking) or "file" (WAV files in TTS_FILE_SINK_DIR)
+TTS_FILE_SINK_DIR = "tts_output" # Relative to this package
+ENABLE_TTS_PHRASE_CACHE = True # Keep rendered audio of the fixed phrases below, so they play without rendering delay
+TTS_PHRASE_CACHE_DIR = "tts_cache" # Relative to this package
+TTS_PHRASE_CACHE_MEMORY_BYTES = 8 * 1024 * 1024 # Least recently used phrases are evicted beyond this
+TTS_PHRASE_CACHE_DISK_BYTES = 64 * 1024 * 1024
+TTS_CACHED_PHRASES = [ # Rendered in the background at startup
+    "Yes?",
+    "I didn't hear a command.",
+    "Sorry, I didn't understand that.",
+    "William AI Assistant is now active.",
+    "Always listen mode is active.",
+    "Goodbye!",
+    "There was an issue with the speech service. I will try again.",
+    "Speech service error. Please check your internet connection.",
+    "Microphone error. Cannot listen for command.",
+    "Sorry, something went wrong with that command.",
+    "Something went wrong. Shutting down.",
+]
 
 # Visual Canvas
 ENABLE_VISUAL_CANVAS = True # Set to False to disable the UI dashboard
 CANVAS_DATA_FILE = "william_canvas_data.json" # File for passing data to the canvas
+CANVAS_TRANSPORT = "sse" # "sse": a local server pushes each change to the page; "file": the page polls CANVAS_DATA_FILE
+CANVAS_SERVER_HOST = "127.0.0.1"
+CANVAS_SERVER_PORT = 8765 # If it is taken, the canvas falls back to the file
+CANVAS_FLUSH_INTERVAL_MS = 250 # File mode: the data file is written at most once per interval, however many updates there were
+CANVAS_LOG_SIZE = 50 # Thought process and web action entries kept; the oldest are dropped
+CANVAS_MAX_SYSTEM_EVENTS = 10
+
+# Latency tracing (see tracing.py)
+ENABLE_TRACING = os.getenv("WILLIAM_TRACE", "0") == "1" # Or set WILLIAM_TRACE=1 in .env
+TRACE_FILE = "traces/william_trace.json" # Chrome trace written on exit, relative to this package
+TRACE_MAX_EVENTS = 20000 # Spans kept in memory for the export; the oldest are dropped first
+TRACE_SUMMARY_WINDOW = 500 # Rolling percentiles are computed over this many recent spans per name
+TRACE_SUMMARY_EVERY_TURNS = 20 # Print the latency summary every N turns (0 = only on exit)
+
+# Event loop (see orchestrator.py)
+ENABLE_ASYNC_CORE = True # Listen, think and speak as concurrent asyncio tasks instead of one blocking loop
+ENABLE_BARGE_IN = True # The wake word cuts off the reply in progress; in always listen mode the new command must start with it
+ASYNC_WORKER_THREADS = 8 # Threads for blocking work (HTTP requests, speech output, canvas writes)
+ASYNC_QUEUE_SIZE = 8 # Bound of the queues between tasks (heard commands, sentences waiting to be spoken, canvas updates)
 
 # Operational Mode
 ALWAYS_LISTEN = False  # Set to True to enable 'always listen' mode, False to require wake word after each command.
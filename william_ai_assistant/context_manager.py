@@ -1,25 +1,110 @@
-from collections import deque
+# Conversation history for William AI Assistant
+# The history sent with each LLM request is bounded by an estimated token budget instead of a
+# message count, so one long reply can't blow up the request. Turns that fall out of the budget
+# are folded into a rolling summary in the background; system messages are pinned.
+import threading
+import time
+from typing import Callable, List, Optional
+
+from william_ai_assistant import config
+from william_ai_assistant import tracing
+
+MESSAGE_OVERHEAD_TOKENS = 4 # Role and separators the model sees around every message
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+MEMORY_PREFIX = "From earlier conversations, possibly relevant:"
+EXTRACTIVE_PREFIX = "The user asked: "
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English), without a tokenizer dependency."""
+    return max(1, (len(text) + 3) // 4)
+
+
+def message_tokens(message: dict) -> int:
+    return estimate_tokens(str(message.get("content", ""))) + MESSAGE_OVERHEAD_TOKENS
+
+
+def _clip(text: str, max_tokens: int, keep_end: bool = False) -> str:
+    """Cuts `text` to about `max_tokens`, at a word boundary."""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    if keep_end:
+        cut = text[-max_chars:]
+        return "..." + cut[cut.find(" ") + 1:] if " " in cut else cut
+    cut = text[:max_chars]
+    return (cut[:cut.rfind(" ")] if " " in cut else cut) + "..."
+
+
+def extractive_summary(previous_summary: str, messages: List[dict], max_tokens: int) -> str:
+    """Summary without an LLM: the previous summary plus what the user asked, clipped to the most recent part."""
+    questions = [str(m.get("content", "")).strip().rstrip(".!?") for m in messages if m.get("role") == "user"]
+    if not questions:
+        return previous_summary
+    added = "; ".join(questions)
+    if previous_summary.startswith(EXTRACTIVE_PREFIX) and previous_summary.endswith("."):
+        summary = f"{previous_summary[:-1]}; {added}."
+    elif previous_summary:
+        summary = f"{previous_summary} Then the user asked: {added}."
+    else:
+        summary = f"{EXTRACTIVE_PREFIX}{added}."
+    return _clip(summary, max_tokens, keep_end=True)
+
+
+def llm_summary(previous_summary: str, messages: List[dict], max_tokens: int) -> str:
+    """Summary written by the LLM, falling back to `extractive_summary` if the request fails."""
+    from william_ai_assistant import william_brain # Imported here: william_brain pulls in the HTTP client and canvas
+    try:
+        return _clip(william_brain.summarize_conversation(previous_summary, messages, max_tokens), max_tokens)
+    except Exception as e:
+        print(f"Could not summarize the conversation with the LLM ({e}); keeping the user's questions instead.")
+        return extractive_summary(previous_summary, messages, max_tokens)
+
+
+SUMMARIZERS = {"llm": llm_summary, "extractive": extractive_summary, "off": None}
 
-MAX_HISTORY_MESSAGES = 6 # Stores 3 user commands and 3 assistant replies
 
 class ContextManager:
-    def __init__(self, max_history_size: int = MAX_HISTORY_MESSAGES):
+    def __init__(self, token_budget: int = config.CONTEXT_TOKEN_BUDGET,
+                 max_message_tokens: int = config.CONTEXT_MAX_MESSAGE_TOKENS,
+                 summary_mode: str = config.CONTEXT_SUMMARY_MODE,
+                 summary_max_tokens: int = config.CONTEXT_SUMMARY_MAX_TOKENS,
+                 summarizer: Optional[Callable[[str, List[dict], int], str]] = None, memory=None):
         """
-        Manages a short-term memory of the conversation history.
+        Manages the conversation history sent to the LLM.
 
         Args:
-            max_history_size (int): The maximum number of messages (user + assistant) to store.
-                                    Should be an even number to keep pairs.
+            token_budget (int): Estimated tokens of history per request, pinned messages and summary included.
+                                The newest message is always kept, even on its own over budget.
+            max_message_tokens (int): Longer messages are clipped when they are added.
+            summary_mode (str): What happens to messages that fall out of the budget: "llm", "extractive" or "off".
+            summary_max_tokens (int): Size bound of the rolling summary, at most half the budget.
+            summarizer (Optional[callable]): summarizer(previous_summary, evicted_messages, max_tokens) -> summary,
+                                             overriding `summary_mode`. Runs on a background thread.
+            memory (Optional[MemoryStore]): Long-term store every exchange is written to, and recalled
+                                            from by `get_history(query=...)`.
         """
-        if max_history_size % 2 != 0:
-            # Technically not required, but good for keeping user/assistant pairs balanced
-            print(f"Warning: max_history_size ({max_history_size}) is odd. Consider using an even number.")
-
-        self.history = deque(maxlen=max_history_size)
+        if summary_mode not in SUMMARIZERS:
+            raise ValueError(f"Unknown context summary mode '{summary_mode}', expected one of: {', '.join(SUMMARIZERS)}.")
+        self.token_budget = token_budget
+        self.max_message_tokens = max_message_tokens
+        self.summary_max_tokens = min(summary_max_tokens, token_budget // 2)
+        self.summarizer = summarizer or SUMMARIZERS[summary_mode]
+        self.memory = memory
+        self.pinned: List[dict] = [] # System messages, always sent first
+        self.history: List[dict] = [] # Recent user/assistant messages, oldest first
+        self.summary = ""
+        self.evicted_count = 0
+        self._tokens = 0 # Estimated tokens of self.history
+        self._pending: List[dict] = [] # Evicted messages not yet folded into the summary
+        self._summarizing = False
+        self._generation = 0 # Bumped by clear_history, so a summary of cleared messages is dropped
+        self._lock = threading.Lock()
 
     def add_message(self, role: str, content: str):
         """
-        Adds a message to the history.
+        Adds a message to the history. System messages are pinned; other messages are evicted
+        oldest first (a user message together with its reply) once the budget is exceeded.
 
         Args:
             role (str): Typically "user" or "assistant".
@@ -28,75 +113,156 @@ class ContextManager:
         if role not in ["user", "assistant", "system"]: # System messages could also be part of history
             print(f"Warning: Adding message with unconventional role: {role}")
 
-        self.history.append({"role": role, "content": content})
+        message = {"role": role, "content": _clip(content, self.max_message_tokens)}
+        exchange_started_by = None
+        with self._lock:
+            if role == "system":
+                self.pinned.append(message)
+            else:
+                if role == "assistant" and self.history and self.history[-1]["role"] == "user":
+                    exchange_started_by = self.history[-1]["content"]
+                self.history.append(message)
+                self._tokens += message_tokens(message)
+            evicted = self._evict()
+        if evicted:
+            self._schedule_summary(evicted)
+        if self.memory is not None and exchange_started_by is not None:
+            self.memory.remember(exchange_started_by, content) # Queued; written in the background
+
+    def _fixed_tokens(self) -> int:
+        tokens = sum(message_tokens(m) for m in self.pinned)
+        if self.summary:
+            tokens += estimate_tokens(SUMMARY_PREFIX + self.summary) + MESSAGE_OVERHEAD_TOKENS
+        return tokens
+
+    def _evict(self) -> List[dict]:
+        evicted = []
+        budget = self.token_budget - self._fixed_tokens()
+        while self._tokens > budget and len(self.history) > 1:
+            count = 2 if self.history[0]["role"] == "user" and len(self.history) > 2 else 1 # Keep pairs together
+            for message in self.history[:count]:
+                self._tokens -= message_tokens(message)
+                evicted.append(message)
+            del self.history[:count]
+        self.evicted_count += len(evicted)
+        return evicted
+
+    def _schedule_summary(self, evicted: List[dict]):
+        """Hands evicted messages to the summarizer thread, off the request path."""
+        if self.summarizer is None:
+            return
+        with self._lock:
+            self._pending.extend(evicted)
+            if self._summarizing:
+                return # The running worker picks them up
+            self._summarizing = True
+        threading.Thread(target=self._summarize_pending, name="william-context-summary", daemon=True).start()
+
+    def _summarize_pending(self):
+        while True:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                previous, generation = self.summary, self._generation
+                if not batch:
+                    self._summarizing = False
+                    return
+            summary = self.summarizer(previous, batch, self.summary_max_tokens)
+            with self._lock:
+                if generation != self._generation:
+                    continue
+                self.summary = summary
+                self._pending.extend(self._evict()) # A longer summary leaves less room for recent messages
 
-    def get_history(self) -> list[dict[str, str]]:
+    def wait_for_summary(self, timeout: float = 10.0) -> bool:
+        """Blocks until pending evicted messages are summarized (for tests and benchmarks). Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if not self._summarizing:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def _recall(self, query: str, recent: List[dict]) -> Optional[dict]:
+        """System message with the past exchanges most relevant to `query`, or None."""
+        with tracing.span("memory_recall") as span:
+            memories = self.memory.recall(query)
+            span.set(found=len(memories))
+        in_window = {m["content"] for m in recent}
+        memories = [m for m in memories if m["user"] not in in_window]
+        if not memories:
+            return None
+        per_memory = max(20, config.MEMORY_MAX_TOKENS // len(memories))
+        lines = [MEMORY_PREFIX]
+        for memory in memories:
+            day = time.strftime("%d %b %Y", time.localtime(memory["created"]))
+            lines.append(_clip(f"- {day}: the user said \"{memory['user']}\" and William replied \"{memory['assistant']}\"",
+                               per_memory))
+        return {"role": "system", "content": "\n".join(lines)}
+
+    def get_history(self, query: Optional[str] = None) -> list[dict[str, str]]:
         """
-        Retrieves the current conversation history.
+        Retrieves the history to send: pinned messages, the summary of evicted turns, then recent messages.
+
+        Args:
+            query (Optional[str]): The current command. With a memory store, past exchanges relevant
+                                   to it are recalled and added after the summary.
 
         Returns:
             list[dict[str, str]]: A list of message dictionaries,
                                   e.g., [{"role": "user", "content": "Hello"}, ...].
         """
-        return list(self.history)
+        with self._lock:
+            messages = list(self.pinned)
+            if self.summary:
+                messages.append({"role": "system", "content": SUMMARY_PREFIX + self.summary})
+            recent = list(self.history)
+        if query and self.memory is not None:
+            recalled = self._recall(query, recent)
+            if recalled is not None:
+                messages.append(recalled)
+        messages.extend(recent)
+        return messages
+
+    def token_count(self) -> int:
+        """Estimated tokens of `get_history()`."""
+        with self._lock:
+            return self._fixed_tokens() + self._tokens
 
     def clear_history(self):
-        """Clears the conversation history."""
-        self.history.clear()
+        """Clears the conversation history and its summary. Pinned messages stay."""
+        with self._lock:
+            self.history.clear()
+            self._pending.clear()
+            self._tokens = 0
+            self.summary = ""
+            self._generation += 1
         print("Conversation history cleared.")
 
 if __name__ == '__main__':
     # Example Usage
-    context = ContextManager(max_history_size=4) # Keep last 2 pairs
+    context = ContextManager(token_budget=60, summary_mode="extractive")
 
+    context.add_message("system", "The user's name is Sam.")
     context.add_message("user", "Hello William.")
     context.add_message("assistant", "Hello! How can I help you today?")
     print("History after 1st exchange:", context.get_history())
 
     context.add_message("user", "What's the weather like?")
     context.add_message("assistant", "I can't check the weather yet, but I hope it's nice!")
-    print("History after 2nd exchange (full):", context.get_history())
-    # Expected: user:Hello, assistant:Hello, user:Weather, assistant:Can't check
-
     context.add_message("user", "Play some music.")
     context.add_message("assistant", "Sure, playing some music for you.")
-    print("History after 3rd exchange (older messages should be dropped):", context.get_history())
-    # Expected: user:Weather, assistant:Can't check, user:Music, assistant:Playing
+    context.wait_for_summary()
+    print("History after 3rd exchange (older turns summarized):", context.get_history())
+    assert context.get_history()[0]["content"] == "The user's name is Sam." # Pinned
+    assert "Hello William" in context.summary
+    assert context.token_count() <= 60
 
-    assert len(context.get_history()) <= 4
+    context.add_message("user", "word " * 2000) # Clipped to max_message_tokens, and kept although over budget
+    assert context.get_history()[-1]["content"].endswith("...")
 
     context.clear_history()
     print("History after clear:", context.get_history())
-    assert len(context.get_history()) == 0
-
-    context.add_message("user", "Test with odd size limit (internally handled by deque).")
-    context_odd = ContextManager(max_history_size=3)
-    context_odd.add_message("user", "u1")
-    context_odd.add_message("assistant", "a1")
-    context_odd.add_message("user", "u2")
-    print("History with odd size (3):", context_odd.get_history()) # a1, u2
-    assert len(context_odd.get_history()) == 3 # Deque stores up to maxlen
-    context_odd.add_message("assistant", "a2")
-    print("History with odd size (3) after one more:", context_odd.get_history()) # u2, a2
-    assert len(context_odd.get_history()) == 3 # a1, u2, a2 -> u2, a2 is wrong. deque keeps last N items.
-    # Correct history for max_size=3: [a1, u2, a2] if u1,a1,u2,a2 were added.
-    # If u1, a1, u2 added -> result is [u1, a1, u2]
-    # If then a2 added -> result is [a1, u2, a2]
-
-    # Re-test logic for odd size:
-    context_odd_test = ContextManager(max_history_size=3)
-    context_odd_test.add_message("user", "Message 1")
-    context_odd_test.add_message("assistant", "Message 2")
-    context_odd_test.add_message("user", "Message 3")
-    # History: [M1, M2, M3]
-    print("History (size 3, 3 added):", context_odd_test.get_history())
-    assert len(context_odd_test.get_history()) == 3
-    context_odd_test.add_message("assistant", "Message 4")
-    # History should be [M2, M3, M4]
-    print("History (size 3, 4 added):", context_odd_test.get_history())
-    assert len(context_odd_test.get_history()) == 3
-    assert context_odd_test.get_history()[0]['content'] == "Message 2"
-    assert context_odd_test.get_history()[1]['content'] == "Message 3"
-    assert context_odd_test.get_history()[2]['content'] == "Message 4"
+    assert len(context.get_history()) == 1 # Only the pinned message
 
     print("ContextManager tests passed.")
@@ -0,0 +1,388 @@
+# Headless driver for William AI Assistant
+# Replays scripted conversations through the assistant's command path with no microphone,
+# speakers or network: commands come from text or WAV files, speech goes to a null sink and
+# the LLM is a local FakeOpenRouterServer. Reports per-stage latency (see tracing.py) and throughput.
+#
+#   python -m william_ai_assistant.harness [corpus.json] [--concurrency 4] [--speed 0] [--budget route=50]
+#
+# Routes and plugins run for real (the weather plugin calls wttr.in, volume commands change
+# the system volume); only browser opens are intercepted. The built-in corpus avoids both.
+#
+# Corpus format (audio paths are relative to the corpus file):
+#   {"conversations": [{"name": "weather", "turns": ["what's the weather in paris",
+#                                                    {"audio": "clips/joke.wav", "text": "tell me a joke", "pause": 2.0},
+#                                                    {"text": "hey william, stop", "interrupt": 1.5}]}]}
+# "pause" is think time after William's previous reply; "interrupt" instead has the user speak that
+# many seconds after the previous command, while William may still be replying to it.
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import webbrowser
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import speech_recognition as sr
+from william_ai_assistant import (audio_listener, canvas_utils, config, main as assistant, memory_store, tracing,
+                                  tts_engine, william_brain)
+from william_ai_assistant.audio_capture import AudioCapture
+from william_ai_assistant.context_manager import ContextManager
+from william_ai_assistant.router import CommandRouter
+from william_ai_assistant.stt_backends import StubServerBackend
+from william_ai_assistant.stub_servers import FakeOpenRouterServer, StubSTTServer
+
+DEFAULT_PAUSE_SECONDS = 1.0 # User think time between turns, before scaling by speed
+
+DEFAULT_CORPUS = {"conversations": [
+    {"name": "small talk", "turns": ["hello william", "tell me a joke", "another one please", "thanks"]},
+    {"name": "travel", "turns": ["search for flights to lisbon on google", "google cheap hotels in lisbon",
+                                 "should i take an umbrella"]},
+    {"name": "apps", "turns": ["open calculator", "close calculator", "what can you do"]},
+    {"name": "questions", "turns": ["how far away is the moon", "how long would it take to drive there",
+                                    "summarize that in one sentence"]},
+]}
+
+
+class ScriptFinished(BaseException):
+    """Raised by the scripted listen_for_command once every turn has been heard; ends main.main."""
+
+
+class Turn:
+    """One scripted user command: text, optionally spoken from a WAV file."""
+
+    def __init__(self, text: str, audio: Optional[str] = None, pause: float = DEFAULT_PAUSE_SECONDS,
+                 interrupt: Optional[float] = None):
+        self.text = text
+        self.audio = audio
+        self.pause = pause
+        self.interrupt = interrupt # Seconds after the previous command, without waiting for the reply
+
+
+def load_corpus(path: Optional[str] = None) -> Dict[str, List[Turn]]:
+    """Reads a corpus file (see the format above), or returns the built-in one. Maps name -> turns."""
+    if path is None:
+        data, base_dir = DEFAULT_CORPUS, ""
+    else:
+        with open(path) as f:
+            data = json.load(f)
+        base_dir = os.path.dirname(os.path.abspath(path))
+    conversations = {}
+    for i, conversation in enumerate(data["conversations"]):
+        turns = []
+        for item in conversation["turns"]:
+            if isinstance(item, str):
+                turns.append(Turn(item))
+            else:
+                audio = os.path.join(base_dir, item["audio"]) if item.get("audio") else None
+                turns.append(Turn(item["text"], audio, item.get("pause", DEFAULT_PAUSE_SECONDS), item.get("interrupt")))
+        conversations[conversation.get("name", f"conversation {i + 1}")] = turns
+    return conversations
+
+
+class Harness:
+    """
+    Owns the fake services and the patched output sinks for one replay.
+
+    Args:
+        speed (float): Time scale for user pauses, speaking time and audio playback
+                       (1 = real time, 2 = twice as fast, 0 = no waiting at all).
+        llm_delay (float): Seconds the fake LLM takes per request.
+        stt_delay (float): Seconds the stub STT server takes per phrase.
+        llm_failure_rate (float): Fraction of LLM requests that fail with a 503.
+        llm_max_concurrent (Optional[int]): LLM requests beyond this many in flight get a 429.
+        llm_reply: The fake LLM's reply, or reply(prompt) -> str. Defaults to echoing the prompt.
+        llm_tokens_per_second (float): Streaming speed of the fake LLM in words per second; 0 = all at once.
+    """
+
+    def __init__(self, speed: float = 0.0, llm_delay: float = 0.2, stt_delay: float = 0.1,
+                 llm_failure_rate: float = 0.0, llm_max_concurrent: Optional[int] = None,
+                 llm_reply=None, llm_tokens_per_second: float = 0.0):
+        self.speed = speed
+        self.llm = FakeOpenRouterServer(reply=llm_reply or (lambda prompt: f"Stub answer to: {prompt}"),
+                                        delay=llm_delay, tokens_per_second=llm_tokens_per_second,
+                                        failure_rate=llm_failure_rate, max_concurrent=llm_max_concurrent)
+        self.stt = StubSTTServer(delay=stt_delay)
+        self.sink = tts_engine.NullSink(speed) # Takes as long as speaking would, scaled by `speed`
+        self.opened_urls: List[str] = []
+        self.errors: List[str] = []
+        self.turns_completed = 0
+        self._lock = threading.Lock()
+        self._turn_done = threading.Condition(self._lock)
+
+    @contextlib.contextmanager
+    def headless(self):
+        """Starts the fake services and swaps in the headless input/output for the duration of the block."""
+        saved_config = {name: getattr(config, name)
+                        for name in ("OPENROUTER_API_URL", "OPENROUTER_API_KEY", "ALWAYS_LISTEN", "ENABLE_LLM_CACHE",
+                                     "CANVAS_TRANSPORT")}
+        saved = [(tts_engine, "_worker", tts_engine._worker),
+                 (tts_engine, "engine_initialized", tts_engine.engine_initialized),
+                 (webbrowser, "open", webbrowser.open),
+                 (canvas_utils, "CANVAS_DATA_FILE_PATH", canvas_utils.CANVAS_DATA_FILE_PATH),
+                 (memory_store, "_store", memory_store._store)]
+        saved_tracing = tracing.enabled
+        canvas_dir = tempfile.mkdtemp(prefix="william-harness-")
+        memory = memory_store.MemoryStore(os.path.join(canvas_dir, config.MEMORY_DB_FILE)) # Not the real memories
+        with self.llm, self.stt:
+            config.OPENROUTER_API_URL = self.llm.url
+            config.OPENROUTER_API_KEY = config.OPENROUTER_API_KEY or "harness"
+            config.ENABLE_LLM_CACHE = False # Replays repeat prompts; every turn should reach the fake LLM
+            config.CANVAS_TRANSPORT = "file" # Into the temporary directory below; no server or browser
+            worker = tts_engine._worker = tts_engine.TTSWorker(self.sink) # Traces first_audio for each turn
+            tts_engine.engine_initialized = True
+            webbrowser.open = self._open_url
+            canvas_utils.CANVAS_DATA_FILE_PATH = os.path.join(canvas_dir, config.CANVAS_DATA_FILE)
+            memory_store._store = memory
+            tracing.enabled = True
+            tracing.reset()
+            try:
+                yield self
+            finally:
+                canvas_utils.flush() # Nothing pending may land in the real data file
+                for module, name, value in saved:
+                    setattr(module, name, value)
+                for name, value in saved_config.items():
+                    setattr(config, name, value)
+                tracing.enabled = saved_tracing
+                worker.cancel()
+                worker.close()
+                memory.close()
+
+    def _open_url(self, url, *args, **kwargs):
+        with self._lock:
+            self.opened_urls.append(url)
+        return True
+
+    def _wait(self, seconds: float):
+        if self.speed and seconds > 0:
+            time.sleep(seconds / self.speed)
+
+    def hear(self, turn: Turn, started_at: Optional[float] = None) -> Optional[str]:
+        """
+        Produces the command text for a turn and starts its tracing turn. Audio turns go through
+        AudioCapture (VAD segmentation) and the stub STT server, like the microphone would.
+
+        Args:
+            started_at (Optional[float]): time.monotonic() when the script has the user speak, if that
+                                          was before the assistant got round to listening.
+        """
+        if turn.audio is None:
+            tracing.begin_turn(started_at=started_at)
+            return turn.text
+        backend = StubServerBackend(self.stt.url)
+
+        def recognize(audio):
+            # Register the expected transcript for exactly the audio the segmenter produced
+            self.stt.add_transcript(audio.get_raw_data(convert_rate=backend.SAMPLE_RATE, convert_width=2), turn.text)
+            return backend.recognize(audio)
+
+        recognizer = sr.Recognizer()
+        recognizer.non_speaking_duration = config.NON_SPEAKING_DURATION
+        capture = AudioCapture(sr.AudioFile(turn.audio), recognizer, recognize=recognize, realtime=self.speed == 1)
+        capture.start()
+        try:
+            result = capture.next_result(timeout=60)
+        finally:
+            capture.stop()
+        if result is None or result.error is not None:
+            self._error(f"{turn.audio}: no transcript ({result.error if result else 'no phrase found'})")
+            return None
+        audio_listener._trace_command(result)
+        if started_at is not None and tracing.turn_started_at() is not None and started_at < tracing.turn_started_at():
+            tracing.adopt_turn(tracing.current_turn(), started_at)
+        return result.text
+
+    def _error(self, message: str):
+        print(f"Harness error: {message}")
+        with self._lock:
+            self.errors.append(message)
+
+    def run_conversation(self, turns: List[Turn]):
+        """Replays one conversation the way main.main handles a command, with its own context."""
+        context = ContextManager(memory=memory_store.get_store())
+        for turn in turns:
+            self._wait(turn.pause)
+            command = self.hear(turn)
+            if not command:
+                continue
+            try:
+                assistant.process_and_speak_command(command, context)
+            except Exception as e:
+                self._error(f"'{command}': {e}")
+            finally:
+                tracing.end_turn()
+            with self._lock:
+                self.turns_completed += 1
+
+    def run_main(self, turns: List[Turn]):
+        """
+        Runs the real main.main loop in always-listen mode, feeding it `turns` in order.
+        Only one conversation at a time: main keeps its router and context in globals.
+        """
+        pending = list(turns)
+        heard = {"commands": 0, "at": None}
+
+        def listen_for_command(on_partial=None):
+            while pending:
+                turn = pending.pop(0)
+                started_at = None
+                if turn.interrupt is not None and heard["at"] is not None:
+                    started_at = heard["at"] + (turn.interrupt / self.speed if self.speed else 0.0)
+                    time.sleep(max(0.0, started_at - time.monotonic()))
+                else:
+                    with self._turn_done: # The asyncio core listens while replying; the user waits for the reply
+                        self._turn_done.wait_for(lambda: self.turns_completed >= heard["commands"])
+                    self._wait(turn.pause)
+                heard["at"] = started_at if started_at is not None else time.monotonic()
+                command = self.hear(turn, started_at)
+                if command:
+                    heard["commands"] += 1
+                    return command
+            raise ScriptFinished()
+
+        def end_turn():
+            with self._turn_done:
+                self.turns_completed += 1
+                self._turn_done.notify_all()
+            original_end_turn()
+
+        patches = [(audio_listener, "listen_for_command", listen_for_command),
+                   (audio_listener, "adjust_for_ambient_noise", lambda *args, **kwargs: None),
+                   (audio_listener, "pause_capture", lambda: None),
+                   (audio_listener, "resume_capture", lambda: True),
+                   (audio_listener, "close_capture", lambda: None),
+                   (tracing, "end_turn", end_turn),
+                   (assistant, "_export_trace", lambda: None), # The harness reports on its own
+                   (config, "ALWAYS_LISTEN", True)]
+        original_end_turn = tracing.end_turn
+        saved = [(module, name, getattr(module, name)) for module, name, _ in patches]
+        for module, name, value in patches:
+            setattr(module, name, value)
+        try:
+            try:
+                assistant.main()
+            except ScriptFinished: # Not an Exception, so main lets it through; shut down as main would
+                assistant._shutdown(0, farewell="Goodbye!")
+        except SystemExit:
+            pass
+        finally:
+            for module, name, value in saved:
+                setattr(module, name, value)
+
+    def replay(self, conversations: Dict[str, List[Turn]], concurrency: int = 1) -> dict:
+        """
+        Replays all conversations, `concurrency` at a time, and returns the report.
+        With concurrency 1 everything goes through main.main; otherwise each conversation runs
+        main.process_command on its own thread with its own ContextManager.
+        """
+        started = time.monotonic()
+        canvas_utils.flush()
+        canvas_before = canvas_utils.stats()
+        if concurrency <= 1:
+            self.run_main([turn for turns in conversations.values() for turn in turns])
+        else:
+            assistant.command_router_instance = assistant.command_router_instance or CommandRouter()
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="william-harness") as pool:
+                for future in [pool.submit(self.run_conversation, turns) for turns in conversations.values()]:
+                    future.result()
+        elapsed = time.monotonic() - started
+        canvas_utils.flush() # The last write of the replay counts too
+        canvas = {name: value - canvas_before[name] for name, value in canvas_utils.stats().items()}
+        return self.report(elapsed, concurrency, canvas)
+
+    def report(self, elapsed: float, concurrency: int, canvas: Optional[dict] = None) -> dict:
+        """
+        Args:
+            canvas (Optional[dict]): canvas_utils.stats() counted over the replay.
+        """
+        canvas = canvas or canvas_utils.stats()
+        return {
+            "conversations_concurrency": concurrency,
+            "speed": self.speed,
+            "elapsed_seconds": elapsed,
+            "turns": self.turns_completed,
+            "turns_per_second": self.turns_completed / elapsed if elapsed else None,
+            "errors": self.errors,
+            "speech_cut_off": self.sink.cut_off,
+            "llm": {"requests": self.llm.request_count, "failures": self.llm.failures,
+                    "peak_in_flight": self.llm.peak_in_flight, "connections": self.llm.connection_count,
+                    "cancelled_streams": self.llm.cancelled_streams,
+                    "models": william_brain.get_dispatcher().stats()},
+            "canvas": dict(canvas, bytes_per_turn=canvas["bytes_written"] / self.turns_completed
+                           if self.turns_completed else None),
+            "stages": tracing.summary(),
+        }
+
+
+def print_report(report: dict):
+    print(f"\nReplayed {report['turns']} turns in {report['elapsed_seconds']:.2f}s "
+          f"({report['turns_per_second']:.2f} turns/s, concurrency {report['conversations_concurrency']}, "
+          f"speed {report['speed'] or 'unthrottled'})")
+    llm = report["llm"]
+    print(f"LLM requests: {llm['requests']}, failed: {llm['failures']}, peak in flight: {llm['peak_in_flight']}, "
+          f"connections: {llm['connections']}")
+    for model, stats in sorted(llm["models"].items()):
+        print(f"  {model}: {stats['wins']} won, {stats['errors']} failed, smoothed {stats['smoothed_ms'] or 0:.1f} ms")
+    canvas = report["canvas"]
+    print(f"Canvas: {canvas['updates']} updates, {canvas['writes']} file writes "
+          f"({canvas['writes'] / report['elapsed_seconds'] if report['elapsed_seconds'] else 0:.1f}/s), "
+          f"{canvas['bytes_written'] / 1024:.1f} KiB written ({canvas['bytes_per_turn'] or 0:.0f} bytes/turn)")
+    print("Stage                count      p50 ms      p95 ms      p99 ms")
+    for name, stats in sorted(report["stages"].items()):
+        print(f"  {name:<16} {stats['count']:7d} {stats['p50_ms']:11.2f} {stats['p95_ms']:11.2f} {stats['p99_ms']:11.2f}")
+    if report["errors"]:
+        print(f"{len(report['errors'])} error(s), first: {report['errors'][0]}")
+
+
+def check_budgets(report: dict, budgets: List[str]) -> List[str]:
+    """Returns the budgets ("stage=ms", checked against p95) that the report exceeds."""
+    exceeded = []
+    for budget in budgets:
+        stage, limit = budget.split("=")
+        stats = report["stages"].get(stage)
+        if stats is not None and stats["p95_ms"] > float(limit):
+            exceeded.append(f"{stage}: p95 {stats['p95_ms']:.1f} ms > {float(limit):.1f} ms")
+    return exceeded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay scripted conversations through William headlessly.")
+    parser.add_argument("corpus", nargs="?", help="Corpus JSON file (default: a small built-in corpus)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Conversations replayed at once (1 = through main.main)")
+    parser.add_argument("--speed", type=float, default=0.0, help="1 = real time, 2 = twice as fast, 0 = no waiting")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the corpus this many times")
+    parser.add_argument("--llm-delay", type=float, default=0.2)
+    parser.add_argument("--stt-delay", type=float, default=0.1)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--llm-max-concurrent", type=int)
+    parser.add_argument("--json", help="Also write the report to this file")
+    parser.add_argument("--trace", help="Also write a Chrome trace of the replay to this file")
+    parser.add_argument("--budget", action="append", default=[], metavar="STAGE=MS",
+                        help="Fail (exit code 1) if the stage's p95 exceeds MS, e.g. --budget route=50")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    conversations = {f"{name} #{i + 1}": turns for i in range(args.repeat) for name, turns in corpus.items()}
+    harness = Harness(speed=args.speed, llm_delay=args.llm_delay, stt_delay=args.stt_delay,
+                      llm_failure_rate=args.llm_failure_rate, llm_max_concurrent=args.llm_max_concurrent)
+    with harness.headless():
+        report = harness.replay(conversations, args.concurrency)
+        if args.trace:
+            tracing.export_chrome_trace(args.trace)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    exceeded = check_budgets(report, args.budget)
+    for line in exceeded:
+        print(f"Over budget: {line}")
+    if exceeded or report["errors"]:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
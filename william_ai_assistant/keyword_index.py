@@ -0,0 +1,142 @@
+# Keyword prefilter for regex routing
+# Most command patterns contain a literal that any match must include ("set volume to (\d+) percent"
+# cannot match without "set volume to "). KeywordAutomaton finds every such literal occurring in a
+# command in one pass over its characters (Aho-Corasick), however many patterns there are, so only
+# the few patterns whose literal occurs need to be tried.
+import re
+import threading
+from typing import Dict, Generic, Hashable, List, Optional, Set, TypeVar
+
+try:
+    from re import _parser as _regex_parser # Python 3.11+
+except ImportError:
+    import sre_parse as _regex_parser
+
+MIN_KEYWORD_CHARS = 2 # Shorter literals occur in too many commands to narrow anything down
+
+T = TypeVar("T", bound=Hashable)
+
+
+def required_literal(pattern: str, flags: int = 0) -> Optional[str]:
+    """
+    The longest literal that every match of `pattern` contains, lowercased, or None if there is
+    none worth indexing (e.g. the pattern is an alternation, or starts with a character class).
+    """
+    try:
+        parsed = _regex_parser.parse(pattern, flags)
+    except re.error:
+        return None
+    runs: List[str] = []
+    current: List[str] = []
+
+    def walk(items):
+        for op, argument in items:
+            if op is _regex_parser.LITERAL:
+                current.append(chr(argument))
+            elif op is _regex_parser.SUBPATTERN and not argument[1] and not argument[2]:
+                walk(argument[-1]) # A plain group: its contents are required in sequence
+            else:
+                runs.append("".join(current))
+                current.clear()
+
+    walk(parsed)
+    runs.append("".join(current))
+    longest = max(runs, key=len)
+    return longest.lower() if len(longest.strip()) >= MIN_KEYWORD_CHARS else None
+
+
+class KeywordAutomaton(Generic[T]):
+    """
+    Maps keywords to values and finds the values of every keyword occurring in a text, matching
+    anywhere (like re.search), case-insensitively. Keywords can be added at any time; the
+    automaton is rebuilt on the next lookup.
+
+        index = KeywordAutomaton()
+        index.add("volume", "volume route")
+        index.find("turn up the volume")  # -> {"volume route"}
+    """
+
+    def __init__(self):
+        self._keywords: Dict[str, Set[T]] = {}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._outputs: List[frozenset] = [frozenset()]
+        self._fail: List[int] = [0]
+        self._stale = False
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._keywords)
+
+    def add(self, keyword: str, value: T):
+        with self._lock:
+            self._keywords.setdefault(keyword.lower(), set()).add(value)
+            self._stale = True
+
+    def discard(self, keyword: str, value: T):
+        with self._lock:
+            values = self._keywords.get(keyword.lower())
+            if values is not None:
+                values.discard(value)
+                if not values:
+                    del self._keywords[keyword.lower()]
+                self._stale = True
+
+    def _build(self):
+        """Builds the trie with failure links; each state's outputs include those of its failure state."""
+        goto: List[Dict[str, int]] = [{}]
+        own: List[Set[T]] = [set()]
+        for keyword, values in self._keywords.items():
+            state = 0
+            for char in keyword:
+                following = goto[state].get(char)
+                if following is None:
+                    following = goto[state][char] = len(goto)
+                    goto.append({})
+                    own.append(set())
+                state = following
+            own[state] |= values
+        fail = [0] * len(goto)
+        outputs: List[frozenset] = [frozenset()] * len(goto)
+        layer = list(goto[0].values())
+        for state in layer:
+            outputs[state] = frozenset(own[state])
+        while layer: # Breadth first, so a state's failure state is finished before it
+            following_layer = []
+            for state in layer:
+                for char, following in goto[state].items():
+                    fallback = fail[state]
+                    while fallback and char not in goto[fallback]:
+                        fallback = fail[fallback]
+                    fail[following] = goto[fallback].get(char, 0)
+                    outputs[following] = frozenset(own[following]) | outputs[fail[following]]
+                    following_layer.append(following)
+            layer = following_layer
+        self._goto, self._fail, self._outputs = goto, fail, outputs
+        self._stale = False
+
+    def find(self, text: str) -> Set[T]:
+        """The values of all keywords that occur in `text`."""
+        if self._stale:
+            with self._lock:
+                if self._stale:
+                    self._build()
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        found: Set[T] = set()
+        state = 0
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if outputs[state]:
+                found |= outputs[state]
+        return found
+
+
+if __name__ == '__main__':
+    # python -m william_ai_assistant.keyword_index
+    for pattern in (r"set volume to (\d+) percent", r"mute (?:my )?system", r"(?:open|launch) (.+)", r"google (.+)"):
+        print(f"{pattern!r} -> {required_literal(pattern, re.IGNORECASE)!r}")
+    index = KeywordAutomaton()
+    for keyword in ("he", "she", "his", "hers"):
+        index.add(keyword, keyword)
+    print(sorted(index.find("ushers"))) # ['he', 'hers', 'she']
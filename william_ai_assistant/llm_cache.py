@@ -0,0 +1,296 @@
+# Response cache for LLM replies
+# Voice users repeat themselves ("tell me a joke", "what's the capital of ..."), so replies are kept
+# keyed on the normalized prompt, the model and the last few history messages. An optional
+# similarity tier also answers near-duplicates: the prompts must have the same content words in the
+# same order (so "india" never answers "indiana", nor "celsius to fahrenheit" the reverse) and
+# overlap in trigrams; only function words like "the" or "tell me" may differ.
+# Entries expire after LLM_CACHE_TTL_SECONDS; the least recently used go first once the cache
+# outgrows LLM_CACHE_MAX_BYTES. The cache is saved to LLM_CACHE_FILE and reloaded on start-up.
+import collections
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from william_ai_assistant import config
+from william_ai_assistant.utils import LatencyHistogram
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LLM_CACHE_FILE_PATH = os.path.join(_BASE_DIR, config.LLM_CACHE_FILE)
+
+FILLER_WORDS = {"please", "um", "uh", "hey", "ok", "okay"} # Dropped from prompts before keying
+# Words a near-duplicate prompt may add or drop; every other word has to match (see _content_words)
+FUNCTION_WORDS = {"a", "an", "the", "is", "are", "was", "were", "do", "does", "did", "can", "could", "would",
+                  "will", "you", "me", "tell", "give", "show", "i", "to", "know", "want", "like", "just", "so"}
+CONTRACTIONS = {"what's": "what is", "who's": "who is", "where's": "where is", "how's": "how is",
+                "it's": "it is", "that's": "that is", "there's": "there is", "i'm": "i am"}
+_CONTRACTION_SUFFIXES = (("n't", " not"), ("'re", " are"), ("'ll", " will"), ("'ve", " have"), ("'d", " would"))
+_NON_WORD = re.compile(r"[^\w\s']+")
+# Microsecond buckets: the hit path is far below the default millisecond buckets
+CACHE_LATENCY_BUCKETS_MS = [0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 50]
+
+
+def normalize_prompt(text: str) -> str:
+    """Lower-cases, expands contractions, strips punctuation and filler words, and collapses whitespace."""
+    words = []
+    for word in _NON_WORD.sub(" ", text.lower().replace("\u2019", "'")).split():
+        if word in CONTRACTIONS:
+            word = CONTRACTIONS[word]
+        elif "'" in word:
+            for suffix, expansion in _CONTRACTION_SUFFIXES:
+                if word.endswith(suffix):
+                    word = ("will" if word == "won't" else "can" if word == "can't" else word[:-len(suffix)]) + expansion
+                    break
+        words.extend(word.strip("'").split())
+    if words and words[0] == "william": # "William, tell me a joke"
+        words = words[1:]
+    return " ".join(word for word in words if word not in FILLER_WORDS)
+
+
+def _trigrams(text: str) -> FrozenSet[str]:
+    padded = f" {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _content_words(prompt: str) -> Tuple[str, ...]:
+    return tuple(word for word in prompt.split() if word not in FUNCTION_WORDS)
+
+
+def _similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Jaccard overlap of two trigram sets, 0-1."""
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+class _Entry:
+    __slots__ = ("prompt", "context", "reply", "created", "size", "trigrams", "content")
+
+    def __init__(self, prompt: str, context: str, reply: str, created: float):
+        self.prompt = prompt # Normalized
+        self.context = context # Model, personality and history the reply depends on
+        self.reply = reply
+        self.created = created
+        self.size = len(prompt.encode("utf-8")) + len(reply.encode("utf-8")) + len(context)
+        self.trigrams = _trigrams(prompt)
+        self.content = _content_words(prompt)
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of LLM replies, bounded in bytes and persisted as JSON.
+
+        cache = ResponseCache()
+        reply = cache.get(text, model, history)
+        if reply is None:
+            reply = ask_the_llm(...)
+            cache.put(text, model, history, reply)
+    """
+
+    def __init__(self, path: Optional[str] = LLM_CACHE_FILE_PATH, max_bytes: int = config.LLM_CACHE_MAX_BYTES,
+                 ttl: float = config.LLM_CACHE_TTL_SECONDS, history_messages: int = config.LLM_CACHE_HISTORY_MESSAGES,
+                 similarity: float = config.LLM_CACHE_SIMILARITY):
+        """
+        Args:
+            path (Optional[str]): JSON file the cache is loaded from and saved to; None keeps it in memory only.
+            max_bytes (int): Approximate size bound (prompt + reply + context bytes per entry).
+            ttl (float): Seconds an entry stays valid.
+            history_messages (int): Trailing history messages that are part of the key.
+            similarity (float): Trigram overlap (0-1) for a near-duplicate prompt with the same content words
+                                to count as a hit; 0 = exact only.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.history_messages = history_messages
+        self.similarity = similarity
+        self._entries: "collections.OrderedDict[str, _Entry]" = collections.OrderedDict() # Least recently used first
+        self._by_context: Dict[str, set] = {} # Context -> keys, for the similarity tier
+        self.bytes = 0
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.hit_latency = LatencyHistogram(CACHE_LATENCY_BUCKETS_MS)
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._lock = threading.Lock()
+        if path:
+            self.load()
+
+    def _context(self, model: str, history: Optional[list]) -> str:
+        # Key on the conversation only; system messages (recalled memories, the summary) vary from call to call
+        turns = [entry for entry in history or [] if entry.get("role") != "system"]
+        recent = turns[-self.history_messages:] if self.history_messages else []
+        messages = [[entry.get("role"), normalize_prompt(str(entry.get("content", "")))] for entry in recent]
+        return json.dumps([model, config.ENABLE_PERSONALITY, messages])
+
+    @staticmethod
+    def _key(prompt: str, context: str) -> str:
+        return hashlib.sha256(f"{context}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, text: str, model: str, history: Optional[list] = None) -> Optional[str]:
+        """Returns the cached reply for this prompt, or None on a miss."""
+        start = time.perf_counter()
+        prompt = normalize_prompt(text)
+        context = self._context(model, history)
+        key = self._key(prompt, context)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.created > self.ttl:
+                self._remove(key)
+                self.expired += 1
+                entry = None
+            similar = False
+            if entry is None and self.similarity:
+                key, entry = self._find_similar(prompt, context, now)
+                similar = entry is not None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if similar:
+                self.similar_hits += 1
+            else:
+                self.hits += 1
+            reply = entry.reply
+        self.hit_latency.record(time.perf_counter() - start)
+        return reply
+
+    def _find_similar(self, prompt: str, context: str, now: float) -> Tuple[Optional[str], Optional[_Entry]]:
+        trigrams = _trigrams(prompt)
+        content = _content_words(prompt)
+        best_key, best_entry, best_score = None, None, self.similarity
+        for key in self._by_context.get(context, ()):
+            entry = self._entries[key]
+            # Trigrams overlap a lot for "12 times 13" and "12 times 14", or "india" and "indiana",
+            # and not at all for word order, so the content words have to match exactly, in order
+            if entry.content != content or now - entry.created > self.ttl:
+                continue
+            score = _similarity(trigrams, entry.trigrams)
+            if score >= best_score:
+                best_key, best_entry, best_score = key, entry, score
+        return best_key, best_entry
+
+    def put(self, text: str, model: str, history: Optional[list], reply: str):
+        """Stores a reply. Only pass successful replies, never error messages."""
+        prompt = normalize_prompt(text)
+        if not prompt or not reply:
+            return
+        context = self._context(model, history)
+        with self._lock:
+            self._insert(self._key(prompt, context), _Entry(prompt, context, reply, time.time()))
+            self._dirty = True
+            save_due = self.path and time.monotonic() - self._last_save >= config.LLM_CACHE_SAVE_SECONDS
+        if save_due:
+            threading.Thread(target=self.save, name="william-llm-cache-save", daemon=True).start()
+
+    def _insert(self, key: str, entry: _Entry):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._by_context.setdefault(entry.context, set()).add(key)
+        self.bytes += entry.size
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+        keys = self._by_context.get(entry.context)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_context[entry.context]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_context.clear()
+            self.bytes = 0
+            self._dirty = True
+
+    def load(self):
+        """Reads the saved entries, skipping expired ones. A missing or unreadable file leaves the cache empty."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            now = time.time()
+            with self._lock:
+                for prompt, context, reply, created in saved["entries"]: # Least recently used first
+                    if now - created <= self.ttl:
+                        self._insert(self._key(prompt, context), _Entry(prompt, context, reply, created))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Could not load the LLM cache from {self.path}: {e}")
+
+    def save(self):
+        """Writes the cache if it changed. Written to a temporary file first, so a crash never leaves half a file."""
+        with self._lock:
+            if not self.path or not self._dirty:
+                return
+            entries = [[e.prompt, e.context, e.reply, e.created] for e in self._entries.values()]
+            self._dirty = False
+            self._last_save = time.monotonic()
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "entries": entries}, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Could not save the LLM cache to {self.path}: {e}")
+
+    def stats(self) -> Dict[str, object]:
+        """Hit/miss counters and size, suitable for printing or JSON export."""
+        with self._lock:
+            lookups = self.hits + self.similar_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.similar_hits) / lookups if lookups else None,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "hit_latency": self.hit_latency.as_dict(),
+            }
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> Optional[ResponseCache]:
+    """Returns the shared ResponseCache, loading it on first use, or None if config.ENABLE_LLM_CACHE is off."""
+    global _cache
+    if not config.ENABLE_LLM_CACHE:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
+
+def save():
+    """Saves the shared cache, if it was used. Called on shutdown."""
+    if _cache is not None:
+        _cache.save()
+
+
+if __name__ == '__main__':
+    # Exercise an in-memory cache:
+    #   python -m william_ai_assistant.llm_cache
+    demo = ResponseCache(path=None)
+    demo.put("What's the capital of France?", "demo-model", [], "Paris.")
+    demo.similarity = 0.5
+    for question in ("what's the capital of France", "Hey, what is the capital of France?",
+                     "What is capital of France", "What's the capital of Spain?"):
+        print(f"{question!r} -> {demo.get(question, 'demo-model', [])!r}")
+    print(demo.stats())
@@ -3,12 +3,18 @@ import time
 import sys # For sys.exit()
 import os # For path manipulation
 import webbrowser # For opening the canvas
+from typing import Optional
 from william_ai_assistant import audio_listener
 from . import canvas_utils # Import canvas utilities
 # william_brain and system_commands will be used by the router, not directly by main's process_command
 # from william_ai_assistant import william_brain
 # from william_ai_assistant import system_commands
 from william_ai_assistant import tts_engine
+from william_ai_assistant import llm_cache
+from william_ai_assistant import memory_store
+from william_ai_assistant import orchestrator
+from william_ai_assistant import tracing
+from william_ai_assistant import william_brain
 from william_ai_assistant import config as app_config # This is the single source of truth for config
 
 # Imports for context_manager and router, assuming main.py is part of william_ai_assistant package
@@ -21,19 +27,18 @@ from william_ai_assistant.router import CommandRouter
 # Global command_router_instance, initialized in main()
 command_router_instance: CommandRouter = None
 
-def process_command(command_text: str, context_mgr: ContextManager) -> str:
-    """
-    Processes the command using the CommandRouter.
-    Updates context and returns assistant's response.
-    """
-    global command_router_instance
-    if not command_router_instance:
-        error_msg = "CommandRouter not initialized!"
-        print(f"CRITICAL ERROR: {error_msg}")
-        if app_config.ENABLE_VISUAL_CANVAS:
-            canvas_utils.update_canvas(ai_response=error_msg, thought_process="Critical error in processing.")
-        return error_msg
+def _router_missing() -> Optional[str]:
+    """Returns an error message if the CommandRouter has not been initialized."""
+    if command_router_instance:
+        return None
+    error_msg = "CommandRouter not initialized!"
+    print(f"CRITICAL ERROR: {error_msg}")
+    if app_config.ENABLE_VISUAL_CANVAS:
+        canvas_utils.update_canvas(ai_response=error_msg, thought_process="Critical error in processing.")
+    return error_msg
 
+def _begin_command(command_text: str, context_mgr: ContextManager) -> list:
+    """Shows the new command on the canvas, adds it to the context and returns the history for routing."""
     print(f"Processing command via Router: '{command_text}'")
     if app_config.ENABLE_VISUAL_CANVAS:
         # Clear previous response/thoughts for a new cycle, update current command
@@ -48,8 +53,18 @@ def process_command(command_text: str, context_mgr: ContextManager) -> str:
         )
 
     context_mgr.add_message("user", command_text)
-    history_for_llm = context_mgr.get_history()
+    return context_mgr.get_history(query=command_text) # Includes relevant exchanges from earlier conversations
+
+def process_command(command_text: str, context_mgr: ContextManager) -> str:
+    """
+    Processes the command using the CommandRouter.
+    Updates context and returns assistant's response.
+    """
+    error_msg = _router_missing()
+    if error_msg:
+        return error_msg
 
+    history_for_llm = _begin_command(command_text, context_mgr)
     assistant_response = command_router_instance.route(command_text, history=history_for_llm)
 
     context_mgr.add_message("assistant", assistant_response)
@@ -61,6 +76,68 @@ def process_command(command_text: str, context_mgr: ContextManager) -> str:
     return assistant_response
 
 
+def process_and_speak_command(command_text: str, context_mgr: ContextManager) -> str:
+    """
+    Processes the command and speaks the reply. With config.ENABLE_LLM_STREAMING an LLM reply is
+    spoken sentence by sentence while it is still being generated, and the canvas follows along.
+    Returns the assistant's full response once it has been spoken.
+    """
+    if not app_config.ENABLE_LLM_STREAMING:
+        assistant_response = process_command(command_text, context_mgr)
+        tts_engine.speak(assistant_response)
+        return assistant_response
+
+    error_msg = _router_missing()
+    if error_msg:
+        tts_engine.speak(error_msg)
+        return error_msg
+
+    history_for_llm = _begin_command(command_text, context_mgr)
+    reply = command_router_instance.route_stream(command_text, history=history_for_llm)
+    if isinstance(reply, str): # Not from the LLM; spoken in one piece
+        assistant_response = reply
+        if app_config.ENABLE_VISUAL_CANVAS:
+            canvas_utils.update_canvas(ai_response=assistant_response)
+        tts_engine.speak(assistant_response)
+    else:
+        on_text = None
+        if app_config.ENABLE_VISUAL_CANVAS:
+            on_text = lambda text_so_far: canvas_utils.update_canvas(ai_response=text_so_far)
+        assistant_response = tts_engine.speak_stream(reply, on_text=on_text)
+
+    context_mgr.add_message("assistant", assistant_response)
+    if app_config.ENABLE_VISUAL_CANVAS:
+        canvas_utils.update_canvas(thought_process="Command processed. Response spoken.")
+    return assistant_response
+
+
+def _export_trace():
+    """Writes the latency trace and summary, if tracing is enabled (config.ENABLE_TRACING)."""
+    if tracing.enabled:
+        tracing.print_summary()
+        path = tracing.export_chrome_trace()
+        if path:
+            print(f"Latency trace written to {path} (open it in chrome://tracing or ui.perfetto.dev)")
+
+
+def _shutdown(exit_code: int, farewell: Optional[str] = None):
+    """
+    Releases the microphone, writes out what is still buffered and exits the process.
+    Shared by every way main() ends: the listener stopping, Ctrl+C and an unexpected error.
+    """
+    audio_listener.close_capture() # Releases the microphone stream
+    _export_trace()
+    llm_cache.save()
+    memory_store.close() # Writes the exchanges still queued
+    canvas_utils.stop_server()
+    canvas_utils.flush() # In file mode, the last updates may still be waiting for the flusher
+    if farewell and tts_engine.engine_initialized:
+        tts_engine.speak(farewell)
+    # pyttsx3 engine doesn't usually need explicit stop on normal exit.
+    print("Exited cleanly." if exit_code == 0 else "Application shutting down due to an error.")
+    sys.exit(exit_code) # Non-zero indicates an error
+
+
 def main():
     """
     Main function to run William AI Assistant.
@@ -68,14 +145,22 @@ def main():
     global command_router_instance
 
     # TTS engine is initialized in the `if __name__ == "__main__":` block before `main()` is called.
-    audio_listener.adjust_for_ambient_noise() # This will also initialize the microphone if needed.
+    audio_listener.adjust_for_ambient_noise() # Opens the microphone stream, which stays open until shutdown.
 
     # Initialize ContextManager for conversation history
-    context_manager = ContextManager()
+    context_manager = ContextManager(memory=memory_store.get_store())
 
     # Initialize CommandRouter
     command_router_instance = CommandRouter()
     print("Command Router initialized.")
+    if app_config.LLM_PREWARM_ON_STARTUP:
+        william_brain.prewarm_connection() # TLS handshake happens while the rest of start-up runs
+
+    def speculate(partial):
+        """Routes the stable part of a command while it is still being spoken."""
+        if partial.stable_text:
+            command_router_instance.speculate(partial.stable_text, history=context_manager.get_history(),
+                                              complete=partial.stable_text == partial.text)
 
     # Personal Assistant Declaration
     declaration_message = "🚫 William AI is a private desktop assistant. Not for public distribution." # Updated message
@@ -84,13 +169,17 @@ def main():
 
     # Initialize and Open Visual Canvas if enabled
     if app_config.ENABLE_VISUAL_CANVAS:
+        server_url = canvas_utils.start_server() # Pushes updates to the page; None means the data file is used
         canvas_utils.initialize_canvas_data_file() # Initialize the data file
         try:
             # Construct path to canvas.html relative to main.py's location
             base_dir = os.path.dirname(os.path.abspath(__file__))
             canvas_path = os.path.join(base_dir, 'canvas', 'canvas.html')
+            if server_url:
+                print(f"Opening Visual Canvas: {server_url}")
+                webbrowser.open(server_url)
             # Check if file exists before attempting to open
-            if os.path.exists(canvas_path):
+            elif os.path.exists(canvas_path):
                 # Prepend 'file://' for local files
                 canvas_url = f"file://{os.path.abspath(canvas_path)}"
                 print(f"Opening Visual Canvas: {canvas_url}")
@@ -103,7 +192,7 @@ def main():
         except Exception as e:
             print(f"Could not open visual canvas: {e}")
 
-    tts_engine.speak("William AI Assistant is now active.")
+    audio_listener.speak_prompt("William AI Assistant is now active.") # Capture is paused while prompts play
 
     # Determine initial listening mode based on app_config
     currently_listening_for_command = app_config.ALWAYS_LISTEN
@@ -111,9 +200,16 @@ def main():
         print("William AI Assistant is now active. Listening for wake word...")
     else:
         print("William AI Assistant is now active and in always listen mode.")
-        tts_engine.speak("Always listen mode is active.") # Notify user
+        audio_listener.speak_prompt("Always listen mode is active.") # Notify user
 
     try:
+        if app_config.ENABLE_ASYNC_CORE:
+            # Listens, thinks and speaks concurrently; returns only when the listener runs out of input
+            orchestrator.Orchestrator(command_router_instance, context_manager, _begin_command,
+                                      on_partial=speculate).run()
+            print("\nListener stopped. Exiting William AI Assistant...")
+            _shutdown(0, farewell="Goodbye!")
+
         while True:
             command_text = None
             if currently_listening_for_command:
@@ -122,7 +218,7 @@ def main():
                 if app_config.ENABLE_VISUAL_CANVAS:
                     canvas_utils.update_canvas(current_command="", thought_process=listening_status_msg, clear_ai_response=True) # Clear previous command/response
 
-                command_text = audio_listener.listen_for_command()
+                command_text = audio_listener.listen_for_command(on_partial=speculate)
                 if command_text is None: # Timeout or silence
                     if app_config.ENABLE_VISUAL_CANVAS:
                         canvas_utils.update_canvas(thought_process="No command heard, still listening (if in always listen mode)...")
@@ -150,7 +246,7 @@ def main():
                     print(wake_word_detected_msg)
                     if app_config.ENABLE_VISUAL_CANVAS:
                          canvas_utils.update_canvas(thought_process=wake_word_detected_msg)
-                    command_text = audio_listener.listen_for_command()
+                    command_text = audio_listener.listen_for_command(on_partial=speculate)
                     if command_text is None and app_config.ENABLE_VISUAL_CANVAS: # No command after wake word
                         canvas_utils.update_canvas(thought_process="No command heard after wake word. Reverting to wake word listening.")
                 else:
@@ -159,13 +255,16 @@ def main():
                     print(error_msg)
                     if app_config.ENABLE_VISUAL_CANVAS:
                         canvas_utils.update_canvas(thought_process=error_msg, ai_response="Speech service issue.")
-                    tts_engine.speak("There was an issue with the speech service. I will try again.")
+                    audio_listener.speak_prompt("There was an issue with the speech service. I will try again.")
                     time.sleep(3)
                     continue # Retry listening for wake word
 
             if command_text:
-                assistant_response = process_command(command_text, context_manager)
-                tts_engine.speak(assistant_response)
+                # Keep the stream open but stop segmenting, so William does not transcribe his own reply
+                audio_listener.pause_capture()
+                process_and_speak_command(command_text, context_manager)
+                tracing.end_turn()
+                audio_listener.resume_capture()
 
                 # Decide if we should continue listening for a command or go back to wake word
                 if app_config.ALWAYS_LISTEN:
@@ -189,14 +288,7 @@ def main():
 
     except KeyboardInterrupt:
         print("\nExiting William AI Assistant via KeyboardInterrupt...")
-        if tts_engine.engine_initialized:
-            tts_engine.speak("Goodbye!")
-        # Resources like microphone (if held outside 'with' or in global scope)
-        # or TTS engine itself might need explicit cleanup if not handled by OS on exit.
-        # pyttsx3 engine doesn't usually need explicit stop on normal exit.
-        # Microphone is used with context manager, so it should release.
-        print("Exited cleanly.")
-        sys.exit(0)
+        _shutdown(0, farewell="Goodbye!")
     except Exception as e:
         error_message = f"An unexpected error occurred in main loop: {e}"
         print(error_message)
@@ -204,7 +296,7 @@ def main():
         # For now, just printing to console.
 
         if tts_engine.engine_initialized:
-            tts_engine.speak("Something went wrong. Shutting down.")
+            audio_listener.speak_prompt("Something went wrong. Shutting down.")
         else:
             # This case might happen if TTS failed to initialize early on
             print("TTS not available to announce shutdown.")
@@ -213,12 +305,8 @@ def main():
         # For example, if tts_engine had a specific close/shutdown method:
         # if hasattr(tts_engine, 'shutdown') and callable(tts_engine.shutdown):
         # tts_engine.shutdown()
-        # For speech_recognition's Microphone, it's typically used with a context manager,
-        # which handles cleanup. If used globally, it might need explicit closing.
-        # However, current audio_listener.py uses 'with microphone as source:'.
-
-        print("Application shutting down due to an error.")
-        sys.exit(1) # Exit with a non-zero code to indicate an error
+        # The microphone stream is held open by audio_listener for the whole session.
+        _shutdown(1)
 
 if __name__ == "__main__":
     # API key is now loaded from .env via config.py
@@ -0,0 +1,257 @@
+# Long-term conversation memory for William AI Assistant
+# Every exchange (a command and William's reply) is appended to a SQLite database with an FTS5
+# full-text index, so later conversations can recall what was said days ago. Writes go through a
+# queue to a background thread and never block the voice loop. Recall is a BM25-ranked full-text
+# query over the command's distinctive words (words found in a large share of all exchanges are
+# dropped, as ranking them costs time without telling exchanges apart), interrupted once it
+# exceeds MEMORY_RECALL_BUDGET_MS.
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from william_ai_assistant import config
+from william_ai_assistant.utils import LatencyHistogram
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MEMORY_DB_PATH = os.path.join(_BASE_DIR, config.MEMORY_DB_FILE)
+
+WRITE_BATCH_SIZE = 500 # Exchanges written per transaction when the queue backs up
+MAX_QUERY_TERMS = 8
+MIN_COMMON_TERM_DOCS = 100 # A word is never "too common" below this many exchanges, so small stores rank everything
+CANDIDATES_PER_RESULT = 4 # Ranked matches fetched per requested result, leaving room to skip this session's
+STOP_WORDS = {"a", "an", "and", "are", "as", "at", "be", "but", "by", "can", "could", "do", "does", "for", "from",
+              "have", "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "please", "so", "that", "the",
+              "this", "to", "was", "we", "what", "when", "where", "which", "who", "why", "will", "with", "would",
+              "you", "your", "william", "tell", "about"}
+_WORD = re.compile(r"\w+")
+_STOP = object() # Ends the writer thread
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY,
+    session TEXT NOT NULL,
+    user TEXT NOT NULL,
+    assistant TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS turns_fts USING fts5(
+    user, assistant, content='turns', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS turns_fts_insert AFTER INSERT ON turns BEGIN
+    INSERT INTO turns_fts(rowid, user, assistant) VALUES (new.id, new.user, new.assistant);
+END;
+"""
+
+
+def query_terms(text: str) -> List[str]:
+    """The meaningful words of `text`, without stop words or repeats."""
+    terms = []
+    for word in _WORD.findall(text.lower()):
+        if len(word) > 1 and word not in STOP_WORDS and word not in terms:
+            terms.append(word)
+    return terms
+
+
+class MemoryStore:
+    """
+    Durable store of past exchanges with bounded-latency full-text recall.
+
+        store = MemoryStore()
+        store.remember("What's my sister's name?", "You told me it's Anna.")  # Returns at once
+        store.recall("sister's birthday", k=3)  # -> [{"user": ..., "assistant": ..., "created": ..., ...}]
+    """
+
+    def __init__(self, path: str = MEMORY_DB_PATH, recall_budget_ms: float = config.MEMORY_RECALL_BUDGET_MS,
+                 queue_size: int = config.MEMORY_WRITE_QUEUE_SIZE):
+        """
+        Args:
+            path (str): SQLite database file, created if missing.
+            recall_budget_ms (float): A recall query running longer than this is interrupted and returns nothing.
+            queue_size (int): Exchanges waiting to be written; beyond this new ones are dropped, not waited for.
+        """
+        self.path = path
+        self.recall_budget_ms = recall_budget_ms
+        self.session = uuid.uuid4().hex[:12] # Lets recall skip what is still in this session's context window
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        setup = sqlite3.connect(path)
+        setup.execute("PRAGMA journal_mode=WAL") # Readers don't wait for the writer
+        setup.executescript(_SCHEMA)
+        setup.close()
+        self._reader = sqlite3.connect(path, check_same_thread=False)
+        self._read_lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.written = 0
+        self.dropped = 0
+        self.timeouts = 0
+        self.recall_latency = LatencyHistogram()
+        self.max_term_fraction = config.MEMORY_MAX_TERM_FRACTION
+        self._rows = self._reader.execute("SELECT COUNT(*) FROM turns").fetchone()[0]
+        self._common_terms: Dict[str, bool] = {} # Term -> found in too many exchanges, at the row count below
+        self._common_terms_rows = self._rows
+        self._writer = threading.Thread(target=self._write_loop, name="william-memory-writer", daemon=True)
+        self._writer.start()
+
+    def remember(self, user_text: str, assistant_text: str, created: Optional[float] = None):
+        """Queues one exchange for writing. Never blocks; if the writer has fallen far behind, the exchange is dropped."""
+        try:
+            self._queue.put_nowait((self.session, user_text, assistant_text, created or time.time()))
+        except queue.Full:
+            self.dropped += 1
+
+    def _write_loop(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA synchronous=NORMAL") # Safe with WAL; a crash loses at most the last transaction
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            batch = []
+            while True:
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+                if stopping or len(batch) >= WRITE_BATCH_SIZE:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                if batch:
+                    with connection:
+                        connection.executemany(
+                            "INSERT INTO turns (session, user, assistant, created) VALUES (?, ?, ?, ?)", batch)
+                    self.written += len(batch)
+                    self._rows += len(batch)
+            except sqlite3.Error as e:
+                print(f"Could not write {len(batch)} exchange(s) to the memory store: {e}")
+            finally:
+                for _ in range(len(batch) + (1 if stopping else 0)):
+                    self._queue.task_done()
+        connection.close()
+
+    def flush(self):
+        """Blocks until every queued exchange is written (shutdown, tests and benchmarks)."""
+        self._queue.join()
+
+    def recall(self, text: str, k: int = config.MEMORY_TOP_K, include_session: bool = False) -> List[Dict[str, object]]:
+        """
+        Returns up to `k` past exchanges relevant to `text`, best first. Returns an empty list if
+        nothing matches or the query ran over the latency budget.
+
+        Args:
+            include_session (bool): Also return exchanges from this run, which are usually still
+                                    in the context window anyway.
+        """
+        terms = query_terms(text)
+        if not terms:
+            return []
+        start = time.perf_counter()
+        deadline = start + self.recall_budget_ms / 1000.0
+        with self._read_lock:
+            # Called every 1000 SQLite VM steps; a non-zero return interrupts the query
+            self._reader.set_progress_handler(lambda: time.perf_counter() > deadline, 1000)
+            try:
+                distinctive = [term for term in terms if not self._is_common(term)][:MAX_QUERY_TERMS]
+                rows = []
+                if distinctive:
+                    # Rank in the full-text index first, then look up only the few best exchanges
+                    rows = self._reader.execute(
+                        "SELECT t.user, t.assistant, t.created, m.score FROM ("
+                        "  SELECT rowid, bm25(turns_fts, 2.0, 1.0) AS score FROM turns_fts"
+                        "  WHERE turns_fts MATCH ? ORDER BY score LIMIT ?"
+                        ") m JOIN turns t ON t.id = m.rowid WHERE ? OR t.session != ? ORDER BY m.score LIMIT ?",
+                        (" OR ".join(f'"{term}"' for term in distinctive), k * CANDIDATES_PER_RESULT,
+                         include_session, self.session, k)).fetchall()
+            except sqlite3.OperationalError as e:
+                if "interrupted" not in str(e):
+                    print(f"Memory recall failed: {e}")
+                    rows = []
+                else:
+                    self.timeouts += 1
+                    self.recall_latency.record(time.perf_counter() - start, error=True)
+                    return []
+            finally:
+                self._reader.set_progress_handler(None, 0)
+        self.recall_latency.record(time.perf_counter() - start)
+        return [{"user": user, "assistant": assistant, "created": created, "score": score}
+                for user, assistant, created, score in rows]
+
+    def _is_common(self, term: str) -> bool:
+        """Whether `term` occurs in more than MEMORY_MAX_TERM_FRACTION of all exchanges. Caller holds the read lock."""
+        if self._rows > self._common_terms_rows * 1.1: # Re-check once the store has grown by a tenth
+            self._common_terms.clear()
+            self._common_terms_rows = self._rows
+        common = self._common_terms.get(term)
+        if common is None:
+            limit = max(MIN_COMMON_TERM_DOCS, int(self.max_term_fraction * self._rows))
+            # Counting stops at the limit, so a very common word costs no more than a rare one
+            found = self._reader.execute("SELECT COUNT(*) FROM (SELECT 1 FROM turns_fts WHERE turns_fts MATCH ? LIMIT ?)",
+                                         (f'"{term}"', limit)).fetchone()[0]
+            common = self._common_terms[term] = found >= limit
+        return common
+
+    def count(self) -> int:
+        with self._read_lock:
+            return self._reader.execute("SELECT COUNT(*) FROM turns").fetchone()[0]
+
+    def stats(self) -> Dict[str, object]:
+        """Write and recall counters, suitable for printing or JSON export."""
+        return {
+            "written": self.written,
+            "queued": self._queue.qsize(),
+            "dropped": self.dropped,
+            "recall_timeouts": self.timeouts,
+            "recall": self.recall_latency.as_dict(),
+        }
+
+    def close(self):
+        """Writes what is still queued and closes the database."""
+        self._queue.put(_STOP)
+        self._writer.join(timeout=10)
+        with self._read_lock:
+            self._reader.close()
+
+
+_store: Optional[MemoryStore] = None
+_store_lock = threading.Lock()
+
+def get_store() -> Optional[MemoryStore]:
+    """Returns the shared MemoryStore, opening it on first use, or None if config.ENABLE_LONG_TERM_MEMORY is off."""
+    global _store
+    if not config.ENABLE_LONG_TERM_MEMORY:
+        return None
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = MemoryStore()
+            except sqlite3.Error as e: # e.g. a SQLite build without FTS5
+                print(f"Long-term memory is unavailable: {e}")
+                config.ENABLE_LONG_TERM_MEMORY = False
+                return None
+        return _store
+
+def close():
+    """Flushes and closes the shared store, if it was opened. Called on shutdown."""
+    if _store is not None:
+        _store.close()
+
+
+if __name__ == '__main__':
+    # Remember a few exchanges in a scratch database and recall them:
+    #   python -m william_ai_assistant.memory_store
+    import tempfile
+    demo = MemoryStore(os.path.join(tempfile.mkdtemp(prefix="william-memory-"), "memory.db"))
+    demo.remember("My sister Anna's birthday is on the 3rd of May.", "Got it, Anna's birthday is May 3rd.")
+    demo.remember("I parked on level 4 of the station garage.", "Okay, level 4 of the station garage.")
+    demo.flush()
+    for question in ("When is Anna's birthday?", "Where did I park the car?", "What's the weather?"):
+        print(f"{question!r} -> {demo.recall(question, include_session=True)}")
+    demo.close()
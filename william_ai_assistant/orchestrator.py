@@ -0,0 +1,302 @@
+# Asyncio core of William AI Assistant
+# The old main loop listened, thought and spoke strictly one after another, so William could not
+# hear anything while he was speaking. Here every stage is a task and the stages are joined by
+# bounded queues:
+#
+#   listener thread --commands--> dispatcher --> reply task: route / LLM stream --sentences--> speech
+#                                                      \--canvas updates--> canvas task
+#
+# Microphone capture and speech recognition already run on their own threads (audio_capture.py);
+# the listener thread hands each finished command to the event loop, and speech has its own worker
+# (tts_engine.TTSWorker). Other blocking libraries (requests, canvas file writes) run in a thread
+# pool. With config.ENABLE_BARGE_IN, the wake word heard while William is still replying cancels that
+# reply: the LLM stream is closed and speech stops. In always listen mode the wake word has to start
+# the new command; otherwise speech stops as soon as it is detected, before "Yes?".
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import CancelledError as FutureCancelledError
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Optional
+
+from william_ai_assistant import audio_listener, canvas_utils, config, tracing, tts_engine
+from william_ai_assistant.tts_engine import SentenceChunker
+
+_STOP = object() # Ends the dispatcher once the listener has stopped
+
+
+def _call_in_turn(turn: Optional[int], started_at: Optional[float], function, *args, **kwargs):
+    """Runs `function` with its spans (and a possible tracing.end_turn) counted towards `turn`."""
+    previous = tracing.current_turn(), tracing.turn_started_at()
+    tracing.adopt_turn(turn, started_at)
+    try:
+        return function(*args, **kwargs)
+    finally:
+        tracing.adopt_turn(*previous)
+
+
+class Orchestrator:
+    """
+    Runs the assistant on an asyncio event loop until the listener stops.
+
+        Orchestrator(router, context, begin_command=main._begin_command).run()
+    """
+
+    def __init__(self, router, context, begin_command: Callable, on_partial: Optional[Callable] = None,
+                 barge_in: bool = config.ENABLE_BARGE_IN, workers: int = config.ASYNC_WORKER_THREADS,
+                 queue_size: int = config.ASYNC_QUEUE_SIZE):
+        """
+        Args:
+            router (CommandRouter): Routes commands and streams LLM replies.
+            context (ContextManager): The conversation history.
+            begin_command (Callable): begin_command(command, context) -> history for routing; shows the
+                                      command on the canvas and adds it to the context (see main.py).
+            on_partial (Optional[Callable]): Passed on to audio_listener.listen_for_command.
+            barge_in (bool): Cancel the reply in progress when the wake word is heard. Without it the
+                             microphone is paused while William speaks, as in the old loop, and
+                             commands wait their turn.
+            workers (int): Threads for blocking calls.
+            queue_size (int): Bound of each queue between tasks.
+        """
+        self.router = router
+        self.context = context
+        self.begin_command = begin_command
+        self.on_partial = on_partial
+        self.barge_in = barge_in
+        self.queue_size = queue_size
+        self.heard = 0
+        self.interrupted = 0 # Replies cut off by the wake word
+        self.ignored = 0 # Speech heard during a reply without the wake word (probably William himself)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="william-async")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reply: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+
+    def run(self):
+        """Blocks until the listener stops, then re-raises whatever stopped it, if anything. Ctrl+C raises KeyboardInterrupt."""
+        try:
+            asyncio.run(self._serve())
+        finally:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._error is not None:
+            raise self._error
+
+    def stats(self) -> Dict[str, int]:
+        return {"heard": self.heard, "interrupted": self.interrupted, "ignored": self.ignored}
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._commands = asyncio.Queue(self.queue_size)
+        self._canvas = asyncio.Queue(self.queue_size)
+        canvas_task = asyncio.create_task(self._publish_canvas()) if config.ENABLE_VISUAL_CANVAS else None
+        threading.Thread(target=self._listen, name="william-listener", daemon=True).start()
+        try:
+            while True:
+                item = await self._commands.get()
+                if item is _STOP:
+                    break
+                await self._dispatch(*item)
+            if self._reply is not None:
+                await asyncio.gather(self._reply, return_exceptions=True) # Let the last reply finish
+            if canvas_task is not None:
+                await self._canvas.join()
+        finally:
+            if self._reply is not None and not self._reply.done():
+                self._reply.cancel() # Ctrl+C: stop talking
+                await asyncio.gather(self._reply, return_exceptions=True)
+            if canvas_task is not None:
+                canvas_task.cancel()
+
+    def _run(self, turn: Optional[int], started_at: Optional[float], function, *args, **kwargs) -> asyncio.Future:
+        """Runs a blocking call in the thread pool, as part of `turn`."""
+        call = functools.partial(_call_in_turn, turn, started_at, function, *args, **kwargs)
+        return self._loop.run_in_executor(self._executor, call)
+
+    # Listener thread
+
+    def _listen(self):
+        """Waits for commands with the blocking audio_listener calls and queues them for the event loop."""
+        try:
+            while True:
+                command = self._hear()
+                if command:
+                    item = (command, tracing.current_turn(), tracing.turn_started_at())
+                    tracing.adopt_turn(None) # The turn continues on the event loop
+                    if not self._submit(item):
+                        return
+        except BaseException as e: # Re-raised by run() on the main thread
+            self._error = e
+        self._submit(_STOP)
+
+    def _hear(self) -> Optional[str]:
+        """One blocking wait for a command, after the wake word unless config.ALWAYS_LISTEN."""
+        if not config.ALWAYS_LISTEN and not audio_listener.listen_for_wake_word(on_wake=self._wake):
+            print("Error with wake word listener or speech service. Retrying after delay...")
+            audio_listener.speak_prompt("There was an issue with the speech service. I will try again.")
+            time.sleep(3)
+            return None
+        return audio_listener.listen_for_command(on_partial=self.on_partial)
+
+    def _wake(self):
+        """Listener thread: the wake word was heard. Stops the reply before "Yes?" is said over it."""
+        if not self.barge_in:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._interrupt(), self._loop).result()
+        except (RuntimeError, FutureCancelledError): # The event loop has shut down (Ctrl+C)
+            pass
+
+    def _submit(self, item) -> bool:
+        """Queues `item` from the listener thread, waiting while the queue is full. False once the loop is gone."""
+        try:
+            asyncio.run_coroutine_threadsafe(self._commands.put(item), self._loop).result()
+            return True
+        except (RuntimeError, FutureCancelledError): # The event loop has shut down (Ctrl+C)
+            return False
+
+    # Event loop
+
+    async def _dispatch(self, command: str, turn: Optional[int], started_at: Optional[float]):
+        """Starts the reply to a new command, first cutting off (or waiting for) the one in progress."""
+        self.heard += 1
+        if self._reply is not None and not self._reply.done():
+            if not self.barge_in:
+                await asyncio.gather(self._reply, return_exceptions=True)
+            else:
+                # The microphone is open while William speaks, so this could be his own voice
+                if config.WAKE_WORD not in command:
+                    print(f"Ignoring '{command}' while replying; say '{config.WAKE_WORD}' to interrupt.")
+                    self.ignored += 1
+                    _call_in_turn(turn, started_at, tracing.end_turn)
+                    return
+                command = command.split(config.WAKE_WORD, 1)[1].strip(" ,.!?")
+                await self._interrupt()
+                if not command: # Just the wake word: stop talking and listen
+                    _call_in_turn(turn, started_at, tracing.end_turn)
+                    return
+        self._reply = asyncio.create_task(self._respond(command, turn, started_at))
+
+    async def _interrupt(self):
+        """Cuts off the reply in progress, if any, and waits until speech has stopped."""
+        if self._reply is None or self._reply.done():
+            return
+        print("Wake word heard; cutting off the current reply.")
+        self.interrupted += 1
+        self._reply.cancel()
+        await asyncio.gather(self._reply, return_exceptions=True)
+
+    async def _respond(self, command: str, turn: Optional[int], started_at: Optional[float]):
+        """Routes `command` and speaks the reply sentence by sentence while it is still being generated."""
+        pieces = asyncio.Queue(self.queue_size)
+        cancelled = threading.Event()
+        spoken = [] # (piece, future from tts_engine.speak_async), in the order queued
+        try:
+            if not self.barge_in:
+                await self._run(turn, started_at, audio_listener.pause_capture) # Don't transcribe the reply
+            history = await self._run(turn, started_at, self.begin_command, command, self.context)
+            reading = time.monotonic()
+            reader = self._run(turn, started_at, self._read_reply, command, history, pieces, cancelled)
+            while True:
+                piece = await pieces.get()
+                if piece is None:
+                    break
+                if not spoken:
+                    _call_in_turn(turn, started_at, tracing.record, "tts_first_piece", reading, time.monotonic())
+                # Queued without waiting, so the speech worker renders it while the piece before plays
+                spoken.append((piece, _call_in_turn(turn, started_at, tts_engine.speak_async, piece)))
+                await self._show(ai_response=" ".join(text for text, _ in spoken))
+            reply = await reader
+            if spoken:
+                await asyncio.wrap_future(spoken[-1][1]) # Pieces are spoken in order; the last one ends the reply
+            self.context.add_message("assistant", reply)
+            await self._show(ai_response=reply, thought_process="Command processed. Response spoken.")
+        except asyncio.CancelledError:
+            cancelled.set()
+            tts_engine.cancel()
+            heard = [text for text, done in spoken if done.done() and done.result()]
+            if heard: # Only the sentences the user heard in full belong in the history
+                self.context.add_message("assistant", " ".join(heard))
+            self._show_now(thought_process="Interrupted by the wake word.")
+            raise
+        except Exception as e:
+            cancelled.set()
+            print(f"Error while replying to '{command}': {e}")
+            self._show_now(thought_process=f"Error while replying: {e}")
+            await self._run(turn, started_at, tts_engine.speak, "Sorry, something went wrong with that command.")
+        finally:
+            if not self.barge_in:
+                audio_listener.resume_capture()
+            _call_in_turn(turn, started_at, tracing.end_turn)
+
+    def _read_reply(self, command: str, history: list, pieces: asyncio.Queue, cancelled: threading.Event) -> str:
+        """
+        Worker thread: routes the command and feeds the reply to the speech queue, sentence by sentence
+        while an LLM reply is streamed, or in one piece if it is complete already.
+        """
+        chunker = SentenceChunker()
+        received = []
+        deltas = iter(())
+        try:
+            if config.ENABLE_LLM_STREAMING:
+                reply = self.router.route_stream(command, history=history)
+            else:
+                reply = self.router.route(command, history=history)
+            if isinstance(reply, str): # A route, a plugin or a non-streamed LLM reply
+                reply = reply.strip()
+                if reply:
+                    self._put(pieces, reply, cancelled)
+                return reply
+            deltas = reply
+            for delta in deltas:
+                if cancelled.is_set():
+                    break
+                received.append(delta)
+                for piece in chunker.feed(delta):
+                    self._put(pieces, piece, cancelled)
+            else:
+                rest = chunker.flush()
+                if rest:
+                    self._put(pieces, rest, cancelled)
+        finally:
+            if cancelled.is_set() and hasattr(deltas, "close"):
+                deltas.close() # Closes the LLM stream's HTTP response; generation stops
+            self._put(pieces, None, cancelled)
+        return "".join(received).strip()
+
+    def _put(self, pieces: asyncio.Queue, item, cancelled: threading.Event):
+        """Queues `item` for the speech task from a worker thread, waiting while the queue is full unless cancelled."""
+        try:
+            future = asyncio.run_coroutine_threadsafe(pieces.put(item), self._loop)
+        except RuntimeError: # The event loop has shut down
+            return
+        while not cancelled.is_set():
+            try:
+                return future.result(timeout=0.1)
+            except FutureTimeoutError:
+                continue
+        future.cancel()
+
+    async def _show(self, **update):
+        """Queues a canvas update; written in order by the canvas task."""
+        if config.ENABLE_VISUAL_CANVAS:
+            await self._canvas.put(update)
+
+    def _show_now(self, **update):
+        """Like `_show`, for where awaiting is not possible (cancellation); dropped if the queue is full."""
+        if config.ENABLE_VISUAL_CANVAS:
+            try:
+                self._canvas.put_nowait(update)
+            except asyncio.QueueFull:
+                pass
+
+    async def _publish_canvas(self):
+        while True:
+            update = await self._canvas.get()
+            try:
+                await self._loop.run_in_executor(self._executor, functools.partial(canvas_utils.update_canvas, **update))
+            except Exception as e:
+                print(f"Error updating the canvas: {e}")
+            finally:
+                self._canvas.task_done()
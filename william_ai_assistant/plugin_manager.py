@@ -1,57 +1,293 @@
 # William AI Plugin Manager
-import os
+#
+# Plugins are found without importing them. Each plugin file may declare, at module level:
+#
+#   PLUGIN_KEYWORDS = ["weather", "forecast"]  # Words a command it handles contains
+#   PLUGIN_PATTERNS = [r"how (hot|cold) is it"] # Or regexes such a command matches
+#   PLUGIN_ENTRY_POINT = "WeatherReporterPlugin" # The plugin class
+#
+# These are read from the source (ast, nothing is executed) into a manifest, cached in
+# config.PLUGIN_MANIFEST_CACHE_FILE and only read again when the file changes. A plugin is
+# imported the first time a command contains one of its keywords or matches one of its patterns;
+# its can_handle_command still has the final say. Plugins that declare neither are imported on
+# the first command, as they could handle anything.
+#
+# Only those candidates are asked about a command, found through an index of the triggers rather
+# than by asking every plugin (with a handful of plugins, a plain loop over them is quicker). When
+# several can handle it, the one most confident wins: a plugin may define
+# confidence(command_text) -> 0..1, asked after can_handle_command says yes.
+import ast
+import hashlib
 import importlib.util
 import inspect
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+from william_ai_assistant import config, tracing
+from william_ai_assistant.keyword_index import KeywordAutomaton, required_literal
 
 # Get the directory containing plugin_manager.py (e.g., william_ai_assistant/)
 # This makes the plugin path robust regardless of where the script is called from.
 _PLUGIN_MANAGER_DIR = os.path.dirname(os.path.abspath(__file__))
 PLUGIN_DIR_PATH = os.path.join(_PLUGIN_MANAGER_DIR, "plugins")
+MANIFEST_CACHE_PATH = os.path.join(_PLUGIN_MANAGER_DIR, config.PLUGIN_MANIFEST_CACHE_FILE)
+_MANIFEST_VERSION = 1 # Bump when the manifest format changes; older caches are ignored
+DEFAULT_CONFIDENCE = 0.5 # For plugins without a confidence method
+LINEAR_SCAN_MAX_PLUGINS = 12 # Up to this many plugins, checking each one's triggers beats the index (bench_plugin_dispatch)
+
+
+class PluginManifest:
+    """What a plugin file declares about itself, read without importing it."""
+
+    def __init__(self, name: str, path: str, entry_point: Optional[str] = None,
+                 keywords: Optional[List[str]] = None, patterns: Optional[List[str]] = None):
+        self.name = name
+        self.path = path
+        self.entry_point = entry_point # Class to instantiate; None if it can't be told from the source
+        self.keywords = keywords or []
+        self.patterns = patterns or []
+        self.compiled = [re.compile(pattern, re.IGNORECASE) for pattern in self.patterns]
+
+    @property
+    def has_triggers(self) -> bool:
+        return bool(self.keywords or self.patterns)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "entry_point": self.entry_point, "keywords": self.keywords, "patterns": self.patterns}
+
+    @classmethod
+    def from_dict(cls, name: str, path: str, data: Dict[str, Any]) -> "PluginManifest":
+        return cls(name, path, data["entry_point"], data["keywords"], data["patterns"])
+
+    @classmethod
+    def from_source(cls, name: str, path: str, source: bytes) -> "PluginManifest":
+        """Reads the PLUGIN_* declarations and finds the plugin class in a plugin's source."""
+        tree = ast.parse(source, filename=path)
+        declared: Dict[str, Any] = {}
+        plugin_classes = []
+        for node in tree.body:
+            if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+                if node.targets[0].id in ("PLUGIN_KEYWORDS", "PLUGIN_PATTERNS", "PLUGIN_ENTRY_POINT"):
+                    try:
+                        declared[node.targets[0].id] = ast.literal_eval(node.value)
+                    except ValueError: # Computed at import time; the plugin is asked about every command
+                        print(f"Plugin {name}: {node.targets[0].id} must be a literal to be used before import.")
+            elif isinstance(node, ast.ClassDef):
+                methods = {item.name for item in node.body if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef))}
+                if {"can_handle_command", "execute_command"} <= methods:
+                    plugin_classes.append(node.name)
+        # Without a declaration, the first plugin class by name, as inspect.getmembers would find it.
+        # A class that inherits its methods isn't recognized here; the entry point is then left to _load.
+        entry_point = declared.get("PLUGIN_ENTRY_POINT") or (min(plugin_classes) if plugin_classes else None)
+        return cls(name, path, entry_point, list(declared.get("PLUGIN_KEYWORDS", [])),
+                   list(declared.get("PLUGIN_PATTERNS", [])))
 
 
 class PluginManager:
-    def __init__(self): # base_path argument removed
-        self.plugins = {}
-        self.plugin_dir = PLUGIN_DIR_PATH # Use the calculated absolute path
+    def __init__(self, plugin_dir: str = PLUGIN_DIR_PATH, manifest_cache_path: Optional[str] = MANIFEST_CACHE_PATH,
+                 lazy: Optional[bool] = None):
+        """
+        Args:
+            plugin_dir (str): Folder of plugin files.
+            manifest_cache_path (Optional[str]): Where manifests are cached; None doesn't cache them.
+            lazy (Optional[bool]): Import plugins on first use; defaults to config.ENABLE_LAZY_PLUGINS.
+        """
+        self.plugins = {} # Imported plugins: name -> instance
+        self.manifests: Dict[str, PluginManifest] = {} # Every plugin found, in the order they are asked
+        self.plugin_dir = plugin_dir
+        self.manifest_cache_path = manifest_cache_path
+        self.imports = 0 # Plugin modules imported so far
+        self.manifests_parsed = 0 # Plugin files read at startup because their cached manifest was stale
+        # Keyword -> (plugin name, None) for a declared keyword, or (plugin name, i) for the literal
+        # that PLUGIN_PATTERNS[i] requires; that pattern is then tried
+        self._keywords: KeywordAutomaton[Tuple[str, Optional[int]]] = KeywordAutomaton()
+        self._unindexed: List[Tuple[str, Pattern[str]]] = [] # Patterns without a literal, tried on every command
+        self._always: List[str] = [] # Plugins without triggers, asked about every command
+        self._order: Dict[str, int] = {} # Ties in confidence go to the plugin found first
+        # (name, lowercased keywords, compiled patterns, has triggers) in plugin order, for the plain loop
+        self._scan: List[Tuple[str, Tuple[str, ...], List[Pattern[str]], bool]] = []
+        self._failed = set() # Plugins that could not be imported; not tried again
+        self._load_lock = threading.Lock()
         self._discover_plugins()
+        if not (config.ENABLE_LAZY_PLUGINS if lazy is None else lazy):
+            for name in list(self.manifests):
+                self._load(name)
 
     def _discover_plugins(self):
         """
-        Discovers and loads plugins from the plugin directory.
+        Finds the plugins in the plugin directory and their manifests, without importing them.
         A plugin is a Python file containing a class that has a `can_handle_command` method
-        and a `execute_command` method.
+        and a `execute_command` method. Every file is kept, as its class may inherit those methods
+        or be created at import time; one that turns out to have no plugin class fails to load once.
         """
         if not os.path.isdir(self.plugin_dir):
             print(f"Plugin directory '{self.plugin_dir}' not found. No plugins will be loaded.")
             return
 
-        for filename in os.listdir(self.plugin_dir):
-            if filename.endswith(".py") and not filename.startswith("_"):
-                module_name = filename[:-3]
-                filepath = os.path.join(self.plugin_dir, filename)
+        cached = self._read_manifest_cache()
+        entries = {}
+        for filename in sorted(os.listdir(self.plugin_dir)):
+            if not filename.endswith(".py") or filename.startswith("_"):
+                continue
+            module_name = filename[:-3]
+            filepath = os.path.join(self.plugin_dir, filename)
+            try:
+                entry = self._manifest_entry(module_name, filepath, cached.get(filename))
+            except Exception as e:
+                print(f"Error reading plugin {module_name} from {filename}: {e}")
+                continue
+            entries[filename] = entry
+            manifest = PluginManifest.from_dict(module_name, filepath, entry["manifest"])
+            self.manifests[module_name] = manifest
+            self._order[module_name] = len(self._order)
+            self._scan.append((module_name, tuple(keyword.lower() for keyword in manifest.keywords),
+                               manifest.compiled, manifest.has_triggers))
+            if not manifest.has_triggers:
+                self._always.append(module_name)
+            for keyword in manifest.keywords:
+                self._keywords.add(keyword, (module_name, None))
+            for index, pattern in enumerate(manifest.patterns):
+                literal = required_literal(pattern, re.IGNORECASE)
+                if literal is None:
+                    self._unindexed.append((module_name, manifest.compiled[index]))
+                else:
+                    self._keywords.add(literal, (module_name, index))
+        if entries != cached:
+            self._write_manifest_cache(entries)
 
-                try:
-                    spec = importlib.util.spec_from_file_location(module_name, filepath)
+    def _manifest_entry(self, module_name: str, filepath: str, cached: Optional[dict]) -> dict:
+        """The cache entry for a plugin file: the cached one if the file is unchanged, else parsed anew."""
+        stat = os.stat(filepath)
+        if cached and cached["mtime_ns"] == stat.st_mtime_ns and cached["size"] == stat.st_size:
+            return cached
+        with open(filepath, "rb") as f:
+            source = f.read()
+        digest = hashlib.sha256(source).hexdigest()
+        if cached and cached["sha256"] == digest: # Touched but not changed
+            return dict(cached, mtime_ns=stat.st_mtime_ns)
+        self.manifests_parsed += 1
+        manifest = PluginManifest.from_source(module_name, filepath, source)
+        return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": digest, "manifest": manifest.to_dict()}
+
+    def _read_manifest_cache(self) -> Dict[str, dict]:
+        if not self.manifest_cache_path or not os.path.exists(self.manifest_cache_path):
+            return {}
+        try:
+            with open(self.manifest_cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not read the plugin manifest cache ({e}); reading every plugin.")
+            return {}
+        if data.get("version") != _MANIFEST_VERSION or data.get("plugin_dir") != os.path.abspath(self.plugin_dir):
+            return {}
+        return data.get("plugins", {})
+
+    def _write_manifest_cache(self, entries: Dict[str, dict]):
+        if not self.manifest_cache_path:
+            return
+        data = {"version": _MANIFEST_VERSION, "plugin_dir": os.path.abspath(self.plugin_dir), "plugins": entries}
+        temporary = self.manifest_cache_path + ".tmp"
+        try:
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=1)
+            os.replace(temporary, self.manifest_cache_path)
+        except OSError as e:
+            print(f"Could not write the plugin manifest cache: {e}")
+
+    def _load(self, name: str):
+        """Imports a plugin and instantiates its class, once. Returns the instance, or None if it failed."""
+        plugin_instance = self.plugins.get(name)
+        if plugin_instance is not None or name in self._failed:
+            return plugin_instance
+        with self._load_lock:
+            if name in self.plugins or name in self._failed:
+                return self.plugins.get(name)
+            manifest = self.manifests[name]
+            filename = os.path.basename(manifest.path)
+            try:
+                with tracing.span("plugin_import", plugin=name):
+                    spec = importlib.util.spec_from_file_location(name, manifest.path)
                     module = importlib.util.module_from_spec(spec)
                     spec.loader.exec_module(module)
+                    self.imports += 1
+                    plugin_class = getattr(module, manifest.entry_point, None) if manifest.entry_point else None
+                    if plugin_class is None: # Inherited methods or defined dynamically; look for it as before manifests
+                        plugin_class = next((obj for _, obj in inspect.getmembers(module, inspect.isclass)
+                                             if hasattr(obj, "can_handle_command") and hasattr(obj, "execute_command")),
+                                            None)
+                    if plugin_class is None:
+                        print(f"No plugin class found in {filename}; it is not used as a plugin.")
+                        self._failed.add(name)
+                        return None
+                    plugin_instance = plugin_class() # Instantiate the plugin class
+            except Exception as e:
+                print(f"Error loading plugin {name} from {filename}: {e}")
+                self._failed.add(name)
+                return None
+            self.plugins[name] = plugin_instance
+            print(f"Loaded plugin: {name} from {filename}")
+            return plugin_instance
+
+    def _candidates(self, command_text: str) -> List[str]:
+        """Plugins whose keywords occur in the command or whose patterns match it, in plugin order."""
+        if len(self._scan) <= LINEAR_SCAN_MAX_PLUGINS:
+            found = []
+            for name, keywords, patterns, has_triggers in self._scan:
+                if not has_triggers:
+                    found.append(name)
+                    continue
+                for keyword in keywords:
+                    if keyword in command_text:
+                        found.append(name)
+                        break
+                else:
+                    for pattern in patterns:
+                        if pattern.search(command_text):
+                            found.append(name)
+                            break
+            return found
+        names = set(self._always)
+        for name, pattern_index in self._keywords.find(command_text):
+            if name not in names and (pattern_index is None or
+                                      self.manifests[name].compiled[pattern_index].search(command_text)):
+                names.add(name)
+        for name, pattern in self._unindexed:
+            if name not in names and pattern.search(command_text):
+                names.add(name)
+        return sorted(names, key=self._order.__getitem__)
 
-                    for name, obj in inspect.getmembers(module):
-                        if inspect.isclass(obj) and hasattr(obj, "can_handle_command") and hasattr(obj, "execute_command"):
-                            # Instantiate the plugin class
-                            plugin_instance = obj()
-                            # Store the instance, perhaps keyed by a plugin name or command it handles
-                            # For simplicity, let's use module_name, but this could be more sophisticated
-                            if module_name not in self.plugins:
-                                self.plugins[module_name] = plugin_instance
-                                print(f"Loaded plugin: {module_name} from {filename}")
-                            else:
-                                print(f"Warning: Duplicate plugin name '{module_name}'. Check your plugin files.")
-                except Exception as e:
-                    print(f"Error loading plugin {module_name} from {filename}: {e}")
+    def find_plugin(self, command_text) -> Optional[Tuple[str, Any]]:
+        """
+        Returns (plugin_name, plugin_instance) for the plugin most confident it can handle the
+        command, or None. Doesn't execute anything, so it is safe to call on a partial command.
+        Plugins are imported here, the first time a command mentions them.
+        """
+        command_lower = command_text.lower() # Once, for every plugin
+        best: Optional[Tuple[float, str, Any]] = None
+        for plugin_name in self._candidates(command_lower):
+            plugin_instance = self._load(plugin_name)
+            if plugin_instance is None:
+                continue
+            try:
+                if not plugin_instance.can_handle_command(command_lower): # Pass lowercased command
+                    continue
+                confidence = getattr(plugin_instance, "confidence", None)
+                score = float(confidence(command_lower)) if confidence is not None else DEFAULT_CONFIDENCE
+            except Exception as e:
+                print(f"Error checking plugin {plugin_name}: {e}")
+                continue
+            if best is None or score > best[0]:
+                best = (score, plugin_name, plugin_instance)
+                if score >= 1.0:
+                    break # Nothing can beat it
+        return best[1:] if best is not None else None
 
     def route_command(self, command_text, context=None):
         """
-        Routes a command to the first plugin that can handle it.
+        Routes a command to the plugin most confident it can handle it (see find_plugin).
 
         Args:
             command_text (str): The user's command.
@@ -60,15 +296,17 @@ class PluginManager:
         Returns:
             The result from the plugin's execute_command method, or None if no plugin handles it.
         """
-        for plugin_name, plugin_instance in self.plugins.items():
-            try:
-                if plugin_instance.can_handle_command(command_text.lower()): # Pass lowercased command
-                    print(f"Routing command to plugin: {plugin_name}")
-                    return plugin_instance.execute_command(command_text, context)
-            except Exception as e:
-                print(f"Error executing plugin {plugin_name}: {e}")
-                return "Sorry, there was an error with that plugin."
-        return None
+        found = self.find_plugin(command_text)
+        if found is None:
+            return None
+        plugin_name, plugin_instance = found
+        try:
+            print(f"Routing command to plugin: {plugin_name}")
+            with tracing.span("plugin", plugin=plugin_name):
+                return plugin_instance.execute_command(command_text, context)
+        except Exception as e:
+            print(f"Error executing plugin {plugin_name}: {e}")
+            return "Sorry, there was an error with that plugin."
 
 if __name__ == '__main__':
     # Example Usage
@@ -87,6 +325,8 @@ if __name__ == '__main__':
             os.makedirs(PLUGIN_DIR_PATH)
         with open(dummy_plugin_path, "w") as f:
             f.write("""
+PLUGIN_KEYWORDS = ["dummy test"]
+
 class DummyPlugin:
     def can_handle_command(self, command_text):
         return "dummy test" in command_text
@@ -98,6 +338,7 @@ class DummyPlugin:
         # For simplicity in this test block, let's reinstantiate, or add a public rescan
         manager = PluginManager() # Re-instantiate to pick up new dummy plugin
 
+    print(f"Found {len(manager.manifests)} plugin(s), imported {manager.imports}")
     print("\nTesting plugin routing:")
 
     response = manager.route_command("What's the weather in Delhi?")
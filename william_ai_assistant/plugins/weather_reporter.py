@@ -9,9 +9,13 @@ WEATHER_API_URL_FORMAT = "https://wttr.in/{location}?format=j1"
 # For OpenWeatherMap, you'd need an API key and different URL structure.
 # Example: api.openweathermap.org/data/2.5/weather?q={city}&appid={API_key}&units=metric
 
+# Read by the plugin manager without importing this file (see plugin_manager.py)
+PLUGIN_KEYWORDS = ["weather", "forecast", "temperature"]
+PLUGIN_ENTRY_POINT = "WeatherReporterPlugin"
+
 class WeatherReporterPlugin:
     def __init__(self):
-        self.keywords = ["weather", "forecast", "temperature"]
+        self.keywords = list(PLUGIN_KEYWORDS)
         self.location_prepositions = ["in", "for", "at"] # "weather in London", "temperature for Berlin"
 
     def can_handle_command(self, command_text):
@@ -22,6 +26,10 @@ class WeatherReporterPlugin:
         command_lower = command_text.lower()
         return any(keyword in command_lower for keyword in self.keywords)
 
+    def confidence(self, command_text):
+        """How sure the plugin is that it should answer (0-1), asked once can_handle_command said yes."""
+        return 0.9 if self._extract_location(command_text) else 0.6 # "Weather in Paris" vs "the forecast said..."
+
     def _extract_location(self, command_text):
         """
         Tries to extract the location from the command text.
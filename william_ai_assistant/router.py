@@ -1,6 +1,8 @@
 import re
+import threading
 import webbrowser
-from typing import Callable, Dict, Optional, Tuple, Pattern
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterator, List, Match, Optional, Pattern, Set, Tuple, Union
 
 # Import actual handlers using relative imports as router.py is inside the package
 from .system_commands import (
@@ -11,8 +13,11 @@ from .system_commands import (
     mute_system,
     unmute_system
 )
-from .william_brain import get_llm_response
+from .william_brain import get_llm_response, prewarm_connection, stream_llm_response
 from .plugin_manager import PluginManager # Import PluginManager
+from .keyword_index import KeywordAutomaton, required_literal
+from . import config as app_config
+from . import tracing
 
 
 # Placeholder for actual functions - these would be in other modules
@@ -68,27 +73,83 @@ def handle_volume_control(action: str, value: Optional[int] = None) -> str:
         return "Sorry, I didn't understand that volume command."
 
 
+def _history_for_llm(text: str, history: Optional[list]) -> Optional[list]:
+    """
+    Prevents duplicating the current user message if it's already the last item in history.
+    get_llm_response in william_brain.py will add the `text` as the current user prompt.
+    """
+    if history and history[-1].get("role") == "user" and history[-1].get("content") == text:
+        return history[:-1]
+    return history
+
 # Updated fallback_chat_handler to use the imported get_llm_response and accept history
 def fallback_chat_handler(text: str, history: Optional[list] = None) -> str:
     """
     Handles commands that don't match any specific route by sending them to the LLM.
     """
     print(f"Fallback: Sending to LLM: '{text}' with history count: {len(history) if history else 0}")
-
-    # Prevent duplicating the current user message if it's already the last item in history.
-    # get_llm_response in william_brain.py will add the `text` as the current user prompt.
-    history_to_pass = history
-    if history and history[-1].get("role") == "user" and history[-1].get("content") == text:
-        history_to_pass = history[:-1]
+    history_to_pass = _history_for_llm(text, history)
+    if history_to_pass is not history:
         print("Adjusted history for LLM call to prevent duplication of current user input.")
-
     return get_llm_response(text, command_history=history_to_pass)
 
+def fallback_chat_stream(text: str, history: Optional[list] = None) -> Iterator[str]:
+    """Streaming version of fallback_chat_handler: yields the LLM's reply as it is generated."""
+    print(f"Fallback: Streaming from LLM: '{text}' with history count: {len(history) if history else 0}")
+    return stream_llm_response(text, command_history=_history_for_llm(text, history))
+
+
+class Route:
+    """A command pattern and its handler, as registered with CommandRouter.add_route."""
+
+    def __init__(self, pattern: Pattern[str], handler: Callable[..., str], pass_query_group: Optional[int],
+                 priority: int, order: int):
+        self.pattern = pattern
+        self.handler = handler
+        self.pass_query_group = pass_query_group
+        self.priority = priority
+        self.order = order
+        self.sort_key = (-priority, order) # Higher priority first, then the route added first
+
+    def run(self, match: Match[str], history: Optional[list] = None) -> str:
+        """Calls the handler with the query group of `match`, the match found while routing."""
+        if self.pass_query_group is None:
+            return self.handler() # Specific handlers currently don't take history
+        if len(match.groups()) >= self.pass_query_group:
+            return self.handler(match.group(self.pass_query_group))
+
+        # This case should ideally not be reached if routing logic is correct
+        # If it is, it means a pattern was matched but group extraction failed.
+        # Fallback with an error message, passing history.
+        error_message = f"Error extracting query for pattern {self.pattern.pattern} from input: {match.string}"
+        print(f"ERROR: {error_message}")
+        return fallback_chat_handler(error_message, history=history)
+
+
+class Speculation:
+    """Routing work done on a partial transcript, kept until the final transcript arrives."""
+
+    def __init__(self, text: str, kind: str, route: Optional[Route] = None):
+        self.text = text
+        self.kind = kind # "route", "plugin" or "llm"
+        self.route = route # Matched route, for kind == "route"
+        self.history: Optional[list] = None # History the speculative LLM call was made with
+        self.future: Optional[Future] = None # Speculative LLM call, if config.SPECULATIVE_LLM_CALLS
+
+    def matches(self, text: str) -> bool:
+        return self.text.strip().lower() == text.strip().lower()
+
 
 class CommandRouter:
     def __init__(self):
-        self.routes: Dict[Pattern[str], Callable[..., str]] = {}
+        self.routes: List[Route] = [] # In the order they are tried, see add_route
+        # Routes are found through a literal their pattern requires; those without one are always tried
+        self._keywords: KeywordAutomaton[Route] = KeywordAutomaton()
+        self._unindexed: Set[Route] = set()
         self.plugin_manager = PluginManager() # Instantiate PluginManager
+        self._speculation: Optional[Speculation] = None
+        self._speculation_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="william-speculate")
         # The fallback handler now needs history, so it cannot be pre-registered
         # in _register_default_routes in the same way if we want 'route' to pass history to it.
         # Instead, fallback_chat_handler will be called explicitly by the route method.
@@ -115,7 +176,7 @@ class CommandRouter:
         self.add_route(r"turn up the volume", lambda: handle_volume_control("increase"))
         self.add_route(r"turn down the volume", lambda: handle_volume_control("decrease"))
         self.add_route(r"mute (?:my )?system", lambda: handle_volume_control("mute"))
-        self.add_route(r"unmute (?:my )?system", lambda: handle_volume_control("unmute"))
+        self.add_route(r"unmute (?:my )?system", lambda: handle_volume_control("unmute"), priority=1) # Contains "mute system"
         self.add_route(r"set volume to (\d+) percent", lambda level: handle_volume_control("set", int(level)), pass_query_group=1)
 
 
@@ -125,7 +186,8 @@ class CommandRouter:
         self.add_route(r"close (.+)", lambda app: handle_system_command(f"close {app}"), pass_query_group=1) # e.g. close notepad
         # Add more specific system commands as needed, e.g., shutdown, restart, check disk space
 
-    def add_route(self, pattern: str, handler: Callable[..., str], pass_query_group: Optional[int] = None):
+    def add_route(self, pattern: str, handler: Callable[..., str], pass_query_group: Optional[int] = None,
+                  priority: int = 0) -> Route:
         """
         Adds a new command route.
 
@@ -135,33 +197,69 @@ class CommandRouter:
             pass_query_group (Optional[int]): If set, the content of this regex group
                                                will be passed as an argument to the handler.
                                                If None, the handler is called without arguments.
+            priority (int): When several routes match, the one with the highest priority wins;
+                            among equal priorities, the one added first.
         """
         compiled_pattern = re.compile(pattern, re.IGNORECASE)
-
-        if pass_query_group is not None:
-            # Wrapper to extract group and pass to handler
-            # The wrapper now also needs to accept `history` but only passes it to fallback_chat_handler
-            def wrapped_handler(text_input: str, history: Optional[list] = None) -> str:
-                match = compiled_pattern.search(text_input)
-                if match and len(match.groups()) >= pass_query_group:
-                    query = match.group(pass_query_group)
-                    return handler(query) # Specific handlers currently don't take history
-
-                # This case should ideally not be reached if routing logic is correct
-                # If it is, it means a pattern was matched but group extraction failed.
-                # Fallback with an error message, passing history.
-                error_message = f"Error extracting query for pattern {pattern.pattern} from input: {text_input}"
-                print(f"ERROR: {error_message}")
-                return fallback_chat_handler(error_message, history=history)
-            self.routes[compiled_pattern] = wrapped_handler
+        route = Route(compiled_pattern, handler, pass_query_group, priority, len(self.routes))
+        self.routes.append(route)
+        self.routes.sort(key=lambda r: r.sort_key)
+        keyword = required_literal(pattern, re.IGNORECASE)
+        if keyword is None:
+            self._unindexed.add(route)
         else:
-            # Wrapper to ensure consistent signature for handlers that take no query
-            # Also needs to accept history for consistency, but doesn't use it for the specific handler
-            def no_arg_handler_wrapper(text_input: str, history: Optional[list] = None) -> str:
-                return handler() # Specific handlers currently don't take history
-            self.routes[compiled_pattern] = no_arg_handler_wrapper
+            self._keywords.add(keyword, route)
+        return route
 
+    def _match_route(self, text: str) -> Optional[Tuple[Route, Match[str]]]:
+        """
+        Tries the routes whose required literal occurs in `text` (and those without one), best
+        first. Returns the first route that matches and its match, or None.
+        """
+        candidates = self._keywords.find(text)
+        if self._unindexed:
+            candidates |= self._unindexed
+        for route in sorted(candidates, key=lambda r: r.sort_key):
+            match = route.pattern.search(text)
+            if match:
+                return route, match
+        return None
+
+    def speculate(self, text: str, history: Optional[list] = None, complete: bool = False) -> str:
+        """
+        Routes a stable prefix of a command that is still being spoken. No handler is run.
+
+        For the LLM fallback the OpenRouter connection is warmed up, and with
+        config.SPECULATIVE_LLM_CALLS the request itself is started once the whole hypothesis
+        is stable. `route` commits the speculation if the final transcript is the same text.
 
+        Args:
+            text (str): Stable part of the partial transcript.
+            history (Optional[list]): The conversation history the final command will be routed with.
+            complete (bool): True if `text` is the whole hypothesis, i.e. the user has likely stopped talking.
+
+        Returns:
+            str: Where the command would go: "route", "plugin" or "llm".
+        """
+        with self._speculation_lock:
+            current = self._speculation
+            if current is not None and current.matches(text) and (current.future is not None or not complete):
+                return current.kind
+            matched = self._match_route(text)
+            if matched is not None:
+                speculation = Speculation(text, "route", matched[0])
+            elif self.plugin_manager.find_plugin(text) is not None:
+                speculation = Speculation(text, "plugin")
+            else:
+                speculation = Speculation(text, "llm")
+                prewarm_connection()
+                if complete and app_config.SPECULATIVE_LLM_CALLS:
+                    speculation.history = _history_for_llm(text, history)
+                    speculation.future = self._executor.submit(fallback_chat_handler, text, history)
+            self._speculation = speculation
+            return speculation.kind
+
+    @tracing.traced("route")
     def route(self, text: str, history: Optional[list] = None) -> str:
         """
         Routes the user's text input to the appropriate handler.
@@ -173,12 +271,42 @@ class CommandRouter:
         Returns:
             str: The response from the handler or fallback.
         """
-        for pattern, handler_wrapper in self.routes.items():
-            match = pattern.search(text)
+        response = self._dispatch(text, history)
+        if response is not None:
+            return response
+        # If no plugin handled it either, use the fallback chat handler
+        return fallback_chat_handler(text, history=history)
+
+    def route_stream(self, text: str, history: Optional[list] = None) -> Union[str, Iterator[str]]:
+        """
+        Like `route`, but a reply from the LLM comes back as an iterator over pieces of it while it is
+        being generated (see william_brain.stream_llm_response). Other handlers' replies are complete
+        already and come back as a string. Routing itself happens before this returns; only the LLM
+        request is deferred.
+        """
+        with tracing.span("route", stream=True):
+            response = self._dispatch(text, history)
+        if response is not None:
+            return response
+        return fallback_chat_stream(text, history=history)
+
+    def _dispatch(self, text: str, history: Optional[list]) -> Optional[str]:
+        """Answers from a speculation, a route or a plugin. Returns None if the command should go to the LLM."""
+        with self._speculation_lock:
+            speculation, self._speculation = self._speculation, None
+        if speculation is not None and speculation.matches(text):
+            if speculation.future is not None and speculation.history == _history_for_llm(text, history):
+                print("Using the LLM answer started on the partial transcript.")
+                return speculation.future.result()
+            match = speculation.route.pattern.search(text) if speculation.route is not None else None
             if match:
-                # The handler_wrapper will correctly call the underlying handler
-                # It now also accepts history, mainly for the fallback scenario within wrapped_handler
-                return handler_wrapper(text, history=history) # Pass history here
+                return speculation.route.run(match, history=history)
+
+        matched = self._match_route(text)
+        if matched is not None:
+            route, match = matched
+            # Route.run passes history on only for the fallback when the query group is missing
+            return route.run(match, history=history)
 
         # If no specific command pattern matched, try the plugin manager
         # PluginManager's route_command expects (command_text, context=None)
@@ -189,9 +317,7 @@ class CommandRouter:
         if plugin_response is not None:
             print(f"Command handled by plugin: {plugin_response}")
             return plugin_response
-
-        # If no plugin handled it either, use the fallback chat handler
-        return fallback_chat_handler(text, history=history)
+        return None
 
 if __name__ == '__main__':
     # Example Usage:
@@ -0,0 +1,281 @@
+# Speech-to-text backends for William AI Assistant
+# audio_listener sends every phrase through a HedgedSTTDispatcher built from config.STT_BACKENDS,
+# so a slow or failing service no longer stalls the assistant.
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+import requests
+import speech_recognition as sr
+from speech_recognition.recognizers.google import create_request_builder
+from william_ai_assistant import config
+from william_ai_assistant.audio_encoding import create_encoder
+from william_ai_assistant.utils import LatencyHistogram
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class StreamingSession:
+    """
+    Incremental recognition of one phrase, fed while the user is still speaking.
+    `accept` takes the next 16-bit mono PCM and returns the current hypothesis for the whole phrase so far.
+    """
+
+    def accept(self, pcm: bytes) -> str:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class STTBackend:
+    """
+    Interface for a speech-to-text engine.
+
+    `recognize` returns the transcript for one phrase, raises sr.UnknownValueError if the
+    speech was not understood and sr.RequestError if the engine could not be reached.
+    Engines that can decode incrementally also implement `start_stream`.
+    """
+    name = "base"
+    supports_streaming = False
+
+    def recognize(self, audio: sr.AudioData) -> str:
+        raise NotImplementedError
+
+    def start_stream(self, sample_rate: int) -> StreamingSession:
+        raise NotImplementedError
+
+
+class GoogleBackend(STTBackend):
+    """
+    Google Web Speech API (the service behind speech_recognition's recognize_google).
+
+    Audio is encoded in-process (see audio_encoding.py) instead of through
+    AudioData.get_flac_data(), which starts a `flac` subprocess for every phrase. The request URL
+    comes from speech_recognition, so without config.GOOGLE_SPEECH_API_KEY its generic key is used.
+    """
+    name = "google"
+    ENDPOINT = "http://www.google.com/speech-api/v2/recognize"
+
+    def __init__(self, language: str = config.STT_LANGUAGE, key: Optional[str] = config.GOOGLE_SPEECH_API_KEY,
+                 encoding: str = config.STT_AUDIO_ENCODING, timeout: float = config.STT_TIMEOUT_SECONDS):
+        self.url = create_request_builder(endpoint=self.ENDPOINT, key=key, language=language).build_url()
+        self.encoder, self.content_type = create_encoder(encoding)
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def recognize(self, audio: sr.AudioData) -> str:
+        body = self.encoder.encode(audio)
+        headers = {"Content-Type": f"{self.content_type}; rate={self.encoder.sample_rate}"}
+        try:
+            response = self.session.post(self.url, data=body, headers=headers, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            raise sr.RequestError(f"recognition request failed: {e}")
+        return self.parse_response(response.text)
+
+    @staticmethod
+    def parse_response(response_text: str) -> str:
+        """The API answers with one JSON object per line; the first one with results has the transcript."""
+        for line in response_text.split("\n"):
+            if not line:
+                continue
+            result = json.loads(line).get("result", [])
+            if result and result[0].get("alternative"):
+                best_hypothesis = result[0]["alternative"][0]
+                if "transcript" in best_hypothesis:
+                    return best_hypothesis["transcript"]
+        raise sr.UnknownValueError()
+
+
+class _VoskStream(StreamingSession):
+    def __init__(self, recognizer):
+        self.recognizer = recognizer
+        self.completed = [] # Text of segments Vosk has already finalized within this phrase
+
+    def accept(self, pcm: bytes) -> str:
+        if self.recognizer.AcceptWaveform(pcm):
+            text = json.loads(self.recognizer.Result()).get("text", "")
+            if text:
+                self.completed.append(text)
+            partial = ""
+        else:
+            partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+        return " ".join(self.completed + ([partial] if partial else []))
+
+
+class VoskBackend(STTBackend):
+    """Offline recognition with a local Vosk model (pip install vosk, then download a model). Supports streaming."""
+    name = "vosk"
+    SAMPLE_RATE = 16000
+    supports_streaming = True
+
+    def __init__(self, model_path: str = config.VOSK_MODEL_PATH):
+        import vosk # Optional dependency, imported here so the other backends work without it
+        vosk.SetLogLevel(-1)
+        if not os.path.isabs(model_path):
+            model_path = os.path.join(_BASE_DIR, model_path)
+        self._vosk = vosk
+        self.model = vosk.Model(model_path)
+
+    def recognize(self, audio: sr.AudioData) -> str:
+        recognizer = self._vosk.KaldiRecognizer(self.model, self.SAMPLE_RATE)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=self.SAMPLE_RATE, convert_width=2))
+        text = json.loads(recognizer.FinalResult()).get("text", "")
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+    def start_stream(self, sample_rate: int) -> StreamingSession:
+        return _VoskStream(self._vosk.KaldiRecognizer(self.model, sample_rate)) # Vosk resamples internally
+
+
+class StubServerBackend(STTBackend):
+    """Client for stub_servers.StubSTTServer, a deterministic local server for tests and benchmarks."""
+    name = "stub"
+    SAMPLE_RATE = 16000
+
+    def __init__(self, url: str, timeout: float = config.STT_TIMEOUT_SECONDS, name: str = "stub"):
+        self.name = name # Distinct names let several stub servers stand in for different engines
+        self.url = url.rstrip("/") + "/recognize"
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def recognize(self, audio: sr.AudioData) -> str:
+        body = audio.get_raw_data(convert_rate=self.SAMPLE_RATE, convert_width=2)
+        try:
+            response = self.session.post(self.url, data=body, timeout=self.timeout,
+                                         headers={"Content-Type": f"audio/l16; rate={self.SAMPLE_RATE}"})
+            response.raise_for_status()
+            text = response.json().get("transcript", "")
+        except (requests.exceptions.RequestException, ValueError) as e:
+            raise sr.RequestError(f"stub recognition request failed: {e}")
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+class HedgedSTTDispatcher:
+    """
+    Sends a phrase to the first backend and, if it has not answered within `hedge_after`
+    seconds (or has already failed), also to the next one. The first non-empty transcript wins;
+    slower requests are left to finish in the background and only feed the latency histograms.
+    """
+
+    def __init__(self, backends: List[STTBackend], hedge_after: float = config.STT_HEDGE_AFTER_SECONDS,
+                 timeout: float = config.STT_TIMEOUT_SECONDS):
+        if not backends:
+            raise ValueError("HedgedSTTDispatcher needs at least one backend.")
+        self.backends = list(backends)
+        self.hedge_after = hedge_after
+        self.timeout = timeout
+        self.histograms: Dict[str, LatencyHistogram] = {b.name: LatencyHistogram() for b in self.backends}
+        self.wins: Dict[str, int] = {b.name: 0 for b in self.backends}
+        self._executor = ThreadPoolExecutor(max_workers=2 * len(self.backends), thread_name_prefix="william-stt")
+
+    def _timed_recognize(self, backend: STTBackend, audio: sr.AudioData) -> str:
+        start = time.perf_counter()
+        try:
+            text = backend.recognize(audio)
+        except sr.UnknownValueError:
+            # The backend answered, it just heard nothing useful; that is still a latency sample.
+            self.histograms[backend.name].record(time.perf_counter() - start)
+            raise
+        except Exception:
+            self.histograms[backend.name].record(time.perf_counter() - start, error=True)
+            raise
+        self.histograms[backend.name].record(time.perf_counter() - start)
+        return text
+
+    def recognize(self, audio: sr.AudioData) -> str:
+        """
+        Returns the first good transcript.
+        The next backend is started when the ones in flight take longer than hedge_after or have all
+        failed with a request error. sr.UnknownValueError is an answer (there was nothing to transcribe),
+        so it does not start another backend.
+        Raises sr.UnknownValueError if a backend answered without a transcript,
+        otherwise sr.RequestError if none could be used.
+        """
+        deadline = time.monotonic() + self.timeout
+        waiting = list(self.backends)
+        pending = {}
+        errors = []
+
+        def launch_next():
+            backend = waiting.pop(0)
+            pending[self._executor.submit(self._timed_recognize, backend, audio)] = backend
+
+        launch_next()
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            budget = min(self.hedge_after, remaining) if waiting else remaining
+            done, _ = wait(pending, timeout=budget, return_when=FIRST_COMPLETED)
+            failed = False
+            for future in done:
+                backend = pending.pop(future)
+                try:
+                    text = future.result()
+                except sr.UnknownValueError as e:
+                    errors.append(e)
+                    continue
+                except Exception as e:
+                    errors.append(e)
+                    failed = True
+                    continue
+                if text:
+                    self.wins[backend.name] += 1
+                    return text
+                errors.append(sr.UnknownValueError())
+            if waiting and (not done or (failed and not pending)):
+                launch_next() # Hedge: the budget ran out, or everything in flight failed to answer
+
+        if any(isinstance(e, sr.UnknownValueError) for e in errors):
+            raise sr.UnknownValueError()
+        if errors:
+            raise sr.RequestError(f"all speech backends failed, last error: {errors[-1]}")
+        raise sr.RequestError(f"no speech backend answered within {self.timeout} seconds")
+
+    def start_stream(self, sample_rate: int) -> Optional[StreamingSession]:
+        """Starts a streaming session on the first backend that supports it, or returns None if none does."""
+        for backend in self.backends:
+            if backend.supports_streaming:
+                return backend.start_stream(sample_rate)
+        return None
+
+    def latency_histograms(self) -> Dict[str, dict]:
+        """Per-backend latency summaries, for tuning STT_HEDGE_AFTER_SECONDS."""
+        return {name: dict(histogram.as_dict(), wins=self.wins[name]) for name, histogram in self.histograms.items()}
+
+
+def create_backend(name: str) -> Optional[STTBackend]:
+    """Builds a backend from its config name. Returns None if it is unavailable."""
+    try:
+        if name == "google":
+            return GoogleBackend()
+        if name == "vosk":
+            return VoskBackend()
+        if name == "stub":
+            if not config.STT_STUB_SERVER_URL:
+                print("STT backend 'stub' needs STT_STUB_SERVER_URL in config.py.")
+                return None
+            return StubServerBackend(config.STT_STUB_SERVER_URL)
+        print(f"Unknown STT backend '{name}' in config.STT_BACKENDS.")
+    except ImportError as e:
+        print(f"STT backend '{name}' is not installed: {e}")
+    except Exception as e:
+        print(f"Could not initialize STT backend '{name}': {e}")
+    return None
+
+
+def create_dispatcher(names: Optional[List[str]] = None) -> HedgedSTTDispatcher:
+    """Builds the dispatcher from config.STT_BACKENDS, falling back to Google if none are usable."""
+    backends = [b for b in (create_backend(name) for name in (names or config.STT_BACKENDS)) if b]
+    if not backends:
+        print("No configured STT backend is available. Falling back to Google.")
+        backends = [GoogleBackend()]
+    print(f"Speech-to-text backends: {', '.join(b.name for b in backends)}")
+    return HedgedSTTDispatcher(backends)
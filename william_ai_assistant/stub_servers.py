@@ -0,0 +1,262 @@
+# Local stand-in servers for exercising William AI without real cloud services.
+# Everything here binds to 127.0.0.1 on an ephemeral port and runs on a daemon thread.
+import hashlib
+import json
+import os
+import random
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+
+def self_signed_context(directory: Optional[str] = None):
+    """
+    Creates a self-signed certificate for 127.0.0.1 with the openssl command line tool.
+
+    Returns:
+        (server-side ssl.SSLContext, path of the certificate to pass as `verify=` to requests)
+    """
+    directory = directory or tempfile.mkdtemp(prefix="william-tls-")
+    cert_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-keyout", key_path, "-out", cert_path, "-subj", "/CN=127.0.0.1",
+                    "-addext", "subjectAltName=IP:127.0.0.1"],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_path, key_path)
+    return context, cert_path
+
+
+class _StubServer:
+    """Shared start/stop plumbing for the stub servers."""
+
+    handler_class = BaseHTTPRequestHandler
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, ssl_context: Optional[ssl.SSLContext] = None):
+        """
+        Args:
+            ssl_context (Optional[ssl.SSLContext]): Serve HTTPS with this server-side context,
+                                                    e.g. from `self_signed_context()`.
+        """
+        self.httpd = ThreadingHTTPServer((host, port), self.handler_class)
+        self.scheme = "http"
+        if ssl_context is not None:
+            self.httpd.socket = ssl_context.wrap_socket(self.httpd.socket, server_side=True)
+            self.scheme = "https"
+        self.httpd.daemon_threads = True
+        self.httpd.stub = self # Lets request handlers reach the server configuration
+        self.request_count = 0
+        self.connection_count = 0 # Accepted connections; fewer than requests means keep-alive worked
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"{self.scheme}://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, like the real services
+    disable_nagle_algorithm = True # Headers and body are separate writes; don't let delayed ACKs add ~40 ms
+
+    def setup(self):
+        super().setup()
+        self.server.stub.connection_count += 1 # One handler per connection
+
+    def log_message(self, format, *args):
+        pass # Keep benchmark output readable
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _STTHandler(_QuietHandler):
+    def do_POST(self):
+        stub = self.server.stub
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        stub.request_count += 1
+        if stub.delay:
+            time.sleep(stub.delay)
+        if stub.status != 200:
+            self._send_json(stub.status, {"error": "stub failure"})
+            return
+        digest = hashlib.sha256(body).hexdigest()
+        transcript = stub.transcripts.get(digest, stub.default_transcript)
+        self._send_json(200, {"transcript": transcript or ""})
+
+
+class StubSTTServer(_StubServer):
+    """
+    Deterministic speech-to-text server for tests and benchmarks.
+
+    POST /recognize with the raw audio as the body. The response is
+    {"transcript": ...}, looked up by the SHA-256 of the body in `transcripts`,
+    falling back to `default_transcript` (an empty transcript means "not understood").
+    """
+
+    handler_class = _STTHandler
+
+    def __init__(self, transcripts: Optional[Dict[str, str]] = None, default_transcript: str = "",
+                 delay: float = 0.0, status: int = 200, **kwargs):
+        super().__init__(**kwargs)
+        self.transcripts = dict(transcripts or {})
+        self.default_transcript = default_transcript
+        self.delay = delay # Seconds to wait before answering
+        self.status = status # Non-200 simulates a service outage
+
+    def add_transcript(self, audio_bytes: bytes, transcript: str):
+        """Registers the transcript returned for exactly this request body."""
+        self.transcripts[hashlib.sha256(audio_bytes).hexdigest()] = transcript
+
+
+class _OpenRouterHandler(_QuietHandler):
+    def do_HEAD(self):
+        self.send_response(200) # What a connection prewarm sees
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        stub = self.server.stub
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = {}
+        messages = payload.get("messages", [])
+        status = stub._admit()
+        try:
+            if status != 200:
+                self._send_json(status, {"error": {"message": "stub failure", "code": status}})
+                return
+            delay = stub.delay(payload.get("model", "stub")) if callable(stub.delay) else stub.delay
+            if stub.prefill_tokens_per_second: # Reading a longer prompt takes longer, about 4 bytes per token
+                delay += len(body) / 4.0 / stub.prefill_tokens_per_second
+            if delay:
+                time.sleep(delay)
+            prompt = messages[-1].get("content", "") if messages else ""
+            if isinstance(prompt, list): # OpenAI-style content parts
+                prompt = "".join(part.get("text", "") for part in prompt if isinstance(part, dict))
+            reply = stub.reply(prompt) if callable(stub.reply) else stub.reply
+            if payload.get("stream"):
+                self._stream(reply, payload.get("model", "stub"), stub.tokens_per_second)
+            else:
+                if stub.tokens_per_second: # The whole reply is only ready once it has been generated
+                    time.sleep((len(reply.split(" ")) - 1) / stub.tokens_per_second)
+                self._send_json(200, {"model": payload.get("model", "stub"),
+                                      "choices": [{"message": {"role": "assistant", "content": reply}}]})
+        finally:
+            stub._release()
+
+    def _stream(self, reply: str, model: str, tokens_per_second: float):
+        """Server-sent events in the OpenAI/OpenRouter streaming format, one word per chunk."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        words = reply.split(" ")
+        try:
+            for i, word in enumerate(words):
+                if i and tokens_per_second:
+                    time.sleep(1.0 / tokens_per_second)
+                delta = {"choices": [{"delta": {"content": word if i == 0 else " " + word}}], "model": model}
+                self._write_chunk(f"data: {json.dumps(delta)}\n\n".encode("utf-8"))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client hung up mid-reply, e.g. a losing hedged request; stop "generating"
+            self.close_connection = True
+            with self.server.stub._lock:
+                self.server.stub.cancelled_streams += 1
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+class FakeOpenRouterServer(_StubServer):
+    """
+    Stand-in for the OpenRouter chat completions endpoint.
+
+    POST with an OpenAI-style {"messages": [...]} body. The reply is `reply`, or
+    `reply(last_user_message)` if it is callable. With "stream": true in the body the reply
+    comes back as server-sent events, `tokens_per_second` words per second after `delay`.
+    Point config.OPENROUTER_API_URL at `url`.
+    """
+
+    handler_class = _OpenRouterHandler
+
+    def __init__(self, reply="This is a stub reply.", delay=0.0, status: int = 200,
+                 failure_rate: float = 0.0, max_concurrent: Optional[int] = None,
+                 tokens_per_second: float = 0.0, prefill_tokens_per_second: float = 0.0, seed: int = 0, **kwargs):
+        """
+        Args:
+            delay: Seconds before the first byte of the answer, i.e. model latency, or a
+                   callable delay(model) -> seconds to give each model its own latency.
+            status (int): Non-200 simulates a service outage for every request.
+            failure_rate (float): Fraction of requests (0-1) answered with a 503 at random.
+            max_concurrent (Optional[int]): Requests beyond this many in flight get a 429, like a rate limit.
+            tokens_per_second (float): Generation speed in words per second; 0 answers at once.
+                                       Non-streaming answers wait for the whole reply to be "generated".
+            prefill_tokens_per_second (float): Prompt processing speed, adding latency per request byte; 0 = free.
+        """
+        super().__init__(**kwargs)
+        self.reply = reply
+        self.delay = delay
+        self.status = status
+        self.failure_rate = failure_rate
+        self.max_concurrent = max_concurrent
+        self.tokens_per_second = tokens_per_second
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.failures = 0 # Requests answered with an error status
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.cancelled_streams = 0 # Streams the client closed before the end of the reply
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _admit(self) -> int:
+        """Counts a new request and decides its status."""
+        with self._lock:
+            self.request_count += 1
+            if self.status != 200:
+                status = self.status
+            elif self.max_concurrent is not None and self.in_flight >= self.max_concurrent:
+                status = 429
+            elif self.failure_rate and self._random.random() < self.failure_rate:
+                status = 503
+            else:
+                status = 200
+            if status != 200:
+                self.failures += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return status
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
@@ -0,0 +1,267 @@
+# Lightweight latency tracing for William AI Assistant
+# Spans are grouped per turn (one command from capture to the spoken reply), kept in memory,
+# and exported as a Chrome trace (chrome://tracing or ui.perfetto.dev) plus rolling percentiles.
+import collections
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from william_ai_assistant import config
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TRACE_FILE_PATH = os.path.join(_BASE_DIR, config.TRACE_FILE)
+
+enabled = config.ENABLE_TRACING
+
+_events = collections.deque(maxlen=config.TRACE_MAX_EVENTS) # Finished spans, oldest dropped first
+_durations: Dict[str, collections.deque] = {} # Span name -> last TRACE_SUMMARY_WINDOW durations (seconds)
+_lock = threading.Lock() # Guards _events and _durations; spans are added from many threads
+_span_ids = itertools.count(1)
+_turn_ids = itertools.count(1)
+_local = threading.local() # Per thread: stack of open span ids (parent links) and the current turn
+
+
+class Span:
+    """
+    One timed operation. Use through `span()`:
+
+        with tracing.span("llm", model=model_name) as s:
+            ...
+            s.set(status=response.status_code)
+    """
+    __slots__ = ("name", "args", "turn", "span_id", "parent_id", "start")
+
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+        self.turn = current_turn()
+        self.span_id = next(_span_ids)
+        self.parent_id = None
+        self.start = 0.0
+
+    def set(self, **args):
+        """Attaches extra values to the span, shown in the trace viewer."""
+        self.args.update(args)
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent_id = stack[-1] if stack else None
+        stack.append(self.span_id)
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.monotonic()
+        stack = _stack()
+        if stack and stack[-1] == self.span_id:
+            stack.pop()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        _add(self.name, self.start, end, self.turn, self.span_id, self.parent_id, self.args)
+        return False
+
+
+class _NullSpan:
+    """Returned by `span()` while tracing is disabled, so instrumented code costs one call and a flag check."""
+    __slots__ = ()
+
+    def set(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _stack() -> list:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def current_turn() -> Optional[int]:
+    """Id of the turn running on this thread, or None."""
+    return getattr(_local, "turn", None)
+
+
+def turn_started_at() -> Optional[float]:
+    """time.monotonic() at which the turn running on this thread began, or None."""
+    return getattr(_local, "turn_started_at", None) if current_turn() is not None else None
+
+
+def adopt_turn(turn: Optional[int], started_at: Optional[float] = None):
+    """
+    Makes spans on this thread belong to `turn`, for worker threads doing part of a turn's work.
+    With `started_at` (see `turn_started_at`), the turn can also be ended on this thread.
+    """
+    _local.turn = turn
+    if started_at is not None:
+        _local.turn_started_at = started_at
+
+
+def _add(name, start, end, turn, span_id, parent_id, args):
+    event = (name, start, end, turn, span_id, parent_id, threading.get_ident(), args)
+    with _lock:
+        _events.append(event)
+        durations = _durations.get(name)
+        if durations is None:
+            durations = _durations[name] = collections.deque(maxlen=config.TRACE_SUMMARY_WINDOW)
+        durations.append(end - start)
+
+
+def span(name: str, **args):
+    """
+    Context manager timing the enclosed block as a span of the current turn.
+
+    Args:
+        name (str): Span name, e.g. "route" or "llm". Percentiles are kept per name.
+        **args: Extra values shown in the trace viewer.
+    """
+    if not enabled:
+        return _NULL_SPAN
+    return Span(name, args)
+
+
+def traced(name: str):
+    """Decorator version of `span()` for whole functions."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            with Span(name, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record(name: str, start: float, end: float, **args):
+    """
+    Adds a span that was timed elsewhere, e.g. by the capture threads.
+
+    Args:
+        start (float), end (float): time.monotonic() values.
+    """
+    if enabled:
+        stack = _stack()
+        _add(name, start, end, current_turn(), next(_span_ids), stack[-1] if stack else None, args)
+
+
+def begin_turn(started_at: Optional[float] = None) -> Optional[int]:
+    """
+    Starts a new turn on this thread; spans until `end_turn()` belong to it.
+
+    Args:
+        started_at (Optional[float]): time.monotonic() when the turn began, e.g. when the
+                                      user started speaking. Defaults to now.
+
+    Returns:
+        The turn id, or None while tracing is disabled.
+    """
+    if not enabled:
+        return None
+    _local.turn = next(_turn_ids)
+    _local.turn_started_at = time.monotonic() if started_at is None else started_at
+    return _local.turn
+
+
+def end_turn():
+    """Closes the current turn with a "turn" span covering all of it."""
+    turn = current_turn()
+    if not enabled or turn is None:
+        return
+    _add("turn", _local.turn_started_at, time.monotonic(), turn, next(_span_ids), None, {})
+    _local.turn = None
+    if config.TRACE_SUMMARY_EVERY_TURNS and turn % config.TRACE_SUMMARY_EVERY_TURNS == 0:
+        print_summary()
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summary() -> Dict[str, dict]:
+    """Rolling p50/p95/p99 (ms) per span name over the last TRACE_SUMMARY_WINDOW spans."""
+    with _lock:
+        snapshot = [(name, list(durations)) for name, durations in _durations.items()]
+    result = {}
+    for name, durations in snapshot:
+        ordered = sorted(durations)
+        if not ordered:
+            continue
+        result[name] = {
+            "count": len(ordered),
+            "p50_ms": 1000.0 * _percentile(ordered, 0.50),
+            "p95_ms": 1000.0 * _percentile(ordered, 0.95),
+            "p99_ms": 1000.0 * _percentile(ordered, 0.99),
+        }
+    return result
+
+
+def print_summary():
+    stats = summary()
+    if not stats:
+        print("Tracing: no spans recorded.")
+        return
+    print("Latency (ms)         count      p50      p95      p99")
+    for name, s in sorted(stats.items()):
+        print(f"  {name:<18} {s['count']:6d} {s['p50_ms']:8.1f} {s['p95_ms']:8.1f} {s['p99_ms']:8.1f}")
+
+
+def export_chrome_trace(path: str = TRACE_FILE_PATH) -> Optional[str]:
+    """
+    Writes the recorded spans in Chrome trace event format, with the summary under "williamSummary".
+    Returns the path, or None if there was nothing to write.
+    """
+    with _lock:
+        events = list(_events)
+    if not events:
+        return None
+    pid = os.getpid()
+    trace_events = []
+    for name, start, end, turn, span_id, parent_id, thread_id, args in events:
+        trace_events.append({
+            "name": name, "cat": "william", "ph": "X", "pid": pid, "tid": thread_id,
+            "ts": start * 1e6, "dur": (end - start) * 1e6,
+            "args": dict(args, turn=turn, span_id=span_id, parent_id=parent_id),
+        })
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms", "williamSummary": summary()}, f)
+    return path
+
+
+def reset():
+    """Drops all recorded spans and statistics."""
+    with _lock:
+        _events.clear()
+        _durations.clear()
+    _local.turn = None
+
+
+if __name__ == '__main__':
+    # Trace a few fake turns and export them:
+    #   python -m william_ai_assistant.tracing
+    enabled = True
+    for _ in range(3):
+        begin_turn()
+        with span("route"):
+            with span("llm", model="demo"):
+                time.sleep(0.02)
+        with span("tts"):
+            time.sleep(0.01)
+        end_turn()
+    print_summary()
+    print(f"Trace written to {export_chrome_trace()}")
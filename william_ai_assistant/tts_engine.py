@@ -1,48 +1,653 @@
 # Text-to-Speech engine
+# Speech runs on a worker that owns the pyttsx3 engine, so callers don't wait for it unless they
+# want to: speak_async() queues an utterance and returns a Future, speak() waits for it. While one
+# sentence plays, the next one is already rendered to a WAV buffer. Prompts such as "Yes?" go ahead
+# of queued reply sentences, and cancel() cuts speech off at once (barge-in). Fixed phrases are
+# rendered once and then played from a PhraseCache.
+import collections
+import hashlib
+import io
+import itertools
+import os
+import queue
+import re
+import sys
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
 import pyttsx3
 from william_ai_assistant import config # To get TTS_RATE
+from william_ai_assistant import tracing
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 engine = None
 # This flag helps prevent re-initialization issues or use before init.
 engine_initialized = False
 
-def initialize_engine():
-    """Initializes the pyttsx3 engine."""
-    global engine, engine_initialized
-    if not engine_initialized:
+PRIORITY_PROMPT = 0 # "Yes?" and other prompts: spoken before reply sentences that are still queued
+PRIORITY_REPLY = 1
+PRIORITY_WARM = 2 # Rendering phrases into the cache, when there is nothing to say
+_STOP = object() # Ends the worker threads
+
+
+def _init_pyttsx3() -> bool:
+    """Initializes the pyttsx3 engine on the calling thread, which then owns it."""
+    global engine
+    try:
+        engine = pyttsx3.init()
+        engine.setProperty('rate', config.TTS_RATE)
+        # You can also list and set voices here if needed
+        # voices = engine.getProperty('voices')
+        # engine.setProperty('voice', voices[0].id) # Example: Set to the first available voice
+        print("TTS Engine Initialized.")
+        return True
+    except Exception as e:
+        print(f"Error initializing pyttsx3 engine: {e}")
+        print("Text-to-speech will not be available.")
+        engine = None # Ensure engine is None if initialization fails
+        return False
+
+
+def speaking_seconds(text: str) -> float:
+    """How long speaking `text` takes at config.TTS_RATE."""
+    return len(str(text).split()) * 60.0 / config.TTS_RATE
+
+
+class SpeakerSink:
+    """
+    The speakers. pyttsx3 renders each utterance to a WAV buffer and PyAudio plays it, so the
+    worker can render the next sentence while this one plays. If PyAudio is missing or the
+    driver can't render to a WAV file, utterances are spoken directly with runAndWait instead.
+    """
+
+    def __init__(self):
+        self.voice = "" # Part of the phrase cache key
+        self._pyaudio = None
+        self._render = True
+
+    def open(self) -> bool:
+        """Called once on the worker thread, which then owns the engine. False if speech is unavailable."""
+        if not _init_pyttsx3():
+            return False
+        self.voice = str(engine.getProperty('voice'))
         try:
-            engine = pyttsx3.init()
-            engine.setProperty('rate', config.TTS_RATE)
-            # You can also list and set voices here if needed
-            # voices = engine.getProperty('voices')
-            # engine.setProperty('voice', voices[0].id) # Example: Set to the first available voice
-            engine_initialized = True
-            print("TTS Engine Initialized.")
+            import pyaudio
+            self._pyaudio = pyaudio.PyAudio()
+        except Exception as e: # Not installed, or no output device
+            print(f"PyAudio output is not available ({e}); speaking one sentence at a time.")
+            self._render = False
+        return True
+
+    def synthesize(self, text: str) -> Optional[bytes]:
+        """WAV bytes for `text`, or None to have `play` speak it directly."""
+        if not self._render:
+            return None
+        handle, path = tempfile.mkstemp(suffix=".wav", prefix="william-tts-")
+        os.close(handle)
+        try:
+            engine.save_to_file(text, path)
+            engine.runAndWait()
+            with open(path, "rb") as f:
+                audio = f.read()
+            wave.open(io.BytesIO(audio)).close() # Not every driver writes WAV (macOS writes AIFF)
+            return audio
         except Exception as e:
-            print(f"Error initializing pyttsx3 engine: {e}")
-            print("Text-to-speech will not be available.")
-            engine = None # Ensure engine is None if initialization fails
-            engine_initialized = False # Explicitly mark as not initialized
+            print(f"Could not render speech to a buffer ({e}); speaking one sentence at a time.")
+            self._render = False
+            return None
+        finally:
+            os.remove(path)
+
+    def play(self, text: str, audio: Optional[bytes], stopped: threading.Event) -> bool:
+        """Plays one utterance. Returns False if `stopped` was set before it finished."""
+        if audio is None:
+            engine.say(text)
+            engine.runAndWait() # interrupt() ends this early
+            return not stopped.is_set()
+        with wave.open(io.BytesIO(audio)) as wav:
+            stream = self._pyaudio.open(format=self._pyaudio.get_format_from_width(wav.getsampwidth()),
+                                        channels=wav.getnchannels(), rate=wav.getframerate(), output=True)
+            try:
+                frames = max(1, wav.getframerate() // 20) # 50 ms per write, so a cut-off is quick
+                while not stopped.is_set():
+                    data = wav.readframes(frames)
+                    if not data:
+                        return True
+                    stream.write(data)
+                return False
+            finally:
+                stream.stop_stream()
+                stream.close()
+
+    def interrupt(self):
+        """Called from any thread to cut off direct speech; buffered playback watches `stopped` instead."""
+        if engine is not None and not self._render:
+            try:
+                engine.stop()
+            except Exception as e:
+                print(f"Error stopping speech: {e}")
+
 
-def speak(text):
+class FileSink(SpeakerSink):
+    """Writes each utterance to a numbered WAV file in `directory` instead of playing it."""
+
+    def __init__(self, directory: str = os.path.join(_BASE_DIR, config.TTS_FILE_SINK_DIR)):
+        super().__init__()
+        self.directory = directory
+        self.files: List[str] = []
+
+    def open(self) -> bool:
+        os.makedirs(self.directory, exist_ok=True)
+        if not _init_pyttsx3():
+            return False
+        self.voice = str(engine.getProperty('voice'))
+        return True
+
+    def play(self, text: str, audio: Optional[bytes], stopped: threading.Event) -> bool:
+        if audio is None:
+            print(f"Could not render to a file: {text}")
+            return False
+        path = os.path.join(self.directory, f"{len(self.files) + 1:04d}.wav")
+        with open(path, "wb") as f:
+            f.write(audio)
+        self.files.append(path)
+        return True
+
+
+class NullSink:
     """
-    Converts the given text to speech.
+    Plays nothing, but takes as long as speaking would, for headless runs and benchmarks.
+
+    Args:
+        speed (float): Speaking time is divided by this; 0 takes no time at all.
+        synthesis_seconds (float): Simulated time to render each utterance.
     """
-    global engine, engine_initialized
-    if not engine_initialized:
-        print("TTS engine not initialized. Attempting to initialize now.")
-        initialize_engine() # Attempt to initialize if not already
 
-    if engine:
+    voice = "null"
+
+    def __init__(self, speed: float = 1.0, synthesis_seconds: float = 0.0):
+        self.speed = speed
+        self.synthesis_seconds = synthesis_seconds
+        self.spoken: List[str] = []
+        self.timeline: List[Tuple[float, float]] = [] # time.monotonic() (start, end) of each utterance played
+        self.cut_off = 0
+
+    def open(self) -> bool:
+        return True
+
+    def synthesize(self, text: str) -> bytes:
+        if self.synthesis_seconds:
+            time.sleep(self.synthesis_seconds)
+        return b""
+
+    def play(self, text: str, audio: Optional[bytes], stopped: threading.Event) -> bool:
+        start = time.monotonic()
+        self.spoken.append(text)
+        completed = not stopped.wait(speaking_seconds(text) / self.speed) if self.speed else True
+        self.timeline.append((start, time.monotonic()))
+        if not completed:
+            self.cut_off += 1
+        return completed
+
+    def interrupt(self):
+        pass
+
+
+class PhraseCache:
+    """
+    Rendered audio of fixed phrases, kept in memory and as WAV files in `directory`, keyed by a
+    hash of the text, voice and rate. Both are bounded in bytes; the least recently used phrases
+    are evicted first.
+
+    Args:
+        directory (Optional[str]): Where to keep the files; None keeps the cache in memory only.
+        memory_bytes (int): Bound of the in-memory cache.
+        disk_bytes (int): Bound of the files in `directory`.
+    """
+
+    def __init__(self, directory: Optional[str] = os.path.join(_BASE_DIR, config.TTS_PHRASE_CACHE_DIR),
+                 memory_bytes: int = config.TTS_PHRASE_CACHE_MEMORY_BYTES,
+                 disk_bytes: int = config.TTS_PHRASE_CACHE_DISK_BYTES):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = collections.OrderedDict() # Key -> audio, least recently used first
+        self._memory_size = 0
+        self._disk = collections.OrderedDict() # Key -> file size, least recently used first
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        if directory:
+            try:
+                os.makedirs(directory, exist_ok=True)
+                files = [entry for entry in os.scandir(directory) if entry.name.endswith(".wav")]
+            except OSError as e:
+                print(f"Could not open the phrase cache in {directory}: {e}")
+                self.directory, files = None, []
+            for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+                self._disk[entry.name[:-len(".wav")]] = entry.stat().st_size
+                self._disk_size += entry.stat().st_size
+
+    @staticmethod
+    def key(text: str, voice: str, rate: int) -> str:
+        return hashlib.sha256(f"{voice}\n{rate}\n{text}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".wav")
+
+    def get(self, key: str) -> Optional[bytes]:
+        """The cached audio for `key`, from memory or else from disk, or None."""
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return audio
+            on_disk = key in self._disk
+            if not on_disk:
+                self.misses += 1
+                return None
         try:
-            print(f"Speaking: {text}")
-            engine.say(text)
-            engine.runAndWait()
+            with open(self._path(key), "rb") as f:
+                audio = f.read()
+            os.utime(self._path(key)) # Its age orders eviction after a restart
+        except OSError:
+            with self._lock:
+                self._disk_size -= self._disk.pop(key, 0)
+                self.misses += 1
+            return None
+        with self._lock:
+            if key in self._disk:
+                self._disk.move_to_end(key)
+            self._keep(key, audio)
+            self.hits += 1
+        return audio
+
+    def put(self, key: str, audio: bytes):
+        with self._lock:
+            self._keep(key, audio)
+        if not self.directory:
+            return
+        try:
+            temporary = self._path(key) + ".tmp"
+            with open(temporary, "wb") as f:
+                f.write(audio)
+            os.replace(temporary, self._path(key)) # Never leaves a half-written phrase behind
+        except OSError as e:
+            print(f"Could not save a phrase to the cache: {e}")
+            return
+        evicted = []
+        with self._lock:
+            self._disk_size += len(audio) - self._disk.pop(key, 0)
+            self._disk[key] = len(audio)
+            while self._disk_size > self.disk_bytes and len(self._disk) > 1:
+                old, size = self._disk.popitem(last=False)
+                self._disk_size -= size
+                evicted.append(old)
+        for old in evicted:
+            try:
+                os.remove(self._path(old))
+            except OSError:
+                pass
+
+    def _keep(self, key: str, audio: bytes):
+        """Adds `audio` to the in-memory cache. Caller holds the lock."""
+        self._memory_size += len(audio) - len(self._memory.pop(key, b""))
+        self._memory[key] = audio
+        while self._memory_size > self.memory_bytes and len(self._memory) > 1:
+            self._memory_size -= len(self._memory.popitem(last=False)[1])
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "in_memory": len(self._memory),
+                "memory_bytes": self._memory_size, "on_disk": len(self._disk), "disk_bytes": self._disk_size}
+
+
+class _Utterance:
+    def __init__(self, text: str, generation: int, play: bool = True):
+        self.text = text
+        self.generation = generation
+        self.play = play # False: only render it into the phrase cache
+        self.audio: Optional[bytes] = None
+        self.future: Future = Future()
+        self.turn = tracing.current_turn() # Speech belongs to the caller's turn
+        self.turn_started_at = tracing.turn_started_at()
+
+
+class TTSWorker:
+    """
+    Speaks queued utterances in priority order on background threads: a render thread that owns
+    the sink (and the pyttsx3 engine), and a player thread, so the next utterance is rendered
+    while the current one plays.
+
+        worker = TTSWorker(NullSink())
+        done = worker.speak_async("Hello there.")  # Future: True once spoken, False if cut off or flushed
+    """
+
+    def __init__(self, sink=None, presynthesize: bool = config.TTS_PRESYNTHESIZE,
+                 phrase_cache: Optional[PhraseCache] = None, phrases=config.TTS_CACHED_PHRASES):
+        """
+        Args:
+            sink: SpeakerSink (default), FileSink, NullSink, or anything with the same four methods.
+            presynthesize (bool): Render the next utterance while the current one plays. Without it
+                                  each utterance is rendered and then played, like runAndWait.
+            phrase_cache (Optional[PhraseCache]): Where rendered `phrases` are kept; None renders everything.
+            phrases (Iterable[str]): The fixed phrases to take from `phrase_cache`; see warm().
+        """
+        self.sink = sink if sink is not None else SpeakerSink()
+        self.presynthesize = presynthesize
+        self.phrase_cache = phrase_cache
+        self.phrases = set(phrases)
+        self.ready = False # The sink opened; otherwise utterances are only printed
+        self.spoken = 0
+        self.cut_off = 0
+        self.flushed = 0
+        self._queue = queue.PriorityQueue() # (priority, sequence, utterance)
+        self._rendered = queue.Queue(maxsize=1) # Rendered utterance waiting for the player
+        self._sequence = itertools.count()
+        self._generation = 0 # Bumped by flush(); utterances from before are dropped
+        self._stopped = threading.Event() # Cuts off the utterance being played
+        self._opened = threading.Event()
+        self._lock = threading.Lock()
+        self._turns_heard = collections.deque(maxlen=100) # Tracing turns whose first audio has been recorded
+        self._renderer = threading.Thread(target=self._render_loop, name="william-tts", daemon=True)
+        self._player = threading.Thread(target=self._play_loop, name="william-tts-player", daemon=True)
+        self._renderer.start()
+        self._player.start()
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """Waits for the sink to open. Returns True if speech is available."""
+        self._opened.wait(timeout)
+        return self.ready
+
+    def speak_async(self, text: str, priority: int = PRIORITY_REPLY) -> Future:
+        """Queues `text` and returns at once. Equal priorities are spoken in the order they were queued."""
+        with self._lock:
+            utterance = _Utterance(str(text), self._generation)
+            self._queue.put((priority, next(self._sequence), utterance))
+        return utterance.future
+
+    def warm(self) -> List[Future]:
+        """Renders the fixed phrases into the phrase cache whenever there is nothing to say."""
+        if self.phrase_cache is None:
+            return []
+        futures = []
+        with self._lock:
+            for phrase in self.phrases:
+                utterance = _Utterance(phrase, self._generation, play=False)
+                self._queue.put((PRIORITY_WARM, next(self._sequence), utterance))
+                futures.append(utterance.future)
+        return futures
+
+    def flush(self) -> int:
+        """Drops every utterance that has not started playing; their futures resolve to False. Returns how many."""
+        dropped = []
+        with self._lock:
+            self._generation += 1
+            while True:
+                try:
+                    dropped.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for entry in dropped:
+                if entry[2] is _STOP or not entry[2].play: # Warming the cache is not speech
+                    self._queue.put(entry)
+        dropped = [utterance for _, _, utterance in dropped if utterance is not _STOP and utterance.play]
+        for utterance in dropped:
+            self._finish(utterance, None)
+        return len(dropped)
+
+    def cancel(self):
+        """Flushes the queue and cuts off the utterance being played, e.g. when the user interrupts."""
+        self.flush()
+        self._stopped.set()
+        self.sink.interrupt()
+
+    def close(self, timeout: float = 5.0):
+        """Lets the queued utterances finish, then stops the worker threads."""
+        self._queue.put((sys.maxsize, next(self._sequence), _STOP))
+        self._renderer.join(timeout)
+        self._player.join(timeout)
+
+    def _render_loop(self):
+        self.ready = self.sink.open()
+        self._opened.set()
+        while True:
+            utterance = self._queue.get()[2]
+            if utterance is _STOP:
+                self._rendered.put(_STOP)
+                return
+            if not utterance.play:
+                utterance.future.set_result(self._render(utterance.text) is not None)
+                continue
+            if utterance.generation != self._generation:
+                self._finish(utterance, None)
+                continue
+            audio = self._render(utterance.text)
+            if self.presynthesize and audio is not None:
+                utterance.audio = audio
+                self._rendered.put(utterance) # Waits while the one rendered before is still waiting
+            else:
+                self._rendered.join() # Let the player finish, then speak on this thread, which owns the engine
+                self._play(utterance, audio)
+
+    def _render(self, text: str) -> Optional[bytes]:
+        """Renders `text` with the sink, or takes it from the phrase cache if it is a fixed phrase."""
+        if not self.ready:
+            return None
+        cached = self.phrase_cache is not None and text in self.phrases
+        if cached:
+            key = PhraseCache.key(text, getattr(self.sink, "voice", ""), config.TTS_RATE)
+            audio = self.phrase_cache.get(key)
+            if audio is not None:
+                return audio
+        try:
+            audio = self.sink.synthesize(text)
+        except Exception as e:
+            print(f"Error rendering speech: {e}")
+            return None
+        if cached and audio is not None:
+            self.phrase_cache.put(key, audio)
+        return audio
+
+    def _play_loop(self):
+        while True:
+            utterance = self._rendered.get()
+            try:
+                if utterance is _STOP:
+                    return
+                self._play(utterance, utterance.audio)
+            finally:
+                self._rendered.task_done()
+
+    def _play(self, utterance: _Utterance, audio: Optional[bytes]):
+        self._stopped.clear()
+        if utterance.generation != self._generation:
+            self._finish(utterance, None)
+            return
+        if not self.ready:
+            print(f"TTS Engine not available. Would have said: {utterance.text}")
+            self._finish(utterance, False)
+            return
+        print(f"Speaking: {utterance.text}")
+        tracing.adopt_turn(utterance.turn, utterance.turn_started_at)
+        try:
+            if utterance.turn is not None and utterance.turn not in self._turns_heard:
+                self._turns_heard.append(utterance.turn)
+                tracing.record("first_audio", utterance.turn_started_at, time.monotonic())
+            with tracing.span("tts", chars=len(utterance.text)):
+                completed = self.sink.play(utterance.text, audio, self._stopped)
         except Exception as e:
             print(f"Error during speech: {e}")
-    else:
-        # Fallback if engine couldn't be initialized or is None
-        print(f"TTS Engine not available. Would have said: {text}")
+            completed = False
+        finally:
+            tracing.adopt_turn(None)
+        self._finish(utterance, completed)
+
+    def _finish(self, utterance: _Utterance, completed: Optional[bool]):
+        """Resolves the utterance's future. `completed` is None if it was flushed before playing."""
+        with self._lock:
+            if completed is None:
+                self.flushed += 1
+            elif completed:
+                self.spoken += 1
+            else:
+                self.cut_off += 1
+        if not utterance.future.done():
+            utterance.future.set_result(bool(completed))
+
+
+_worker: Optional[TTSWorker] = None
+_worker_lock = threading.Lock()
+
+def make_sink(name: str = config.TTS_SINK):
+    """The sink named in config.TTS_SINK: "speaker", "null" or "file"."""
+    if name == "null":
+        return NullSink()
+    if name == "file":
+        return FileSink()
+    if name != "speaker":
+        print(f"Unknown TTS sink '{name}' in config.TTS_SINK; using the speakers.")
+    return SpeakerSink()
+
+def get_worker() -> TTSWorker:
+    """Returns the shared TTSWorker, starting it on first use."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            phrase_cache = PhraseCache() if config.ENABLE_TTS_PHRASE_CACHE else None
+            _worker = TTSWorker(make_sink(), phrase_cache=phrase_cache)
+            _worker.warm()
+        return _worker
+
+def initialize_engine():
+    """Starts the speech worker, which initializes the pyttsx3 engine on its own thread."""
+    global engine_initialized
+    if not engine_initialized:
+        engine_initialized = get_worker().wait_until_ready(timeout=10)
+
+def speak(text, priority: int = PRIORITY_REPLY) -> bool:
+    """
+    Converts the given text to speech and waits until it has been said.
+    Returns False if it was cut off or flushed.
+    """
+    return speak_async(text, priority).result()
+
+def speak_async(text, priority: int = PRIORITY_REPLY) -> Future:
+    """Queues the given text for speech and returns at once; see TTSWorker.speak_async."""
+    return get_worker().speak_async(text, priority)
+
+def flush() -> int:
+    """Drops everything queued but not yet playing."""
+    return _worker.flush() if _worker is not None else 0
+
+def cancel():
+    """Drops everything queued and cuts off what is being spoken. Safe to call from any thread."""
+    if _worker is not None:
+        _worker.cancel()
+
+
+class SentenceChunker:
+    """
+    Splits streamed text into pieces that can be spoken on their own: whole sentences, or
+    clauses once a sentence runs longer than `min_clause_chars`.
+    """
+    _SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s+|\n+")
+    _CLAUSE_END = re.compile(r"[,;:\u2014]\s+")
+    _ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "st", "vs", "etc", "e.g", "i.e", "no"}
+
+    def __init__(self, min_clause_chars: int = config.TTS_STREAM_MIN_CLAUSE_CHARS):
+        self.min_clause_chars = min_clause_chars
+        self.buffer = ""
+
+    def feed(self, delta: str) -> list:
+        """Adds the next piece of text and returns the pieces completed by it."""
+        self.buffer += delta
+        pieces = []
+        while True:
+            cut = self._next_cut()
+            if cut is None:
+                return pieces
+            piece, self.buffer = self.buffer[:cut].strip(), self.buffer[cut:]
+            if piece:
+                pieces.append(piece)
+
+    def _next_cut(self):
+        for match in self._SENTENCE_END.finditer(self.buffer):
+            words = self.buffer[:match.start()].split()
+            if match.group().startswith(".") and words and words[-1].lower().rstrip(".") in self._ABBREVIATIONS:
+                continue # "Dr. Smith" is not the end of a sentence
+            return match.end()
+        if len(self.buffer) >= self.min_clause_chars:
+            last = None
+            for last in self._CLAUSE_END.finditer(self.buffer, self.min_clause_chars // 2):
+                pass
+            if last is not None:
+                return last.end()
+        return None
+
+    def flush(self) -> str:
+        """Returns whatever is left once the stream has ended."""
+        rest, self.buffer = self.buffer.strip(), ""
+        return rest
+
+
+def speak_stream(deltas, on_text=None) -> str:
+    """
+    Speaks a reply while it is still being generated.
+
+    The text is read on a background thread and cut into sentences (see SentenceChunker);
+    each completed sentence is queued for speech while the following ones are still arriving.
+
+    Args:
+        deltas (Iterable[str]): Pieces of the reply, e.g. from william_brain.stream_llm_response.
+        on_text (Callable): Optional, called with all text received so far as each piece is queued.
+
+    Returns:
+        str: The whole reply.
+    """
+    chunker = SentenceChunker()
+    pieces = queue.Queue()
+    received = []
+    turn = tracing.current_turn()
+
+    def read():
+        tracing.adopt_turn(turn) # LLM spans recorded on this thread still belong to the turn
+        try:
+            for delta in deltas:
+                received.append(delta)
+                for piece in chunker.feed(delta):
+                    pieces.put(piece)
+            rest = chunker.flush()
+            if rest:
+                pieces.put(rest)
+        except Exception as e:
+            print(f"Error while streaming the reply: {e}")
+        finally:
+            pieces.put(None)
+
+    started = time.monotonic()
+    threading.Thread(target=read, name="william-tts-stream", daemon=True).start()
+    queued = []
+    while True:
+        piece = pieces.get()
+        if piece is None:
+            break
+        if not queued:
+            tracing.record("tts_first_piece", started, time.monotonic())
+        if on_text is not None:
+            on_text("".join(received))
+        queued.append(speak_async(piece)) # Rendered while the sentences before it play
+    for done in queued:
+        done.result()
+    text = "".join(received).strip()
+    if on_text is not None:
+        on_text(text)
+    return text
 
 if __name__ == '__main__':
     # This is for testing the tts_engine.py module independently
@@ -53,14 +658,15 @@ if __name__ == '__main__':
         speak("Hello, this is William's text to speech engine.")
         speak(f"My current speech rate is {config.TTS_RATE} words per minute.")
 
-        engine.setProperty('rate', 200) # Test changing rate
-        speak("I can also speak faster.")
-
-        engine.setProperty('rate', 100) # Test changing rate
-        speak("Or slower.")
+        # Queued without waiting; each sentence is rendered while the one before it plays
+        for sentence in ("This is the first of three sentences.", "This is the second.", "And this is the third."):
+            speak_async(sentence)
+        speak("Yes?", priority=PRIORITY_PROMPT) # Goes ahead of the sentences not rendered yet
 
-        # Reset to config rate for consistency if other tests import this
-        engine.setProperty('rate', config.TTS_RATE)
-        speak("Testing complete. Resetting rate.")
+        last = speak_async("This long sentence is going to be cut off after one second, so you won't hear its end.")
+        time.sleep(1)
+        cancel()
+        print(f"Cut off: {not last.result()}")
+        speak("Testing complete.")
     else:
         print("TTS Engine could not be initialized for testing.")
@@ -1,7 +1,71 @@
 # Utility functions for William AI Assistant
+import bisect
+import threading
+from typing import Dict, List, Optional
+
+# Upper bounds (in milliseconds) of the latency histogram buckets; the last bucket is open-ended.
+LATENCY_BUCKETS_MS = [5, 10, 20, 50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000, 30000]
+
+
+class LatencyHistogram:
+    """
+    Thread-safe fixed-bucket latency histogram.
+    Cheap enough to update on every request; percentiles are estimated from the bucket bounds.
+    """
+
+    def __init__(self, buckets_ms: Optional[List[float]] = None):
+        self.buckets_ms = list(buckets_ms or LATENCY_BUCKETS_MS)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency_seconds: float, error: bool = False):
+        """Adds one observation. Errors are counted but kept out of the latency buckets."""
+        with self._lock:
+            if error:
+                self.errors += 1
+                return
+            latency_ms = latency_seconds * 1000.0
+            self.counts[bisect.bisect_left(self.buckets_ms, latency_ms)] += 1
+            self.count += 1
+            self.total_ms += latency_ms
+            self.max_ms = max(self.max_ms, latency_ms)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """
+        Returns the upper bound (ms) of the bucket holding the given fraction (0-1), capped at the
+        largest latency seen, or None if empty.
+        """
+        with self._lock:
+            if self.count == 0:
+                return None
+            target = fraction * self.count
+            seen = 0
+            for i, bucket_count in enumerate(self.counts):
+                seen += bucket_count
+                if seen >= target and bucket_count:
+                    return min(self.buckets_ms[i], self.max_ms) if i < len(self.buckets_ms) else self.max_ms
+            return self.max_ms
+
+    def as_dict(self) -> Dict[str, object]:
+        """Summary suitable for printing or JSON export."""
+        with self._lock:
+            buckets = {f"<={bound}ms": c for bound, c in zip(self.buckets_ms, self.counts)}
+            buckets[f">{self.buckets_ms[-1]}ms"] = self.counts[-1]
+            count, total, maximum, errors = self.count, self.total_ms, self.max_ms, self.errors
+        return {
+            "count": count,
+            "errors": errors,
+            "mean_ms": total / count if count else None,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "max_ms": maximum if count else None,
+            "buckets": buckets,
+        }
 
-# This file is currently a placeholder.
-# Add any common utility functions here as the project develops.
 
 def example_utility_function():
     """
@@ -12,6 +76,14 @@ def example_utility_function():
 
 if __name__ == '__main__':
     print("Testing utility functions...")
+    histogram = LatencyHistogram()
+    for seconds in (0.004, 0.08, 0.09, 0.4, 2.5):
+        histogram.record(seconds)
+    histogram.record(1.0, error=True)
+    print(f"Latency histogram: {histogram.as_dict()}")
+    assert histogram.count == 5 and histogram.errors == 1
+    assert histogram.percentile(0.5) == 100
+    assert histogram.percentile(0.95) == 2500 # The 3000 ms bucket bound, capped at the max
     if example_utility_function():
         print("Example utility function test successful.")
     else:
@@ -0,0 +1,213 @@
+# Voice activity detection for William AI Assistant
+# Replaces the per-chunk audioop.rms energy check of Recognizer.listen (audioop is removed in Python 3.13).
+# Audio is analysed a block of frames at a time with NumPy: speech-band spectral energy against a
+# tracked noise floor, zero-crossing rate, and a hangover that keeps speech "on" across short gaps.
+# The spectral energy costs more CPU than an RMS check, so while idle the work per frame is kept
+# small: single precision, the zero-crossing rate only for frames loud enough to be speech, and a
+# cached noise floor update for blocks without speech.
+import json
+import math
+import os
+import time
+from typing import Optional
+
+import numpy as np
+from william_ai_assistant import config
+
+SPEECH_BAND_HZ = (300.0, 3400.0) # Telephone band: most speech energy, little hum or hiss
+MIN_NOISE_FLOOR_DB = -70.0 # Digital silence would otherwise make every faint sound look like speech
+_EPSILON = 1e-10
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+NOISE_CALIBRATION_FILE_PATH = os.path.join(_BASE_DIR, config.NOISE_CALIBRATION_FILE)
+
+
+def to_pcm16(data: bytes, sample_width: int) -> bytes:
+    """Converts signed little-endian PCM of any width (as produced by speech_recognition sources) to 16-bit."""
+    if sample_width == 2:
+        return data
+    if sample_width == 1:
+        return (np.frombuffer(data, dtype=np.int8).astype("<i2") << 8).tobytes()
+    if sample_width == 3:
+        raw = np.frombuffer(data[:len(data) - len(data) % 3], dtype=np.uint8).reshape(-1, 3)
+        return raw[:, 1:].copy().tobytes() # Keep the two most significant bytes
+    return (np.frombuffer(data, dtype="<i4") >> 16).astype("<i2").tobytes()
+
+
+def load_noise_calibration(sample_rate: int, device=None, path: str = NOISE_CALIBRATION_FILE_PATH,
+                           max_age_hours: float = config.NOISE_CALIBRATION_MAX_AGE_HOURS) -> Optional[float]:
+    """
+    Returns the saved noise floor in dBFS, or None if there is no usable calibration
+    (missing, unreadable, older than `max_age_hours`, or measured on another device or sample rate).
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get("sample_rate") != sample_rate or saved.get("device") != device:
+            return None
+        if time.time() - saved["saved_at"] > max_age_hours * 3600:
+            return None
+        return float(saved["noise_floor_db"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_noise_calibration(noise_floor_db: float, sample_rate: int, device=None, path: str = NOISE_CALIBRATION_FILE_PATH):
+    """Writes the noise floor for the next start. Written to a temporary file first, so a crash never leaves half a file."""
+    data = {"noise_floor_db": round(noise_floor_db, 2), "sample_rate": sample_rate, "device": device, "saved_at": time.time()}
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Could not save noise calibration to {path}: {e}")
+
+
+class VoiceActivityDetector:
+    """
+    Frame-level speech/non-speech decisions for 16-bit mono PCM.
+
+    A frame is speech when its speech-band energy is `margin_db` above the noise floor.
+    Frames with a high zero-crossing rate (hiss, clicks, but also fricatives like "s")
+    need twice the margin. The noise floor is an exponential average of the frame energies,
+    adapting quickly during non-speech and slowly during speech so a permanent change in
+    background noise is still picked up. Once speech stops, frames stay marked as speech
+    for `hangover_seconds`; the end of that hangover is the end of the phrase.
+
+    State (noise floor, hangover, partial frames) carries over between `process` calls,
+    so a stream can be fed in blocks of any size.
+    """
+
+    def __init__(self, sample_rate: int, frame_ms: float = config.VAD_FRAME_MS,
+                 margin_db: float = config.VAD_MARGIN_DB, max_voiced_zcr: float = config.VAD_MAX_VOICED_ZCR,
+                 hangover_seconds: float = config.VAD_HANGOVER_SECONDS,
+                 noise_adapt_seconds: float = config.VAD_NOISE_ADAPT_SECONDS,
+                 noise_floor_db: Optional[float] = None):
+        """
+        Args:
+            sample_rate (int): Sample rate of the audio that will be passed to `process`.
+            frame_ms (float): Analysis frame length in milliseconds.
+            margin_db (float): How far above the noise floor a frame must be to count as speech.
+            max_voiced_zcr (float): Zero-crossing rate (crossings per sample) above which
+                                    a frame needs twice the margin.
+            hangover_seconds (float): How long speech stays active after the last speech frame.
+            noise_adapt_seconds (float): Time constant of the noise floor during non-speech.
+            noise_floor_db (Optional[float]): Starting noise floor in dBFS. If None, it is
+                                              estimated from the first block of audio.
+        """
+        self.sample_rate = sample_rate
+        self.frame_length = max(1, int(sample_rate * frame_ms / 1000))
+        self.frame_bytes = self.frame_length * 2
+        self.frame_seconds = self.frame_length / sample_rate
+        self.margin_db = margin_db
+        self.max_voiced_zcr = max_voiced_zcr
+        self.hangover_frames = int(math.ceil(hangover_seconds / self.frame_seconds))
+        self.noise_floor_db = noise_floor_db
+
+        # Per-frame EMA decay factors, in log form so a whole block can be folded in at once
+        self._log_decay_quiet = -self.frame_seconds / noise_adapt_seconds
+        self._log_decay_speech = self._log_decay_quiet / 20 # Speech barely moves the floor
+
+        window = np.hanning(self.frame_length)
+        self._window = (window / 32768.0).astype(np.float32) # Also scales 16-bit samples to [-1, 1)
+        self._power_scale = 2.0 / (np.sum(window ** 2) * self.frame_length) # Band power as a mean square
+        self._quiet_weights = {} # Block length -> (decay over the block, weight of each frame), see _update_noise_floor
+        frequencies = np.fft.rfftfreq(self.frame_length, 1.0 / sample_rate)
+        self._band = (frequencies >= SPEECH_BAND_HZ[0]) & (frequencies <= SPEECH_BAND_HZ[1])
+        self.reset(noise_floor_db)
+
+    def reset(self, noise_floor_db: Optional[float] = None):
+        """Forgets the hangover and any partial frame. Keeps the noise floor unless a new one is given."""
+        if noise_floor_db is not None:
+            self.noise_floor_db = noise_floor_db
+        self._last_speech = -(self.hangover_frames + 1) # Frame index of the last speech frame, relative to the next one
+        self._pending = b""
+
+    @property
+    def speech_threshold_db(self) -> Optional[float]:
+        """Current speech threshold (noise floor + margin) in dBFS; moves with the noise floor."""
+        return None if self.noise_floor_db is None else self.noise_floor_db + self.margin_db
+
+    def frame_energies(self, frames: np.ndarray) -> np.ndarray:
+        """Speech-band energy of each row of `frames` (16-bit samples), in dBFS."""
+        spectrum = np.fft.rfft(frames * self._window, axis=1)[:, self._band] # float32 in, complex64 out
+        power = (spectrum.real ** 2 + spectrum.imag ** 2).sum(axis=1) * self._power_scale
+        return 10.0 * np.log10(power + _EPSILON)
+
+    def process(self, data: bytes) -> np.ndarray:
+        """
+        Classifies the complete frames in `data` (plus any partial frame left over from the last call).
+
+        Args:
+            data (bytes): Little-endian 16-bit mono PCM.
+
+        Returns:
+            np.ndarray: One bool per complete frame, True for speech (including hangover).
+        """
+        if self._pending:
+            data = self._pending + data
+        count = len(data) // self.frame_bytes
+        self._pending = data[count * self.frame_bytes:]
+        if count == 0:
+            return np.zeros(0, dtype=bool)
+        frames = np.frombuffer(data, dtype="<i2", count=count * self.frame_length).reshape(count, self.frame_length)
+
+        energies = self.frame_energies(frames)
+        if self.noise_floor_db is None:
+            self.noise_floor_db = max(float(np.percentile(energies, 20)), MIN_NOISE_FLOOR_DB)
+
+        above_floor = energies - self.noise_floor_db
+        raw = above_floor > self.margin_db
+        if raw.any(): # The zero-crossing rate only matters for frames loud enough to be speech
+            loud = np.flatnonzero(raw)
+            zero_crossings = np.count_nonzero(np.diff(np.signbit(frames[loud]), axis=1), axis=1) / self.frame_length
+            raw[loud] = (zero_crossings <= self.max_voiced_zcr) | (above_floor[loud] > 2 * self.margin_db)
+
+        # Hangover: a frame is active if the last raw speech frame is at most hangover_frames back
+        index = np.arange(count)
+        last_speech = np.maximum.accumulate(np.where(raw, index, self._last_speech))
+        active = index - last_speech <= self.hangover_frames
+        self._last_speech = int(last_speech[-1]) - count
+
+        self._update_noise_floor(energies, raw)
+        return active
+
+    def _update_noise_floor(self, energies: np.ndarray, speech: np.ndarray):
+        # Same result as updating an EMA frame by frame, with a slower rate on speech frames:
+        # floor' = floor * prod(d) + sum_i (1 - d_i) * e_i * prod_{j > i} d_j
+        if not speech.any(): # The usual idle block: every d_i is the same, so the weights only depend on its length
+            weights = self._quiet_weights.get(len(energies))
+            if weights is None:
+                later = self._log_decay_quiet * np.arange(len(energies) - 1, -1, -1)
+                weights = self._quiet_weights[len(energies)] = (
+                    math.exp(self._log_decay_quiet * len(energies)), (1.0 - math.exp(self._log_decay_quiet)) * np.exp(later))
+            decay, frame_weights = weights
+            self.noise_floor_db = max(self.noise_floor_db * decay + float(np.dot(frame_weights, energies)),
+                                      MIN_NOISE_FLOOR_DB)
+            return
+        log_decay = np.where(speech, self._log_decay_speech, self._log_decay_quiet)
+        later = np.cumsum(log_decay[::-1])[::-1] - log_decay # sum of log d_j for j > i
+        floor = self.noise_floor_db * math.exp(log_decay.sum())
+        floor += float(np.sum((1.0 - np.exp(log_decay)) * energies * np.exp(later)))
+        self.noise_floor_db = max(floor, MIN_NOISE_FLOOR_DB)
+
+
+if __name__ == '__main__':
+    # Print the speech regions found in a WAV file:
+    #   python -m william_ai_assistant.vad path/to/recording.wav
+    import sys
+
+    import speech_recognition as sr
+
+    if len(sys.argv) < 2:
+        print("Usage: python -m william_ai_assistant.vad <file.wav>")
+        sys.exit(1)
+
+    with sr.AudioFile(sys.argv[1]) as source:
+        audio = sr.Recognizer().record(source)
+    test_vad = VoiceActivityDetector(audio.sample_rate)
+    flags = test_vad.process(audio.get_raw_data(convert_width=2))
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], flags, [False])).astype(np.int8)))
+    for start, end in zip(edges[::2], edges[1::2]):
+        print(f"Speech {start * test_vad.frame_seconds:7.2f}s - {end * test_vad.frame_seconds:7.2f}s")
+    print(f"Noise floor: {test_vad.noise_floor_db:.1f} dBFS")
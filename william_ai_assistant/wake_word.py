@@ -0,0 +1,164 @@
+# Offline wake word spotting for William AI Assistant
+# Compares log-mel features of each captured phrase against a few enrolled recordings of the
+# wake word, so idle listening does not need a cloud speech-to-text call per noise burst.
+import glob
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+import speech_recognition as sr
+from william_ai_assistant import config
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+WAKE_WORD_TEMPLATE_DIR_PATH = os.path.join(_BASE_DIR, config.WAKE_WORD_TEMPLATE_DIR)
+
+FEATURE_SAMPLE_RATE = 16000
+FRAME_LENGTH = 400 # 25 ms at 16 kHz
+FRAME_STEP = 160 # 10 ms at 16 kHz
+FFT_SIZE = 512
+MEL_BANDS = 32
+
+_mel_filterbank_cache = {}
+
+
+def _mel_filterbank(sample_rate: int = FEATURE_SAMPLE_RATE, fft_size: int = FFT_SIZE, bands: int = MEL_BANDS) -> np.ndarray:
+    """Triangular mel filterbank of shape (bands, fft_size // 2 + 1). Cached per parameter set."""
+    key = (sample_rate, fft_size, bands)
+    if key in _mel_filterbank_cache:
+        return _mel_filterbank_cache[key]
+
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def mel_to_hz(mel):
+        return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+    mel_points = np.linspace(hz_to_mel(60.0), hz_to_mel(sample_rate / 2), bands + 2)
+    bins = np.floor((fft_size + 1) * mel_to_hz(mel_points) / sample_rate).astype(int)
+    filterbank = np.zeros((bands, fft_size // 2 + 1))
+    for band in range(1, bands + 1):
+        left, center, right = bins[band - 1], bins[band], bins[band + 1]
+        if center > left:
+            filterbank[band - 1, left:center] = (np.arange(left, center) - left) / (center - left)
+        if right > center:
+            filterbank[band - 1, center:right] = (right - np.arange(center, right)) / (right - center)
+    _mel_filterbank_cache[key] = filterbank
+    return filterbank
+
+
+def audio_to_samples(audio: sr.AudioData) -> np.ndarray:
+    """Converts AudioData to float32 mono samples at FEATURE_SAMPLE_RATE."""
+    raw = audio.get_raw_data(convert_rate=FEATURE_SAMPLE_RATE, convert_width=2)
+    return np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def log_mel_features(samples: np.ndarray) -> np.ndarray:
+    """
+    Computes mean-normalized, unit-length log-mel frames.
+
+    Args:
+        samples (np.ndarray): Float mono samples at FEATURE_SAMPLE_RATE.
+
+    Returns:
+        np.ndarray: Array of shape (frames, MEL_BANDS). Empty if the clip is shorter than one frame.
+    """
+    if len(samples) < FRAME_LENGTH:
+        return np.zeros((0, MEL_BANDS), dtype=np.float32)
+    frame_count = 1 + (len(samples) - FRAME_LENGTH) // FRAME_STEP
+    strides = (samples.strides[0] * FRAME_STEP, samples.strides[0])
+    frames = np.lib.stride_tricks.as_strided(samples, shape=(frame_count, FRAME_LENGTH), strides=strides)
+    spectrum = np.abs(np.fft.rfft(frames * np.hamming(FRAME_LENGTH), n=FFT_SIZE)) ** 2
+    features = np.log(spectrum @ _mel_filterbank().T + 1e-10)
+    features -= features.mean(axis=0) # Cepstral mean normalization removes the microphone/channel colour
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    return (features / np.maximum(norms, 1e-10)).astype(np.float32)
+
+
+def subsequence_dtw_distance(template: np.ndarray, utterance: np.ndarray) -> float:
+    """
+    Average cosine distance of the best alignment of `template` anywhere inside `utterance`.
+
+    Each template frame consumes one, zero or two utterance frames (steps (1,1), (1,0), (1,2)),
+    so every row only depends on the previous one and can be computed as a single vector operation.
+    The alignment can start and end anywhere in the utterance, so "hey william, what time is it"
+    still matches a "hey william" template.
+    """
+    if len(template) == 0 or len(utterance) == 0:
+        return float("inf")
+    cost = 1.0 - template @ utterance.T # Cosine distance, since all frames are unit length
+    accumulated = cost[0].copy()
+    for row in cost[1:]:
+        previous = accumulated
+        diagonal = np.concatenate(([np.inf], previous[:-1]))
+        skip = np.concatenate(([np.inf, np.inf], previous[:-2]))
+        accumulated = row + np.minimum(np.minimum(previous, diagonal), skip)
+    return float(accumulated.min() / len(template))
+
+
+class WakeWordSpotter:
+    """
+    Template-matching keyword spotter.
+
+    Templates are short WAV recordings of the wake word (see `enroll_from_microphone`).
+    A phrase is accepted if its distance to the closest template is within `sensitivity`.
+    """
+
+    def __init__(self, templates: List[np.ndarray], sensitivity: float = config.WAKE_WORD_SENSITIVITY):
+        """
+        Args:
+            templates (List[np.ndarray]): Log-mel feature arrays, one per enrolled recording.
+            sensitivity (float): Maximum average cosine distance (0-2) that counts as a detection.
+                                 Raise it if the wake word is missed, lower it on false wakes.
+        """
+        self.templates = [t for t in templates if len(t) > 0]
+        self.sensitivity = sensitivity
+
+    @classmethod
+    def from_directory(cls, directory: str = WAKE_WORD_TEMPLATE_DIR_PATH,
+                       sensitivity: float = config.WAKE_WORD_SENSITIVITY) -> Optional["WakeWordSpotter"]:
+        """Loads every .wav in `directory` as a template. Returns None if there are none."""
+        paths = sorted(glob.glob(os.path.join(directory, "*.wav")))
+        templates = []
+        for path in paths:
+            try:
+                with sr.AudioFile(path) as source:
+                    audio = sr.Recognizer().record(source)
+                templates.append(log_mel_features(audio_to_samples(audio)))
+            except Exception as e:
+                print(f"Could not load wake word template {path}: {e}")
+        if not templates:
+            return None
+        print(f"Loaded {len(templates)} wake word template(s) from {directory}.")
+        return cls(templates, sensitivity=sensitivity)
+
+    def score(self, audio: sr.AudioData) -> float:
+        """Returns the distance to the closest template (lower is a better match)."""
+        features = log_mel_features(audio_to_samples(audio))
+        return min((subsequence_dtw_distance(t, features) for t in self.templates), default=float("inf"))
+
+    def detect(self, audio: sr.AudioData) -> Tuple[bool, float]:
+        """Returns (detected, distance) for a captured phrase."""
+        distance = self.score(audio)
+        return distance <= self.sensitivity, distance
+
+
+def enroll_from_microphone(count: int = 3, directory: str = WAKE_WORD_TEMPLATE_DIR_PATH):
+    """Records `count` examples of the wake word from the microphone into `directory`."""
+    os.makedirs(directory, exist_ok=True)
+    recognizer = sr.Recognizer()
+    with sr.Microphone(device_index=config.MICROPHONE_INDEX) as source:
+        recognizer.adjust_for_ambient_noise(source, duration=1)
+        for i in range(count):
+            print(f"({i + 1}/{count}) Say '{config.WAKE_WORD}' now...")
+            audio = recognizer.listen(source, phrase_time_limit=3)
+            path = os.path.join(directory, f"template_{len(os.listdir(directory)) + 1:02d}.wav")
+            with open(path, "wb") as f:
+                f.write(audio.get_wav_data(convert_rate=FEATURE_SAMPLE_RATE, convert_width=2))
+            print(f"Saved {path}")
+
+
+if __name__ == '__main__':
+    # Enroll wake word templates from the microphone:
+    #   python -m william_ai_assistant.wake_word [count]
+    import sys
+    enroll_from_microphone(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
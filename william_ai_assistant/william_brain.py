@@ -1,8 +1,17 @@
 # Handles interaction with the LLM (OpenRouter)
 import requests
 import json
+import functools
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+from requests.adapters import HTTPAdapter
 from william_ai_assistant import config as app_config # Specific app config
+from william_ai_assistant import llm_cache
 from william_ai_assistant import tts_engine
+from william_ai_assistant import tracing
+from william_ai_assistant.utils import LatencyHistogram
 
 # PERSONALITY_PROMPT is now enabled/disabled via app_config.ENABLE_PERSONALITY
 PERSONALITY_PROMPT = """You are William, a witty, intelligent assistant. Respond helpfully and in a natural human tone."""
@@ -17,21 +26,164 @@ else:
     canvas_utils = DummyCanvasUtils()
 
 
-def get_llm_response(text_input, command_history: list = None):
+class _InstrumentedAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections report how long each new connection (TCP + TLS handshake) took."""
+
+    def __init__(self, on_connect, **kwargs):
+        self.on_connect = on_connect
+        super().__init__(**kwargs) # Calls init_poolmanager
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        on_connect = self.on_connect
+        pool_classes = {}
+        for scheme, pool_class in self.poolmanager.pool_classes_by_scheme.items():
+            class Connection(pool_class.ConnectionCls):
+                def connect(self):
+                    start = time.monotonic()
+                    super().connect()
+                    on_connect(time.monotonic() - start)
+            pool_classes[scheme] = type(pool_class.__name__, (pool_class,), {"ConnectionCls": Connection})
+        self.poolmanager.pool_classes_by_scheme = pool_classes
+
+
+class OpenRouterClient:
     """
-    Sends the user's text input to OpenRouter and returns the LLM's response.
-    Optionally includes command history.
+    Long-lived HTTP client for OpenRouter.
+
+    Owns one requests.Session with a keep-alive connection pool, so consecutive turns and
+    fallback attempts reuse the same TCP/TLS connection instead of handshaking every time.
+    Counts handshakes and time to first byte for `stats()`.
     """
-    headers = {
-        "Authorization": f"Bearer {app_config.OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-    }
-    # Add optional headers if they are set in config
-    if app_config.OPENROUTER_SITE_URL:
-        headers["HTTP-Referer"] = app_config.OPENROUTER_SITE_URL
-    if app_config.OPENROUTER_SITE_NAME:
-        headers["X-Title"] = app_config.OPENROUTER_SITE_NAME
 
+    def __init__(self, api_url: Optional[str] = None, pool_size: int = app_config.LLM_POOL_SIZE,
+                 timeout: float = app_config.LLM_REQUEST_TIMEOUT_SECONDS, verify=True):
+        """
+        Args:
+            api_url (Optional[str]): Chat completions URL. None follows config.OPENROUTER_API_URL.
+            pool_size (int): Connections kept open per host, i.e. concurrent requests without a new handshake.
+            timeout (float): Request timeout in seconds.
+            verify: Passed to requests, e.g. a CA bundle path for a local HTTPS stand-in.
+        """
+        self.api_url = api_url
+        self.timeout = timeout
+        self.verify = verify # Passed per request: a session-level verify loses to REQUESTS_CA_BUNDLE
+        self.session = requests.Session()
+        adapter = _InstrumentedAdapter(self._on_connect, pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.handshakes = 0
+        self.requests = 0
+        self.request_bytes_total = 0
+        self.request_bytes_max = 0
+        self.handshake_latency = LatencyHistogram()
+        self.ttfb_latency = LatencyHistogram() # Request sent -> response headers received
+        self._headers_key = None
+        self._last_prewarm = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return self.api_url or app_config.OPENROUTER_API_URL
+
+    def _on_connect(self, seconds: float):
+        with self._lock:
+            self.handshakes += 1
+        self.handshake_latency.record(seconds)
+
+    def _refresh_headers(self):
+        # Built once and kept on the session; rebuilt only if the configuration changes
+        key = (app_config.OPENROUTER_API_KEY, app_config.OPENROUTER_SITE_URL, app_config.OPENROUTER_SITE_NAME)
+        if key == self._headers_key:
+            return
+        headers = {
+            "Authorization": f"Bearer {app_config.OPENROUTER_API_KEY}",
+            "Content-Type": "application/json",
+        }
+        # Add optional headers if they are set in config
+        if app_config.OPENROUTER_SITE_URL:
+            headers["HTTP-Referer"] = app_config.OPENROUTER_SITE_URL
+        if app_config.OPENROUTER_SITE_NAME:
+            headers["X-Title"] = app_config.OPENROUTER_SITE_NAME
+        self.session.headers.update(headers)
+        self._headers_key = key
+
+    def post(self, payload: dict, stream: bool = False) -> requests.Response:
+        """
+        Sends one chat completions request. Raises requests exceptions like `requests.post`.
+        The size of the JSON body is counted in `stats()` and set as `response.request_bytes`.
+        """
+        self._refresh_headers()
+        body = json.dumps(payload).encode("utf-8")
+        response = self.session.post(self.url, data=body, timeout=self.timeout, stream=stream, verify=self.verify)
+        response.request_bytes = len(body)
+        with self._lock:
+            self.requests += 1
+            self.request_bytes_total += len(body)
+            self.request_bytes_max = max(self.request_bytes_max, len(body))
+        self.ttfb_latency.record(response.elapsed.total_seconds())
+        return response
+
+    def prewarm(self, wait: bool = False):
+        """
+        Opens a pooled connection to OpenRouter (DNS, TCP and TLS set-up) so the next request
+        skips the handshake. Throttled to once per LLM_PREWARM_INTERVAL_SECONDS.
+
+        Args:
+            wait (bool): Block until the connection is open instead of using a background thread.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_prewarm < app_config.LLM_PREWARM_INTERVAL_SECONDS:
+                return
+            self._last_prewarm = now
+        if wait:
+            self._prewarm()
+        else:
+            threading.Thread(target=self._prewarm, name="william-llm-prewarm", daemon=True).start()
+
+    def _prewarm(self):
+        try:
+            self.session.head(self.url, timeout=5, verify=self.verify) # Any response leaves a pooled connection behind
+        except requests.exceptions.RequestException as e:
+            print(f"Could not prewarm the LLM connection: {e}")
+
+    def stats(self) -> Dict[str, object]:
+        """Connection reuse and latency counters, suitable for printing or JSON export."""
+        return {
+            "requests": self.requests,
+            "handshakes": self.handshakes,
+            "request_bytes_mean": self.request_bytes_total / self.requests if self.requests else None,
+            "request_bytes_max": self.request_bytes_max,
+            "handshake": self.handshake_latency.as_dict(),
+            "ttfb": self.ttfb_latency.as_dict(),
+        }
+
+    def close(self):
+        self.session.close()
+
+
+_client: Optional[OpenRouterClient] = None
+_client_lock = threading.Lock()
+
+def get_client() -> OpenRouterClient:
+    """Returns the shared OpenRouterClient, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OpenRouterClient()
+        return _client
+
+def prewarm_connection(wait: bool = False):
+    """
+    Opens the connection to OpenRouter ahead of the first request. Called at startup and
+    when a partial transcript is routed to the LLM.
+    """
+    get_client().prewarm(wait=wait)
+
+
+def _build_payload(text_input, command_history: list = None) -> dict:
+    """Chat completions request body for `text_input`, with the personality prompt and history."""
     messages = []
 
     # Add personality prompt (system message) if enabled
@@ -57,7 +209,7 @@ def get_llm_response(text_input, command_history: list = None):
         "content": [{"type": "text", "text": text_input}]
     })
 
-    payload = {
+    return {
         "model": app_config.OPENROUTER_MODEL,
         "messages": messages
         # Add other parameters like max_tokens, temperature if needed for Gemini
@@ -65,112 +217,403 @@ def get_llm_response(text_input, command_history: list = None):
         # "temperature": 0.7   # Example
     }
 
-    models_to_try = [app_config.OPENROUTER_MODEL]
+def request_payload_bytes(text_input, command_history: list = None) -> int:
+    """Exact size in bytes of the JSON body `get_llm_response` sends for this input and history."""
+    return len(json.dumps(_build_payload(text_input, command_history)).encode("utf-8"))
+
+def _models_to_try() -> list:
+    models = [app_config.OPENROUTER_MODEL]
     if app_config.OPENROUTER_FALLBACK_MODEL:
-        models_to_try.append(app_config.OPENROUTER_FALLBACK_MODEL)
+        models.append(app_config.OPENROUTER_FALLBACK_MODEL)
+    return models
+
+
+class _ReplyError(ValueError):
+    """A response arrived but held no usable reply. The message is what William says instead."""
+
+
+def _error_message(error: Exception) -> str:
+    """What William says when no model could answer, by the kind of the last error."""
+    if isinstance(error, _ReplyError):
+        return str(error)
+    if isinstance(error, json.JSONDecodeError):
+        return "Error: Could not understand the AI's response (JSON decode)."
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return f"Error: Could not connect to the AI service ({error.response.status_code})."
+    if isinstance(error, requests.exceptions.RequestException):
+        return "Error: Could not connect to the AI service (network issue)."
+    return "An unexpected error occurred while thinking."
+
+
+class _ModelStats:
+    """Smoothed time to first byte and error rate of one model."""
+
+    SMOOTHING = 0.3 # Weight of the newest result
+
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.latency: Optional[float] = None # Seconds, smoothed over successful attempts
+        self.error_rate = 0.0 # 0-1, smoothed over all attempts
+        self.samples = 0
+        self.wins = 0
 
-    last_error = None
+    def record(self, seconds: float, error: bool):
+        self.histogram.record(seconds, error=error)
+        self.samples += 1
+        self.error_rate += self.SMOOTHING * ((1.0 if error else 0.0) - self.error_rate)
+        if not error:
+            self.latency = seconds if self.latency is None else self.latency + self.SMOOTHING * (seconds - self.latency)
 
-    for model_name in models_to_try:
-        payload["model"] = model_name
+    def score(self) -> float:
+        """Expected cost of trying this model first, in seconds; lower is better."""
+        return (self.latency or 0.0) + self.error_rate * app_config.LLM_ERROR_PENALTY_SECONDS
+
+
+class ModelDispatcher:
+    """
+    Sends one LLM request to the configured models under a dispatch policy:
+
+    - "sequential": the next model only after the previous one failed.
+    - "hedged": also the next model once `hedge_after` seconds pass without a first byte.
+    - "race": every model at once.
+
+    The first successful attempt wins. Attempts that succeed after that are handed to
+    `discard` (closing a stream stops its generation) and only feed the statistics.
+    With `adaptive`, models are tried in order of their measured latency and error rate,
+    so a model that keeps stalling or failing drops behind the fallback.
+    """
+
+    POLICIES = ("sequential", "hedged", "race")
+
+    def __init__(self, policy: str = app_config.LLM_DISPATCH_POLICY,
+                 hedge_after: float = app_config.LLM_HEDGE_AFTER_SECONDS,
+                 adaptive: bool = app_config.LLM_ADAPTIVE_MODEL_ORDER):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown LLM dispatch policy '{policy}', expected one of: {', '.join(self.POLICIES)}.")
+        self.policy = policy
+        self.hedge_after = hedge_after
+        self.adaptive = adaptive
+        self._stats: Dict[str, _ModelStats] = {}
+        self._lock = threading.Lock()
+        # Losers keep a worker until they answer or time out, so leave room beyond one turn's attempts
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="william-llm")
+
+    def _stats_for(self, model: str) -> _ModelStats:
+        stats = self._stats.get(model)
+        if stats is None:
+            stats = self._stats.setdefault(model, _ModelStats())
+        return stats
+
+    def preference(self, models: List[str]) -> List[str]:
+        """`models` in the order to try them: by measured cost once each has LLM_STATS_MIN_SAMPLES results."""
+        if not self.adaptive or len(models) < 2:
+            return list(models)
+        with self._lock:
+            stats = [self._stats.get(model) for model in models]
+            if any(s is None or s.samples < app_config.LLM_STATS_MIN_SAMPLES for s in stats):
+                return list(models)
+            scores = {model: s.score() for model, s in zip(models, stats)}
+        return sorted(models, key=scores.__getitem__) # Stable, so ties keep the configured order
+
+    def _timed_attempt(self, model: str, attempt, turn):
+        tracing.adopt_turn(turn)
+        start = time.monotonic()
         try:
-            thought = f"Sending request to LLM ({model_name}) for input: '{text_input[:70]}...'"
-            print(thought) # Keep console log for dev
-            canvas_utils.update_canvas(thought_process=thought)
+            result = attempt(model)
+        except Exception:
+            self._record(model, time.monotonic() - start, error=True)
+            raise
+        self._record(model, time.monotonic() - start, error=False)
+        return result
 
-            response = requests.post(app_config.OPENROUTER_API_URL, headers=headers, data=json.dumps(payload), timeout=30)
-            response.raise_for_status() # Raises HTTPError for bad responses (4XX or 5XX)
+    def _record(self, model: str, seconds: float, error: bool):
+        with self._lock:
+            self._stats_for(model).record(seconds, error)
 
-            canvas_utils.update_canvas(thought_process=f"Received response from {model_name}. Parsing...")
-            response_data = response.json()
-
-            if response_data.get("choices") and len(response_data["choices"]) > 0:
-                message_content = response_data["choices"][0].get("message", {}).get("content")
-                # The content might be a list of parts or a direct string depending on the model/API version.
-                # Handle if content is a list (e.g., with Gemini 2.0 Flash)
-                if isinstance(message_content, list):
-                    assistant_reply = ""
-                    for part in message_content:
-                        if part.get("type") == "text":
-                            assistant_reply += part.get("text", "")
-                elif isinstance(message_content, str): # Direct string content
-                    assistant_reply = message_content
-                else: # Unexpected format
-                    assistant_reply = None
-
-                if assistant_reply is not None: # Check for None explicitly
-                    print(f"LLM ({model_name}) Response: {assistant_reply}")
-                    canvas_utils.update_canvas(thought_process=f"Successfully extracted LLM reply from {model_name}.")
-                    return assistant_reply.strip()
-                else:
-                    err_msg = f"LLM response format error: 'content' not found or in unexpected format from {model_name}."
-                    print(err_msg)
-                    canvas_utils.update_canvas(thought_process=err_msg, ai_response="Error: Malformed AI response.")
-                    last_error = "I received a response, but couldn't understand it." # Keep this generic for user
-            else:
-                err_msg = f"LLM response format error: 'choices' not found or empty from {model_name}. Response: {response_data}"
-                print(err_msg)
-                canvas_utils.update_canvas(thought_process=err_msg, ai_response="Error: No choices in AI response.")
-                last_error = "Sorry, I couldn't get a proper response from the AI." # Keep this generic
+    @staticmethod
+    def _discard_late(discard, future):
+        if discard is not None and not future.cancelled() and future.exception() is None:
+            discard(future.result())
 
-            if last_error and model_name == models_to_try[-1]: # If it's the last model and there was a parsing error
-                return last_error
-            elif last_error: # If there was a parsing error but more models to try
-                continue # Try next model
-
-
-        except requests.exceptions.HTTPError as e_http:
-            err_msg = f"HTTP error with {model_name}: {e_http}"
-            print(err_msg)
-            last_error = f"Error: Could not connect to the AI service ({e_http.response.status_code})."
-            # If it's a rate limit error (429) or server error (5XX) on the primary, try fallback.
-            # For other client errors (4XX) with primary, maybe don't try fallback unless it's auth.
-            # For now, let's try fallback for any HTTP error with the primary model.
-            if model_name == models_to_try[0] and len(models_to_try) > 1:
-                canvas_utils.update_canvas(thought_process=f"{err_msg}. Trying fallback model...")
-                continue # Try next model
-            else: # Error on fallback or no fallback
-                canvas_utils.update_canvas(thought_process=err_msg, ai_response=last_error)
-                return last_error # Return the error from the last attempted model
-
-        except requests.exceptions.RequestException as e_req:
-            err_msg = f"Request error with {model_name}: {e_req}"
-            print(err_msg)
-            last_error = "Error: Could not connect to the AI service (network issue)."
-            if model_name == models_to_try[0] and len(models_to_try) > 1:
-                canvas_utils.update_canvas(thought_process=f"{err_msg}. Trying fallback model...")
-                continue # Try next model
-            else:
-                canvas_utils.update_canvas(thought_process=err_msg, ai_response=last_error)
-                return last_error
+    def dispatch(self, models: List[str], attempt, discard=None):
+        """
+        Args:
+            models (List[str]): Models in the configured order of preference.
+            attempt (callable): attempt(model) -> result, raising on failure. Runs on a worker thread.
+            discard (Optional[callable]): Called with the result of every successful attempt that lost.
 
-        except json.JSONDecodeError as e_json:
-            resp_text = response.text if 'response' in locals() and hasattr(response, 'text') else "Response object or text not available"
-            err_msg = f"Error decoding JSON response from {model_name}. Error: {e_json}. Response text: {resp_text[:200]}..."
-            print(err_msg)
-            last_error = "Error: Could not understand the AI's response (JSON decode)."
-            if model_name == models_to_try[0] and len(models_to_try) > 1:
-                canvas_utils.update_canvas(thought_process=f"{err_msg}. Trying fallback model...")
-                continue # Try next model
-            else:
-                canvas_utils.update_canvas(thought_process=err_msg, ai_response=last_error)
-                return last_error
+        Returns:
+            (model, result) of the winning attempt. Raises the last error if every attempt failed.
+        """
+        waiting = self.preference(models)
+        if not waiting:
+            raise ValueError("No LLM model is configured.")
+        turn = tracing.current_turn()
+        pending = {}
+        last_error = None
+        winner = None
 
-        except Exception as e: # Catch-all for unexpected errors
-            err_msg = f"An unexpected error occurred with {model_name}: {e}"
-            print(err_msg)
-            last_error = "An unexpected error occurred while thinking."
-            if model_name == models_to_try[0] and len(models_to_try) > 1:
-                canvas_utils.update_canvas(thought_process=f"{err_msg}. Trying fallback model...")
-                continue
-            else:
-                canvas_utils.update_canvas(thought_process=err_msg, ai_response=last_error)
+        def launch_next():
+            model = waiting.pop(0)
+            pending[self._executor.submit(self._timed_attempt, model, attempt, turn)] = model
+
+        launch_next()
+        while self.policy == "race" and waiting:
+            launch_next()
+        while pending and winner is None:
+            budget = self.hedge_after if waiting and self.policy == "hedged" else None
+            done, _ = wait(pending, timeout=budget, return_when=FIRST_COMPLETED)
+            for future in done:
+                model = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"LLM request to {model} failed: {e}")
+                    last_error = e
+                    continue
+                if winner is None:
+                    winner = (model, result)
+                elif discard is not None:
+                    discard(result)
+            if winner is None and waiting and (not done or not pending):
+                launch_next() # Hedge: no first byte in time, or everything in flight already failed
+
+        for future in pending: # Still running: clean up after them once they answer
+            future.add_done_callback(functools.partial(self._discard_late, discard))
+        if winner is None:
+            raise last_error
+        with self._lock:
+            self._stats_for(winner[0]).wins += 1
+        return winner
+
+    def stats(self) -> Dict[str, dict]:
+        """Per-model latency histogram, wins, smoothed latency and error rate, for tuning the policy."""
+        with self._lock:
+            summaries = {model: (s.histogram, s.wins, s.latency, s.error_rate) for model, s in self._stats.items()}
+        return {model: dict(histogram.as_dict(), wins=wins, error_rate=round(error_rate, 3),
+                            smoothed_ms=None if latency is None else 1000.0 * latency)
+                for model, (histogram, wins, latency, error_rate) in summaries.items()}
+
+
+_dispatcher: Optional[ModelDispatcher] = None
+
+def get_dispatcher() -> ModelDispatcher:
+    """Returns the shared ModelDispatcher, creating it from config on first use."""
+    global _dispatcher
+    with _client_lock:
+        if _dispatcher is None:
+            _dispatcher = ModelDispatcher()
+        return _dispatcher
+
+
+def _iter_sse_deltas(response):
+    """Yields the text deltas of an OpenAI-style server-sent event stream until [DONE]."""
+    done = False
+    # chunk_size=None hands over each chunk as it arrives instead of waiting for a full buffer
+    for line in response.iter_lines(chunk_size=None):
+        # After [DONE], keep reading to the end of the body so the connection goes back to the pool
+        if done or not line.startswith(b"data:"):
+            continue # Blank separators and ": keep-alive" comments
+        data = line[5:].strip()
+        if data == b"[DONE]":
+            done = True
+            continue
+        event = json.loads(data)
+        if event.get("error"):
+            raise requests.exceptions.RequestException(f"stream error: {event['error']}")
+        choices = event.get("choices") or [{}]
+        content = (choices[0].get("delta") or {}).get("content")
+        if content:
+            yield content
+
+
+def _cache_lookup(text_input, command_history):
+    """Returns (cache, cached reply or None). The cache is None while config.ENABLE_LLM_CACHE is off."""
+    cache = llm_cache.get_cache()
+    if cache is None:
+        return None, None
+    with tracing.span("llm_cache") as span:
+        reply = cache.get(text_input, app_config.OPENROUTER_MODEL, command_history)
+        span.set(hit=reply is not None)
+    if reply is not None:
+        print(f"LLM reply from cache: {reply}")
+        canvas_utils.update_canvas(thought_process="Answered from the response cache.")
+    return cache, reply
+
+
+def stream_llm_response(text_input, command_history: list = None):
+    """
+    Streaming version of `get_llm_response`: a generator over the reply's text deltas,
+    yielded as OpenRouter generates them ("stream": true server-sent events).
+
+    The models are tried under LLM_DISPATCH_POLICY; the first to produce a token wins. If no
+    model can answer, the error message is yielded instead, like `get_llm_response` returns it.
+    A cached reply is yielded in one piece.
+    """
+    cache, cached = _cache_lookup(text_input, command_history)
+    if cached is not None:
+        yield cached
+        return
+    client = get_client()
+    payload = _build_payload(text_input, command_history)
+    payload["stream"] = True
+
+    def open_stream(model_name):
+        thought = f"Streaming request to LLM ({model_name}) for input: '{text_input[:70]}...'"
+        print(thought)
+        canvas_utils.update_canvas(thought_process=thought)
+        started = time.monotonic()
+        response = client.post(dict(payload, model=model_name), stream=True)
+        try:
+            response.raise_for_status()
+            deltas = _iter_sse_deltas(response)
+            first = next(deltas, None)
+            if first is None:
+                raise _ReplyError("Sorry, I couldn't get a proper response from the AI.")
+        except Exception:
+            response.close()
+            raise
+        tracing.record("llm_first_token", started, time.monotonic(), model=model_name,
+                       request_bytes=response.request_bytes)
+        return response, first, deltas, started
+
+    try:
+        model_name, (response, first, deltas, started) = get_dispatcher().dispatch(
+            _models_to_try(), open_stream, discard=lambda stream: stream[0].close())
+    except Exception as e:
+        message = _error_message(e)
+        print(f"Streaming error: {e}")
+        canvas_utils.update_canvas(thought_process=message, ai_response=message)
+        yield message
+        return
+
+    pieces = [first]
+    with response:
+        try:
+            yield first
+            for delta in deltas:
+                pieces.append(delta)
+                yield delta
+            canvas_utils.update_canvas(thought_process=f"Finished streaming the reply from {model_name}.")
+            if cache is not None: # Only complete replies; a cut-off one is not worth repeating
+                cache.put(text_input, app_config.OPENROUTER_MODEL, command_history, "".join(pieces).strip())
+        except (requests.exceptions.RequestException, ValueError) as e:
+            # Part of the reply has already been spoken; don't start over with another model
+            print(f"LLM stream from {model_name} broke off: {e}")
+            canvas_utils.update_canvas(thought_process=f"The reply from {model_name} was cut off: {e}")
+        finally:
+            tracing.record("llm", started, time.monotonic(), model=model_name, stream=True)
+
+
+def _parse_reply(response_data: dict, model_name: str) -> str:
+    """Extracts the reply text from a chat completions response. Raises _ReplyError if there is none."""
+    if response_data.get("choices") and len(response_data["choices"]) > 0:
+        message_content = response_data["choices"][0].get("message", {}).get("content")
+        # The content might be a list of parts or a direct string depending on the model/API version.
+        # Handle if content is a list (e.g., with Gemini 2.0 Flash)
+        if isinstance(message_content, list):
+            assistant_reply = ""
+            for part in message_content:
+                if part.get("type") == "text":
+                    assistant_reply += part.get("text", "")
+        elif isinstance(message_content, str): # Direct string content
+            assistant_reply = message_content
+        else: # Unexpected format
+            assistant_reply = None
+
+        if assistant_reply is not None: # Check for None explicitly
+            return assistant_reply.strip()
+        err_msg = f"LLM response format error: 'content' not found or in unexpected format from {model_name}."
+        print(err_msg)
+        canvas_utils.update_canvas(thought_process=err_msg, ai_response="Error: Malformed AI response.")
+        raise _ReplyError("I received a response, but couldn't understand it.") # Keep this generic for user
+    err_msg = f"LLM response format error: 'choices' not found or empty from {model_name}. Response: {response_data}"
+    print(err_msg)
+    canvas_utils.update_canvas(thought_process=err_msg, ai_response="Error: No choices in AI response.")
+    raise _ReplyError("Sorry, I couldn't get a proper response from the AI.") # Keep this generic
+
+
+def get_llm_response(text_input, command_history: list = None):
+    """
+    Sends the user's text input to OpenRouter and returns the LLM's response.
+    Optionally includes command history.
+
+    The primary and fallback models are tried under LLM_DISPATCH_POLICY (see ModelDispatcher).
+    An attempt ends when the response headers arrive, so the hedge and the model statistics see
+    time to first byte, as for streaming, not the time to generate the whole reply. A model that
+    errors counts as failed; one whose reply turns out malformed is dropped and the rest are tried again.
+    Successful replies are kept in the response cache (see llm_cache.py).
+    """
+    cache, cached = _cache_lookup(text_input, command_history)
+    if cached is not None:
+        return cached
+    client = get_client()
+    payload = _build_payload(text_input, command_history)
+
+    def open_response(model_name):
+        thought = f"Sending request to LLM ({model_name}) for input: '{text_input[:70]}...'"
+        print(thought) # Keep console log for dev
+        canvas_utils.update_canvas(thought_process=thought)
+        started = time.monotonic()
+        response = client.post(dict(payload, model=model_name), stream=True) # Returns once the headers arrive
+        try:
+            response.raise_for_status() # Raises HTTPError for bad responses (4XX or 5XX)
+        except Exception:
+            response.close()
+            raise
+        return response, started
+
+    models = _models_to_try()
+    while True:
+        try:
+            model_name, (response, started) = get_dispatcher().dispatch(
+                models, open_response, discard=lambda opened: opened[0].close())
+        except Exception as e:
+            last_error = _error_message(e)
+            canvas_utils.update_canvas(thought_process=f"No model could answer: {e}", ai_response=last_error)
+            return last_error
+        canvas_utils.update_canvas(thought_process=f"Received response from {model_name}. Parsing...")
+        try:
+            with response:
+                assistant_reply = _parse_reply(response.json(), model_name) # Reads the body
+            break
+        except (ValueError, requests.exceptions.RequestException) as e: # Includes _ReplyError and JSON errors
+            models = [model for model in models if model != model_name]
+            if not models:
+                last_error = _error_message(e)
+                canvas_utils.update_canvas(ai_response=last_error)
                 return last_error
+            print(f"Unusable reply from {model_name}, trying {', '.join(models)}: {e}")
+        finally:
+            tracing.record("llm", started, time.monotonic(), model=model_name,
+                           status=response.status_code, request_bytes=response.request_bytes)
+
+    print(f"LLM ({model_name}) Response: {assistant_reply}")
+    canvas_utils.update_canvas(thought_process=f"Successfully extracted LLM reply from {model_name}.")
+    if cache is not None:
+        cache.put(text_input, app_config.OPENROUTER_MODEL, command_history, assistant_reply)
+    return assistant_reply
 
-    # If loop finishes without returning (e.g., models_to_try was empty or all failed silently before error assignment)
-    if last_error:
-        return last_error
-    return "Error: AI service could not be reached or process the request after multiple attempts."
+
+def summarize_conversation(previous_summary: str, messages: list,
+                           max_tokens: int = app_config.CONTEXT_SUMMARY_MAX_TOKENS) -> str:
+    """
+    Folds `messages` into `previous_summary` with one request to the primary model, without the
+    personality prompt, the dispatcher or the response cache. Used by ContextManager in the background.
+    Raises requests exceptions or a ValueError if no summary came back.
+    """
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    prompt = (f"Summarize this conversation between a user and the voice assistant William in at most "
+              f"{max_tokens * 3 // 4} words. Keep names, facts, preferences and open questions; drop small talk.\n\n")
+    if previous_summary:
+        prompt += f"Summary so far: {previous_summary}\n\n"
+    prompt += f"New messages:\n{transcript}"
+    payload = {"model": app_config.OPENROUTER_MODEL,
+               "messages": [{"role": "user", "content": [{"type": "text", "text": prompt}]}]}
+    with tracing.span("llm_summary", model=app_config.OPENROUTER_MODEL):
+        response = get_client().post(payload)
+    response.raise_for_status()
+    return _parse_reply(response.json(), app_config.OPENROUTER_MODEL)
 
 
 if __name__ == '__main__':